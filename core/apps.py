@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class CoreConfig(AppConfig):
     name = 'core'
     verbose_name = 'Cadastro de Usuários'
+
+    def ready(self):
+        import core.signals
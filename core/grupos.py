@@ -0,0 +1,33 @@
+# core/grupos.py
+#
+# Nomes dos grupos do usuário, consultados várias vezes por request pelos
+# admins (queryset, fieldsets, readonly, ações). Guardados no cache por
+# usuário e memorizados no próprio objeto do request; os signals em
+# core/signals.py apagam a entrada quando os grupos do usuário mudam.
+
+from django.core.cache import cache
+
+TEMPO_CACHE_GRUPOS = 60 * 60
+
+
+def _chave(usuario_id):
+    return f'grupos_usuario:{usuario_id}'
+
+
+def grupos_do_usuario(user):
+    """frozenset com os nomes dos grupos de `user` (vazio para anônimo)."""
+    if not getattr(user, 'is_authenticated', False):
+        return frozenset()
+    memo = user.__dict__.get('_grupos_do_usuario')
+    if memo is not None:
+        return memo
+    grupos = cache.get(_chave(user.pk))
+    if grupos is None:
+        grupos = frozenset(user.groups.values_list('name', flat=True))
+        cache.set(_chave(user.pk), grupos, TEMPO_CACHE_GRUPOS)
+    user.__dict__['_grupos_do_usuario'] = grupos
+    return grupos
+
+
+def invalidar_grupos(usuario_ids):
+    cache.delete_many([_chave(pk) for pk in usuario_ids])
@@ -0,0 +1,205 @@
+# core/metricas.py
+#
+# Métricas por view (core.middleware.MetricasMiddleware): para cada requisição,
+# pelo nome da view resolvida ('dashboard_gerencial',
+# 'admin:workflow_despesa_changelist', ...), guarda o tempo total, o tempo no
+# banco, o número de consultas e quantas delas repetiram exatamente o mesmo SQL
+# com os mesmos parâmetros.
+#
+# Cada processo mantém as últimas METRICAS_JANELA amostras de cada view e, a cada
+# METRICAS_PUBLICAR segundos, publica esse retrato no cache compartilhado (uma
+# chave por processo, que expira se o processo morrer). A página de métricas e o
+# endpoint texto juntam os retratos de todos os workers e calculam p50/p95.
+#
+# Requisições acima de METRICAS_LENTO_MS vão para o logger 'core.metricas' com os
+# SQL mais repetidos.
+
+import logging
+import os
+import socket
+import threading
+import time
+from collections import Counter, deque
+
+from django.conf import settings
+from django.core.cache import cache
+
+logger = logging.getLogger('core.metricas')
+
+CHAVE_PROCESSOS = 'metricas:processos'
+
+
+def _janela():
+    return getattr(settings, 'METRICAS_JANELA', 500)
+
+
+def _intervalo_publicacao():
+    return getattr(settings, 'METRICAS_PUBLICAR', 10)
+
+
+def lento_ms():
+    return getattr(settings, 'METRICAS_LENTO_MS', 1000)
+
+
+class ContadorSQL:
+    """execute_wrapper de uma requisição: tempo no banco e SQL executados."""
+
+    def __init__(self):
+        self.segundos = 0.0
+        self.consultas = []  # (sql, params)
+
+    def __call__(self, execute, sql, params, many, context):
+        inicio = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.segundos += time.perf_counter() - inicio
+            self.consultas.append((sql, _chave_params(params)))
+
+    @property
+    def duplicadas(self):
+        """Consultas que repetiram SQL e parâmetros de outra já feita na mesma requisição."""
+        return len(self.consultas) - len(set(self.consultas))
+
+    def mais_repetidas(self, quantas=3):
+        """Os SQL (sem parâmetros) executados mais de uma vez, com a contagem."""
+        contagem = Counter(sql for sql, _ in self.consultas)
+        return [(sql, n) for sql, n in contagem.most_common(quantas) if n > 1]
+
+
+def _chave_params(params):
+    try:
+        hash(params)
+        return params
+    except TypeError:
+        return repr(params)
+
+
+class Coletor:
+    """Amostras recentes por view, deste processo."""
+
+    def __init__(self):
+        self._trava = threading.Lock()
+        self._amostras = {}
+        self._publicado_em = 0.0
+        self.chave = f'metricas:{socket.gethostname()}:{os.getpid()}'
+
+    def registrar(self, view, total_ms, sql_ms, consultas, duplicadas):
+        with self._trava:
+            amostras = self._amostras.get(view)
+            if amostras is None:
+                amostras = self._amostras[view] = deque(maxlen=_janela())
+            amostras.append((round(total_ms, 1), round(sql_ms, 1), consultas, duplicadas))
+            publicar = time.monotonic() - self._publicado_em >= _intervalo_publicacao()
+            if publicar:
+                self._publicado_em = time.monotonic()
+                retrato = self.retrato()
+        if publicar:
+            self.publicar(retrato)
+
+    def retrato(self):
+        return {view: list(amostras) for view, amostras in self._amostras.items()}
+
+    def publicar(self, retrato=None):
+        if retrato is None:
+            with self._trava:
+                retrato = self.retrato()
+        validade = max(60, _intervalo_publicacao() * 30)
+        try:
+            cache.set(self.chave, retrato, validade)
+            processos = cache.get(CHAVE_PROCESSOS) or {}
+            agora = time.time()
+            processos = {k: t for k, t in processos.items() if agora - t < validade}
+            processos[self.chave] = agora
+            cache.set(CHAVE_PROCESSOS, processos, None)
+        except Exception:
+            logger.exception("Falha ao publicar as métricas no cache")
+
+    def limpar(self):
+        with self._trava:
+            self._amostras.clear()
+
+
+coletor = Coletor()
+
+
+def _percentil(valores, p):
+    """Percentil por interpolação linear (valores já ordenados)."""
+    if not valores:
+        return 0
+    pos = (len(valores) - 1) * p / 100
+    baixo = int(pos)
+    alto = min(baixo + 1, len(valores) - 1)
+    return valores[baixo] + (valores[alto] - valores[baixo]) * (pos - baixo)
+
+
+def agregados():
+    """
+    Junta as amostras publicadas por todos os processos (e as deste, ainda
+    não publicadas) e devolve uma linha por view, da mais lenta no p95 para a
+    mais rápida.
+    """
+    processos = list(cache.get(CHAVE_PROCESSOS) or {})
+    retratos = cache.get_many(processos) if processos else {}
+    with coletor._trava:
+        retratos[coletor.chave] = coletor.retrato()
+
+    por_view = {}
+    for retrato in retratos.values():
+        for view, amostras in retrato.items():
+            por_view.setdefault(view, []).extend(amostras)
+
+    linhas = []
+    for view, amostras in por_view.items():
+        total, sql, consultas, duplicadas = (sorted(coluna) for coluna in zip(*amostras))
+        linhas.append({
+            'view': view,
+            'requisicoes': len(amostras),
+            'total_p50': round(_percentil(total, 50), 1),
+            'total_p95': round(_percentil(total, 95), 1),
+            'total_max': total[-1],
+            'sql_p50': round(_percentil(sql, 50), 1),
+            'sql_p95': round(_percentil(sql, 95), 1),
+            'consultas_p50': round(_percentil(consultas, 50), 1),
+            'consultas_p95': round(_percentil(consultas, 95), 1),
+            'consultas_max': consultas[-1],
+            'duplicadas_p95': round(_percentil(duplicadas, 95), 1),
+            'duplicadas_max': duplicadas[-1],
+        })
+    linhas.sort(key=lambda linha: linha['total_p95'], reverse=True)
+    return linhas
+
+
+def registrar_lenta(request, view, total_ms, contador):
+    repetidas = "\n".join(
+        f"  {n}× {sql[:300]}" for sql, n in contador.mais_repetidas()
+    ) or "  (nenhum SQL repetido)"
+    logger.warning(
+        "Requisição lenta: %s %s (%s) em %.0f ms — SQL %.0f ms, %d consultas, %d duplicadas\n%s",
+        request.method, request.path, view, total_ms, contador.segundos * 1000,
+        len(contador.consultas), contador.duplicadas, repetidas,
+    )
+
+
+def texto_para_coleta(linhas):
+    """Formato texto de exposição do Prometheus."""
+    saida = []
+    series = [
+        ('malupe_requisicao_ms', 'Tempo total da requisição (ms)', 'total'),
+        ('malupe_sql_ms', 'Tempo gasto no banco (ms)', 'sql'),
+        ('malupe_consultas', 'Consultas SQL por requisição', 'consultas'),
+    ]
+    for nome, ajuda, campo in series:
+        saida += [f'# HELP {nome} {ajuda}', f'# TYPE {nome} summary']
+        for linha in linhas:
+            view = linha['view'].replace('\\', '\\\\').replace('"', '\\"')
+            for quantil in ('50', '95'):
+                saida.append(f'{nome}{{view="{view}",quantile="0.{quantil}"}} {linha[f"{campo}_p{quantil}"]}')
+            if campo == 'total':
+                saida.append(f'{nome}_count{{view="{view}"}} {linha["requisicoes"]}')
+    saida += ['# HELP malupe_consultas_duplicadas_max Maior número de consultas duplicadas numa requisição',
+              '# TYPE malupe_consultas_duplicadas_max gauge']
+    for linha in linhas:
+        view = linha['view'].replace('\\', '\\\\').replace('"', '\\"')
+        saida.append(f'malupe_consultas_duplicadas_max{{view="{view}"}} {linha["duplicadas_max"]}')
+    return '\n'.join(saida) + '\n'
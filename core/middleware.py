@@ -1,6 +1,13 @@
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
 from django.shortcuts import redirect
 from django.urls import reverse
 
+from core import metricas, perfis
+
 
 class TrocaSenhaObrigatoriaMiddleware:
     """Redireciona usuários com troca_senha_obrigatoria=True para a página de troca."""
@@ -23,3 +30,86 @@ class TrocaSenhaObrigatoriaMiddleware:
         ):
             return redirect('/admin/trocar-senha/')
         return self.get_response(request)
+
+
+class MetricasMiddleware:
+    """
+    Mede cada requisição (tempo total, tempo no banco, consultas e consultas
+    duplicadas) e registra por view em core.metricas. Fica logo no começo da
+    lista para o tempo total incluir os outros middlewares.
+
+    Em respostas em streaming (exportação do SLA, ZIP do arquivamento) o
+    trabalho acontece enquanto o conteúdo é consumido: a amostra só é
+    registrada no fim do stream, com as consultas feitas em cada pedaço.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not getattr(settings, 'METRICAS_ATIVAS', True):
+            return self.get_response(request)
+
+        contador = metricas.ContadorSQL()
+        inicio = time.perf_counter()
+        with self._contando(contador):
+            response = self.get_response(request)
+
+        # FileResponse servido pelo wsgi.file_wrapper não passa pelo Python nem pelo banco
+        if response.streaming and not response.is_async and getattr(response, 'file_to_stream', None) is None:
+            response.streaming_content = self._medir_stream(
+                response.streaming_content, request, contador, inicio,
+            )
+        else:
+            self._registrar(request, contador, inicio)
+        return response
+
+    @staticmethod
+    def _contando(contador):
+        pilha = ExitStack()
+        for conexao in connections.all():
+            pilha.enter_context(conexao.execute_wrapper(contador))
+        return pilha
+
+    def _medir_stream(self, conteudo, request, contador, inicio):
+        # Os wrappers entram a cada pedaço (e não ficam abertos entre um yield e
+        # outro, quando o servidor pode estar fazendo outra coisa na thread)
+        iterador = iter(conteudo)
+        try:
+            while True:
+                with self._contando(contador):
+                    try:
+                        pedaco = next(iterador)
+                    except StopIteration:
+                        return
+                yield pedaco
+        finally:
+            self._registrar(request, contador, inicio)
+
+    def _registrar(self, request, contador, inicio):
+        total_ms = (time.perf_counter() - inicio) * 1000
+        match = getattr(request, 'resolver_match', None)
+        view = match.view_name if match else '<não resolvida>'
+        metricas.coletor.registrar(
+            view, total_ms, contador.segundos * 1000, len(contador.consultas), contador.duplicadas,
+        )
+        if total_ms >= metricas.lento_ms():
+            metricas.registrar_lenta(request, view, total_ms, contador)
+
+
+class PerfilMiddleware:
+    """
+    ?perfil=1 em qualquer URL, para quem tem core.perfilar_requisicoes: a
+    requisição roda sob o cProfile e o perfil fica em admin/perfis/ (ver
+    core.perfis). O nome do perfil volta no cabeçalho X-Perfil.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not perfis.pedido(request):
+            return self.get_response(request)
+        response, nome = perfis.perfilar(request, self.get_response)
+        response['X-Perfil'] = nome
+        return response
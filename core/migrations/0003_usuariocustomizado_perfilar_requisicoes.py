@@ -0,0 +1,21 @@
+# Generated by Django 5.2.2 on 2026-10-18 16:05
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_grupo'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='usuariocustomizado',
+            options={
+                'verbose_name': 'user',
+                'verbose_name_plural': 'users',
+                'permissions': [('perfilar_requisicoes', 'Pode gerar perfil de requisições (?perfil=1)')],
+            },
+        ),
+    ]
@@ -24,6 +24,11 @@ class UsuarioCustomizado(AbstractUser):
         help_text="O usuário deve alterar a senha no primeiro acesso."
     )
 
+    class Meta(AbstractUser.Meta):
+        permissions = [
+            ('perfilar_requisicoes', 'Pode gerar perfil de requisições (?perfil=1)'),
+        ]
+
     def __str__(self):
         nome = self.first_name.strip()
         return nome if nome else self.username
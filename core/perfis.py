@@ -0,0 +1,166 @@
+# core/perfis.py
+#
+# Perfil de uma requisição sob demanda (core.middleware.PerfilMiddleware): quem
+# tem a permissão core.perfilar_requisicoes acrescenta ?perfil=1 a qualquer URL
+# (Fluxo de Caixa, tabela do SLA, changelists do admin...) e aquela requisição
+# roda sob o cProfile, com a linha do tempo dos SQL executados.
+#
+# Cada perfil vira dois arquivos em PERFIS_DIR:
+#
+# - <nome>.prof: o pstats bruto (abre no snakeviz para a visão em chamas/icicle);
+# - <nome>.json: URL, usuário, tempos, as funções mais caras e a linha do tempo
+#   dos SQL, que a página admin/perfis/ lista e mostra.
+#
+# Só os PERFIS_MAX mais recentes são mantidos.
+
+import cProfile
+import io
+import json
+import pstats
+import re
+import time
+import uuid
+from contextlib import ExitStack
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connections
+from django.utils import timezone
+
+PARAMETRO = 'perfil'
+NOME_VALIDO = re.compile(r'^\d{8}_\d{6}_[0-9a-f]{6}$')
+
+
+def _diretorio():
+    return Path(settings.PERFIS_DIR)
+
+
+class LinhaDoTempoSQL:
+    """execute_wrapper: início (relativo à requisição), duração e texto de cada SQL."""
+
+    def __init__(self, inicio):
+        self.inicio = inicio
+        self.consultas = []
+
+    def __call__(self, execute, sql, params, many, context):
+        comeco = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            fim = time.perf_counter()
+            self.consultas.append({
+                'inicio_ms': round((comeco - self.inicio) * 1000, 2),
+                'duracao_ms': round((fim - comeco) * 1000, 2),
+                'sql': sql if len(sql) <= 2000 else sql[:2000] + '…',
+            })
+
+
+def pedido(request):
+    """A requisição pediu perfil e o usuário pode gerar?"""
+    return (
+        PARAMETRO in request.GET
+        and request.user.is_active
+        and request.user.is_staff
+        and request.user.has_perm('core.perfilar_requisicoes')
+    )
+
+
+def _funcoes_mais_caras(perfil, quantas=40):
+    saida = io.StringIO()
+    stats = pstats.Stats(perfil, stream=saida)
+    stats.sort_stats('cumulative').print_stats(quantas)
+    return saida.getvalue()
+
+
+def gravar(request, perfil, linha, total_ms, status):
+    """Grava o .prof e o .json do perfil e devolve o nome (sem extensão)."""
+    destino = _diretorio()
+    destino.mkdir(parents=True, exist_ok=True)
+    nome = f"{timezone.localtime():%Y%m%d_%H%M%S}_{uuid.uuid4().hex[:6]}"
+    perfil.dump_stats(destino / f'{nome}.prof')
+
+    match = getattr(request, 'resolver_match', None)
+    contagem = {}
+    for consulta in linha.consultas:
+        contagem[consulta['sql']] = contagem.get(consulta['sql'], 0) + 1
+    metadados = {
+        'nome': nome,
+        'criado_em': timezone.now().isoformat(),
+        'usuario': request.user.get_username(),
+        'metodo': request.method,
+        'caminho': request.path,
+        'query': request.GET.urlencode(),
+        'view': match.view_name if match else None,
+        'status': status,
+        'total_ms': round(total_ms, 1),
+        'sql_ms': round(sum(c['duracao_ms'] for c in linha.consultas), 1),
+        'consultas': len(linha.consultas),
+        'repetidas': sorted(
+            ({'sql': sql, 'vezes': n} for sql, n in contagem.items() if n > 1),
+            key=lambda r: r['vezes'], reverse=True,
+        )[:10],
+        'linha_do_tempo': linha.consultas,
+        'funcoes': _funcoes_mais_caras(perfil),
+    }
+    (destino / f'{nome}.json').write_text(json.dumps(metadados, ensure_ascii=False), encoding='utf-8')
+    _podar(destino)
+    return nome
+
+
+def _podar(destino):
+    manter = getattr(settings, 'PERFIS_MAX', 50)
+    for antigo in sorted(destino.glob('*.json'), reverse=True)[manter:]:
+        antigo.unlink(missing_ok=True)
+        antigo.with_suffix('.prof').unlink(missing_ok=True)
+
+
+def perfilar(request, get_response):
+    """Roda a requisição sob o cProfile. Devolve (response, nome do perfil)."""
+    # A view não vê o parâmetro: o changelist do admin trataria ?perfil como filtro inválido
+    request.GET = request.GET.copy()
+    request.GET.pop(PARAMETRO, None)
+    inicio = time.perf_counter()
+    linha = LinhaDoTempoSQL(inicio)
+    perfil = cProfile.Profile()
+    with ExitStack() as pilha:
+        for conexao in connections.all():
+            pilha.enter_context(conexao.execute_wrapper(linha))
+        perfil.enable()
+        try:
+            response = get_response(request)
+        finally:
+            perfil.disable()
+    total_ms = (time.perf_counter() - inicio) * 1000
+    return response, gravar(request, perfil, linha, total_ms, response.status_code)
+
+
+def listar():
+    """Metadados dos perfis gravados, do mais recente para o mais antigo (sem a linha do tempo)."""
+    destino = _diretorio()
+    if not destino.exists():
+        return []
+    perfis = []
+    for arquivo in sorted(destino.glob('*.json'), reverse=True):
+        try:
+            dados = json.loads(arquivo.read_text(encoding='utf-8'))
+        except (OSError, ValueError):
+            continue
+        dados.pop('linha_do_tempo', None)
+        dados.pop('funcoes', None)
+        perfis.append(dados)
+    return perfis
+
+
+def caminho(nome, extensao):
+    """Arquivo do perfil `nome` (validado contra o padrão dos nomes gerados) ou None."""
+    if not NOME_VALIDO.match(nome):
+        return None
+    arquivo = _diretorio() / f'{nome}.{extensao}'
+    return arquivo if arquivo.exists() else None
+
+
+def carregar(nome):
+    arquivo = caminho(nome, 'json')
+    if arquivo is None:
+        return None
+    return json.loads(arquivo.read_text(encoding='utf-8'))
@@ -0,0 +1,32 @@
+# core/signals.py
+
+from django.contrib.auth.models import Group
+from django.db.models.signals import m2m_changed, post_save, pre_delete
+from django.dispatch import receiver
+
+from .grupos import invalidar_grupos
+from .models import UsuarioCustomizado, Grupo
+
+
+@receiver(m2m_changed, sender=UsuarioCustomizado.groups.through)
+def grupos_alterados(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'pre_clear', 'post_clear'):
+        return
+    if not reverse:
+        # usuario.groups.add/remove/clear
+        invalidar_grupos([instance.pk])
+    elif action == 'pre_clear':
+        # grupo.user_set.clear(): pk_set não vem preenchido
+        invalidar_grupos(instance.user_set.values_list('pk', flat=True))
+    elif pk_set:
+        invalidar_grupos(pk_set)
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_save, sender=Grupo)
+@receiver(pre_delete, sender=Group)
+@receiver(pre_delete, sender=Grupo)
+def grupo_alterado(sender, instance, **kwargs):
+    # Renomear ou excluir um grupo muda os nomes de todos os membros
+    if instance.pk:
+        invalidar_grupos(instance.user_set.values_list('pk', flat=True))
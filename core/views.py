@@ -1,8 +1,15 @@
+import hmac
+
+from django.conf import settings
 from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth import update_session_auth_hash
 from django.contrib import messages
+from django.core.exceptions import PermissionDenied
+from django.http import FileResponse, Http404, HttpResponse
 from django.shortcuts import render, redirect
 
+from core import metricas, perfis
+
 
 @staff_member_required
 def trocar_senha_obrigatoria(request):
@@ -32,3 +39,77 @@ def trocar_senha_obrigatoria(request):
         'site_header': 'Malupe Admin',
         'site_title': 'Malupe Admin',
     })
+
+
+@staff_member_required
+def painel_metricas(request):
+    if request.method == 'POST' and request.POST.get('acao') == 'limpar':
+        # Zera só este worker; os outros continuam até a janela girar
+        metricas.coletor.limpar()
+        metricas.coletor.publicar()
+        return redirect('metricas')
+
+    return render(request, 'admin/metricas.html', {
+        'title': 'Métricas de Requisições',
+        'linhas': metricas.agregados(),
+        'lento_ms': metricas.lento_ms(),
+        'janela': settings.METRICAS_JANELA,
+        'ativas': settings.METRICAS_ATIVAS,
+    })
+
+
+def metricas_texto(request):
+    """p50/p95 por view em texto para o Prometheus: token Bearer (ou ?token=) ou staff logado."""
+    token = settings.METRICAS_TOKEN
+    enviado = request.headers.get('Authorization', '').removeprefix('Bearer ').strip() or request.GET.get('token', '')
+    autorizado = (
+        (token and hmac.compare_digest(enviado, token))
+        or (request.user.is_active and request.user.is_staff)
+    )
+    if not autorizado:
+        raise PermissionDenied
+    return HttpResponse(
+        metricas.texto_para_coleta(metricas.agregados()),
+        content_type='text/plain; version=0.0.4; charset=utf-8',
+    )
+
+
+def _pode_perfilar(request):
+    if not request.user.has_perm('core.perfilar_requisicoes'):
+        raise PermissionDenied
+
+
+@staff_member_required
+def lista_perfis(request):
+    _pode_perfilar(request)
+    return render(request, 'admin/perfis.html', {
+        'title': 'Perfis de Requisições',
+        'perfis': perfis.listar(),
+        'parametro': perfis.PARAMETRO,
+    })
+
+
+@staff_member_required
+def detalhe_perfil(request, nome):
+    _pode_perfilar(request)
+    perfil = perfis.carregar(nome)
+    if perfil is None:
+        raise Http404
+    # Escala da linha do tempo: cada SQL vira uma barra posicionada no tempo total
+    total = perfil['total_ms'] or 1
+    for consulta in perfil['linha_do_tempo']:
+        consulta['esquerda'] = round(100 * consulta['inicio_ms'] / total, 2)
+        consulta['largura'] = max(round(100 * consulta['duracao_ms'] / total, 2), 0.2)
+    return render(request, 'admin/perfil_detalhe.html', {
+        'title': f"Perfil {nome}",
+        'perfil': perfil,
+    })
+
+
+@staff_member_required
+def download_perfil(request, nome):
+    _pode_perfilar(request)
+    arquivo = perfis.caminho(nome, 'prof')
+    if arquivo is None:
+        raise Http404
+    return FileResponse(open(arquivo, 'rb'), as_attachment=True, filename=f'{nome}.prof')
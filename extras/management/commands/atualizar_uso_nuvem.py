@@ -0,0 +1,23 @@
+# extras/management/commands/atualizar_uso_nuvem.py
+
+from django.core.management.base import BaseCommand, CommandError
+
+from extras.uso_nuvem import atualizar_uso
+
+
+class Command(BaseCommand):
+    help = (
+        "Consulta o uso do armazenamento na nuvem e grava no cache usado pela página de "
+        "armazenamento. Agende com intervalo menor que USO_NUVEM_TTL para a página nunca "
+        "ver número vencido."
+    )
+
+    def handle(self, *args, **opts):
+        try:
+            entrada = atualizar_uso()
+        except Exception as e:
+            raise CommandError(f"Falha ao consultar o uso: {e}")
+        dados = entrada['dados']
+        self.stdout.write(self.style.SUCCESS(
+            f"Uso atualizado: {dados['used']:.2f} de {dados['limit']:.2f} ({dados['percent']:.1f}%)."
+        ))
@@ -1,8 +1,9 @@
-from django.db import models
+from django.db import models, transaction
 from django.conf import settings
 from django.utils import timezone
 from django.db.models import Q
-from financeiro.models import ContasAReceber, Sequencial
+from financeiro.models import ContasAReceber
+from financeiro.sequencias import proximo_numero
 from workflow.models import Despesa
 from cadastros.models import Tomador, Filial, MotivoAusencia, Colaborador, Banco, Empresa
 
@@ -75,9 +76,7 @@ class LancamentoExtra(models.Model):
         return f"{self.nota_fiscal} - R$ {self.valor_recebimento}"
 
     def save(self, *args, **kwargs):
-        if not self.nota_fiscal:
-            contador, _ = Sequencial.objects.get_or_create(prefixo='LE', defaults={'ultimo_numero': 0})
-            contador.ultimo_numero += 1
-            contador.save()
-            self.nota_fiscal = f"LE{contador.ultimo_numero:04d}"
-        super().save(*args, **kwargs)
\ No newline at end of file
+        with transaction.atomic():
+            if not self.nota_fiscal:
+                self.nota_fiscal = f"LE{proximo_numero('LE'):04d}"
+            super().save(*args, **kwargs)
\ No newline at end of file
@@ -4,8 +4,9 @@ from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
 from .models import LancamentoExtra
 from financeiro.models import ContasAReceber
-from workflow.models import Despesa
+from workflow.models import Despesa, DespesaParticipante
 from cadastros.models import Fornecedor, Cliente
+from core.grupos import grupos_do_usuario
 
 
 @receiver(post_save, sender=LancamentoExtra)
@@ -83,7 +84,7 @@ def automacao_extras(sender, instance, created, **kwargs):
         novo_wf.dias_cobertura = instance.dias_cobertura
         novo_wf.save()
     else:
-        grupos_resp = list(instance.administrativo.groups.values_list('name', flat=True))
+        grupos_resp = grupos_do_usuario(instance.administrativo)
         if 'Aprovador RH' in grupos_resp:
             status_inicial = 'AGUARDANDO_RH'
         else:
@@ -111,6 +112,8 @@ def automacao_extras(sender, instance, created, **kwargs):
         conta_receber_criada=novo_cr,
         workflow_criado=novo_wf
     )
+    # Índice de visibilidade do DespesaAdmin (Administrativo vê os extras dele)
+    DespesaParticipante.definir_responsavel_extra(novo_wf.pk, instance.administrativo_id)
 
 
 @receiver(post_delete, sender=LancamentoExtra)
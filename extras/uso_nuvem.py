@@ -0,0 +1,122 @@
+# extras/uso_nuvem.py
+#
+# Uso do armazenamento na nuvem (barra da página de armazenamento). A consulta
+# ao provedor nunca acontece durante o request: os números ficam no cache e
+#
+# - dentro de USO_NUVEM_TTL são servidos direto;
+# - vencidos (até USO_NUVEM_MAX_STALE) são servidos assim mesmo, marcados como
+#   desatualizados, enquanto uma thread busca os novos (stale-while-revalidate);
+# - sem nada no cache, a resposta é "pendente" e a atualização é disparada.
+#
+# O comando atualizar_uso_nuvem faz a mesma atualização (para agendar no cron).
+# settings.USO_NUVEM_CLIENTE escolhe o cliente: 'cloudinary' ou 'falso' (testes
+# e desenvolvimento, sem rede).
+
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+CHAVE_USO = 'uso_nuvem'
+CHAVE_ATUALIZANDO = 'uso_nuvem:atualizando'
+CHAVE_ERRO = 'uso_nuvem:erro'
+
+
+class ClienteCloudinary:
+    def uso(self):
+        import cloudinary
+        import cloudinary.api
+        cfg = settings.CLOUDINARY_STORAGE
+        cloudinary.config(
+            cloud_name=cfg['CLOUD_NAME'],
+            api_key=cfg['API_KEY'],
+            api_secret=cfg['API_SECRET'],
+        )
+        credits = cloudinary.api.usage().get('credits', {})
+        return {
+            'used': credits.get('usage', 0),
+            'limit': credits.get('limit', 25.0),
+            'percent': credits.get('used_percent', 0),
+        }
+
+
+class ClienteFalso:
+    """Números fixos (ou os passados), com atraso opcional para simular o provedor lento."""
+    chamadas = 0
+
+    def __init__(self, used=5.0, limit=25.0, atraso=0):
+        self.dados = {'used': used, 'limit': limit, 'percent': 100 * used / limit if limit else 0}
+        self.atraso = atraso
+
+    def uso(self):
+        ClienteFalso.chamadas += 1
+        time.sleep(self.atraso)
+        return dict(self.dados)
+
+
+CLIENTES = {
+    'cloudinary': ClienteCloudinary,
+    'falso': ClienteFalso,
+}
+
+
+def cliente_padrao():
+    return CLIENTES[getattr(settings, 'USO_NUVEM_CLIENTE', 'cloudinary')]()
+
+
+def _ttl():
+    return getattr(settings, 'USO_NUVEM_TTL', 300)
+
+
+def _max_stale():
+    return getattr(settings, 'USO_NUVEM_MAX_STALE', 24 * 60 * 60)
+
+
+def atualizar_uso(cliente=None):
+    """Consulta o provedor e grava no cache. Devolve a entrada gravada."""
+    try:
+        dados = (cliente or cliente_padrao()).uso()
+    except Exception as e:
+        cache.set(CHAVE_ERRO, str(e), _ttl())
+        raise
+    entrada = {'dados': dados, 'atualizado_em': time.time()}
+    cache.set(CHAVE_USO, entrada, _max_stale())
+    cache.delete(CHAVE_ERRO)
+    return entrada
+
+
+def _atualizar_em_thread(cliente):
+    try:
+        atualizar_uso(cliente)
+    except Exception:
+        pass  # fica registrado em CHAVE_ERRO; a próxima leitura tenta de novo
+    finally:
+        cache.delete(CHAVE_ATUALIZANDO)
+
+
+def disparar_atualizacao(cliente=None):
+    """Atualiza em segundo plano, uma thread por vez. Devolve a thread (ou None se já havia uma)."""
+    # cache.add só grava se a chave não existe: trava simples contra atualizações duplicadas
+    if not cache.add(CHAVE_ATUALIZANDO, True, 60):
+        return None
+    thread = threading.Thread(
+        target=_atualizar_em_thread, args=(cliente or cliente_padrao(),), name='uso-nuvem', daemon=True,
+    )
+    thread.start()
+    return thread
+
+
+def obter_uso(cliente=None):
+    """
+    Uso em cache, sem esperar o provedor: {'dados', 'atualizado_em',
+    'desatualizado'} ou {'pendente': True, 'erro': ...} quando ainda não há números.
+    """
+    entrada = cache.get(CHAVE_USO)
+    if entrada is None:
+        disparar_atualizacao(cliente)
+        return {'pendente': True, 'erro': cache.get(CHAVE_ERRO)}
+    desatualizado = time.time() - entrada['atualizado_em'] > _ttl()
+    if desatualizado:
+        disparar_atualizacao(cliente)
+    return {**entrada, 'desatualizado': desatualizado}
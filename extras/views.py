@@ -1,90 +1,109 @@
-from django.shortcuts import render
-from django.http import JsonResponse, HttpResponse
+from django.shortcuts import render, redirect, get_object_or_404
+from django.http import JsonResponse, FileResponse, Http404, StreamingHttpResponse
+from django.core.exceptions import PermissionDenied
 from django.contrib.admin.views.decorators import staff_member_required
-from django.conf import settings
 from django.contrib import messages
-import cloudinary
-import cloudinary.api
-import cloudinary.uploader
-import io, zipfile, urllib.request, os, mimetypes
+from datetime import datetime, timezone as dt_timezone
 
-
-def _configure_cloudinary():
-    cfg = settings.CLOUDINARY_STORAGE
-    cloudinary.config(
-        cloud_name=cfg['CLOUD_NAME'],
-        api_key=cfg['API_KEY'],
-        api_secret=cfg['API_SECRET'],
-    )
+from extras.uso_nuvem import obter_uso
+from workflow.arquivamento import (
+    iniciar_arquivamento, caminho_do_arquivo, arquivos_das_despesas, zip_em_streaming, marcar_interrompidos,
+)
+from workflow.models import ArquivamentoComprovantes
 
 
 @staff_member_required
 def cloudinary_usage_api(request):
     if not request.user.has_perm('workflow.view_cloudinary_storage'):
         return JsonResponse({'error': 'forbidden'}, status=403)
-    try:
-        _configure_cloudinary()
-        result = cloudinary.api.usage()
-        credits = result.get('credits', {})
-        used = credits.get('usage', 0)
-        limit = credits.get('limit', 25.0)
-        percent = credits.get('used_percent', 0)
-        return JsonResponse({
-            'used': round(used, 2),
-            'limit': round(limit, 2),
-            'percent': round(percent, 1),
-            'available': round(limit - used, 2),
-        })
-    except Exception as e:
-        return JsonResponse({'error': str(e)}, status=500)
+    # Sempre do cache: a consulta ao Cloudinary roda em segundo plano (extras/uso_nuvem.py)
+    uso = obter_uso()
+    if uso.get('pendente'):
+        return JsonResponse({'pendente': True, 'error': uso['erro']}, status=202)
+    dados = uso['dados']
+    used, limit = dados['used'], dados['limit']
+    return JsonResponse({
+        'used': round(used, 2),
+        'limit': round(limit, 2),
+        'percent': round(dados['percent'], 1),
+        'available': round(limit - used, 2),
+        'updated_at': datetime.fromtimestamp(uso['atualizado_em'], tz=dt_timezone.utc).isoformat(),
+        'stale': uso['desatualizado'],
+    })
 
 
 @staff_member_required
 def cloudinary_storage_page(request):
     if not request.user.has_perm('workflow.view_cloudinary_storage'):
-        from django.core.exceptions import PermissionDenied
         raise PermissionDenied
 
     from workflow.models import Despesa
 
     if request.method == 'POST':
         ids = request.POST.getlist('ids')
-        despesas = Despesa.objects.filter(id__in=ids).exclude(comprovante='').exclude(comprovante__isnull=True)
-        _configure_cloudinary()
-        buffer = io.BytesIO()
-        total, erros = 0, 0
-        with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as zf:
-            for despesa in despesas:
-                try:
-                    url = despesa.comprovante.url
-                    with urllib.request.urlopen(url) as resp:
-                        data = resp.read()
-                        content_type = resp.headers.get('Content-Type', '').split(';')[0].strip()
-                        ext = mimetypes.guess_extension(content_type) or ''
-                        # mimetypes pode retornar .jpe/.jpeg → normaliza para .jpg
-                        ext = {'.jpe': '.jpg', '.jpeg': '.jpg'}.get(ext, ext)
-                    if not ext:
-                        _, ext = os.path.splitext(despesa.comprovante.name)
-                    ext = ext.lstrip('.').lower() or 'bin'
-                    nome = f"ocorrencia_{despesa.id}_comprovante.{ext}"
-                    zf.writestr(nome, data)
-                    public_id = despesa.comprovante.name.rsplit('.', 1)[0]
-                    cloudinary.uploader.destroy(public_id, resource_type='raw', invalidate=True)
-                    cloudinary.uploader.destroy(public_id, resource_type='image', invalidate=True)
-                    despesa.comprovante = None
-                    despesa.save(update_fields=['comprovante'])
-                    total += 1
-                except Exception:
-                    erros += 1
-        buffer.seek(0)
-        response = HttpResponse(buffer, content_type='application/zip')
-        response['Content-Disposition'] = 'attachment; filename="comprovantes_malupe.zip"'
-        return response
+        if request.POST.get('acao') == 'baixar':
+            # Só download, mantendo na nuvem: ZIP enviado em streaming
+            response = StreamingHttpResponse(
+                zip_em_streaming(arquivos_das_despesas(ids)), content_type='application/zip'
+            )
+            response['Content-Disposition'] = 'attachment; filename="comprovantes_malupe.zip"'
+            return response
+        # Download e remoção rodam em segundo plano; acompanha pela página de status
+        job = iniciar_arquivamento(request.user, ids)
+        return redirect('arquivamento_status', pk=job.pk)
 
+    marcar_interrompidos()
     despesas = Despesa.objects.exclude(comprovante='').exclude(comprovante__isnull=True).order_by('-id')
     context = {
         'title': 'Armazenamento Cloudinary',
         'despesas': despesas,
+        'arquivamentos': ArquivamentoComprovantes.objects.filter(usuario=request.user)[:5],
         'opts': Despesa._meta,
     }
     return render(request, 'admin/workflow/cloudinary_storage.html', context)
+
+
+def _arquivamento_do_usuario(request, pk):
+    if not request.user.has_perm('workflow.view_cloudinary_storage'):
+        raise PermissionDenied
+    job = get_object_or_404(ArquivamentoComprovantes, pk=pk)
+    if job.usuario_id != request.user.pk and not request.user.is_superuser:
+        raise PermissionDenied
+    return job
+
+
+@staff_member_required
+def arquivamento_status(request, pk):
+    # Thread morta com o worker (reload, timeout): sem isso a página acompanharia para sempre
+    marcar_interrompidos()
+    job = _arquivamento_do_usuario(request, pk)
+    if request.GET.get('formato') == 'json':
+        return JsonResponse({
+            'status': job.status,
+            'status_label': job.get_status_display(),
+            'total': job.total,
+            'baixados': job.baixados,
+            'erros': job.erros,
+            'removidos': job.removidos,
+            'percentual': job.percentual,
+            'mensagem': job.mensagem,
+            'pronto': bool(job.arquivo) and job.status == 'CONCLUIDO',
+        })
+    context = {
+        'title': f'Arquivamento de Comprovantes #{job.pk}',
+        'job': job,
+        'opts': ArquivamentoComprovantes._meta,
+    }
+    return render(request, 'admin/workflow/arquivamento_status.html', context)
+
+
+@staff_member_required
+def arquivamento_download(request, pk):
+    job = _arquivamento_do_usuario(request, pk)
+    caminho = caminho_do_arquivo(job)
+    if job.status != 'CONCLUIDO' or caminho is None or not caminho.exists():
+        raise Http404("Arquivo do arquivamento não disponível.")
+    return FileResponse(
+        open(caminho, 'rb'), as_attachment=True, filename='comprovantes_malupe.zip',
+        content_type='application/zip',
+    )
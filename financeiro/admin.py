@@ -20,6 +20,7 @@ def fmt_brl(valor):
     """Formata número no padrão BR: milhar com ponto, decimal com vírgula."""
     return '{:,.2f}'.format(float(valor)).replace(',', 'X').replace('.', ',').replace('X', '.')
 from .resources import ContasAPagarResource, ContasAReceberResource
+from .baixas import alterar_status_titulos
 from cadastros.models import Cliente
 from django.contrib.auth.models import Group
 from core.models import UsuarioCustomizado
@@ -381,30 +382,19 @@ class BancoSaldoFilter(admin.SimpleListFilter):
 # --- AÇÕES EM MASSA ---
 @admin.action(description='✅ Baixar/Pagar Selecionados')
 def marcar_como_pago(modeladmin, request, queryset):
-    hoje = timezone.now().date()
-    for obj in queryset:
-        obj.status = 'PAGO'
-        obj.data_baixa = hoje
-        obj.usuario_baixa = request.user
-        obj.save()
+    alterar_status_titulos(queryset, 'PAGO', data_baixa=timezone.now().date(), usuario_baixa=request.user)
     modeladmin.message_user(request, "Registros marcados como PAGO.")
 
 
 @admin.action(description='❌ Cancelar Selecionados')
 def marcar_como_cancelado(modeladmin, request, queryset):
-    for obj in queryset:
-        obj.status = 'CANCELADO'
-        obj.save()
+    alterar_status_titulos(queryset, 'CANCELADO')
     modeladmin.message_user(request, "Registros CANCELADOS.")
 
 
 @admin.action(description='🔄 Voltar para Pendente')
 def marcar_como_pendente(modeladmin, request, queryset):
-    for obj in queryset:
-        obj.status = 'PENDENTE'
-        obj.data_baixa = None
-        obj.usuario_baixa = None
-        obj.save()
+    alterar_status_titulos(queryset, 'PENDENTE', data_baixa=None, usuario_baixa=None)
     modeladmin.message_user(request, "Registros voltaram para PENDENTE.")
 
 
@@ -442,6 +432,8 @@ def gerar_fixos_mensais(modeladmin, request, queryset):
 class ContasAPagarAdmin(ImportExportModelAdmin):
     resource_classes = [ContasAPagarResource]
     list_display = ('nota', 'fornecedor', 'vencimento', 'valor', 'status_visual', 'responsavel_pagamento', 'data_baixa', 'usuario_baixa')
+    # FKs anuláveis: sem isto o select_related automático do changelist não as segue
+    list_select_related = ('fornecedor', 'responsavel_pagamento', 'usuario_baixa')
     search_fields = ('fornecedor__razao_social', 'nota', 'observacoes')
     list_filter = (
         StatusFilter,
@@ -454,7 +446,7 @@ class ContasAPagarAdmin(ImportExportModelAdmin):
         FornecedorSearchFilter,
     )
     date_hierarchy = 'vencimento'
-    readonly_fields = ('data_baixa', 'usuario_baixa')
+    readonly_fields = ('data_baixa', 'usuario_baixa', 'despesa_origem')
     exclude = ('nota',)
     actions = [marcar_como_pago, marcar_como_cancelado, marcar_como_pendente, gerar_fixos_mensais]
 
@@ -773,20 +765,41 @@ class MovimentacaoInline(admin.TabularInline):
     def has_delete_permission(self, request, obj=None):
         return False
 
-    def _get_despesa(self, obj):
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('referencia_cp')
+
+    @staticmethod
+    def _despesa_id(referencia_despesa_id, descricao):
         import re
-        from workflow.models import Despesa
-        despesa_id = obj.referencia_despesa_id
-        if not despesa_id:
-            match = re.search(r'#(\d+)', obj.descricao or '')
-            if match:
-                despesa_id = int(match.group(1))
-        if despesa_id:
-            try:
-                return Despesa.objects.get(pk=despesa_id)
-            except Despesa.DoesNotExist:
-                return None
-        return None
+        if referencia_despesa_id:
+            return referencia_despesa_id
+        match = re.search(r'#(\d+)', descricao or '')
+        return int(match.group(1)) if match else None
+
+    def _dados_wf(self, saldo_id):
+        """
+        {mov_id: despesa} de todas as movimentações do ciclo, com a data do último
+        CONFERIDO anotada — duas consultas por ciclo, em vez de duas por linha.
+        A instância do inline é criada a cada requisição, então o cache vive só nela.
+        """
+        cache = self.__dict__.setdefault('_cache_wf', {})
+        if saldo_id not in cache:
+            from django.db.models import Max, Q
+            from workflow.models import Despesa
+            despesa_por_mov = {
+                mov_id: self._despesa_id(ref_id, descricao)
+                for mov_id, ref_id, descricao in MovimentacaoSupervisor.objects.filter(
+                    saldo_supervisor_id=saldo_id
+                ).values_list('pk', 'referencia_despesa_id', 'descricao')
+            }
+            despesas = Despesa.objects.filter(pk__in=set(despesa_por_mov.values()) - {None}).annotate(
+                conferido_em=Max('logs__data_hora', filter=Q(logs__acao='CONFERIDO'))
+            ).only('pk', 'observacoes').in_bulk()
+            cache[saldo_id] = {mov_id: despesas.get(d_id) for mov_id, d_id in despesa_por_mov.items()}
+        return cache[saldo_id]
+
+    def _get_despesa(self, obj):
+        return self._dados_wf(obj.saldo_supervisor_id).get(obj.pk)
 
     def tipo_display(self, obj):
         if obj.tipo == 'CREDITO':
@@ -811,13 +824,8 @@ class MovimentacaoInline(admin.TabularInline):
     valor_display.short_description = "Valor"
 
     def link_origem(self, obj):
-        import re
         from django.urls import reverse
-        despesa_id = obj.referencia_despesa_id
-        if not despesa_id:
-            match = re.search(r'#(\d+)', obj.descricao or '')
-            if match:
-                despesa_id = int(match.group(1))
+        despesa_id = self._despesa_id(obj.referencia_despesa_id, obj.descricao)
         if despesa_id:
             url = reverse('admin:workflow_despesa_change', args=[despesa_id])
             return format_html('<a href="{}" target="_blank">WF #{}</a>', url, despesa_id)
@@ -829,13 +837,8 @@ class MovimentacaoInline(admin.TabularInline):
 
     def wf_data_alteracao(self, obj):
         despesa = self._get_despesa(obj)
-        if despesa:
-            from workflow.models import LogWorkflow
-            log = LogWorkflow.objects.filter(
-                despesa=despesa, acao='CONFERIDO'
-            ).order_by('-data_hora').first()
-            if log:
-                return log.data_hora.strftime('%d/%m/%Y %H:%M')
+        if despesa and despesa.conferido_em:
+            return despesa.conferido_em.strftime('%d/%m/%Y %H:%M')
         return '—'
     wf_data_alteracao.short_description = "Conferido em (WF)"
 
@@ -865,6 +868,13 @@ class SaldoSupervisorAdmin(admin.ModelAdmin):
     def has_delete_permission(self, request, obj=None):
         return False
 
+    def get_queryset(self, request):
+        # Utilização vem de total_debitos; o saldo só é anotado para a ordenação da coluna
+        from django.db.models import F
+        return super().get_queryset(request).select_related('supervisor').annotate(
+            saldo_total=F('saldo_disponivel') - F('total_debitos'),
+        )
+
     def changeform_view(self, request, object_id=None, form_url='', extra_context=None):
         from django.utils import timezone as tz
         from django.http import HttpResponseRedirect
@@ -1062,12 +1072,14 @@ class SaldoSupervisorAdmin(admin.ModelAdmin):
     def utilizacao_display(self, obj):
         return format_html('<span style="color:#e74c3c;font-weight:bold;">R$ {}</span>', fmt_brl(obj.utilizacao))
     utilizacao_display.short_description = "Utilização"
+    utilizacao_display.admin_order_field = 'total_debitos'
 
     def saldo_display(self, obj):
         saldo = obj.saldo
         cor = '#27ae60' if saldo >= 0 else '#e74c3c'
         return format_html('<span style="color:{};font-weight:bold;">R$ {}</span>', cor, fmt_brl(saldo))
     saldo_display.short_description = "Saldo"
+    saldo_display.admin_order_field = 'saldo_total'
 
 
 # --- REGISTROS FINAIS ---
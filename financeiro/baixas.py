@@ -0,0 +1,164 @@
+# financeiro/baixas.py
+#
+# Troca de status em massa de CP/CR (ações do admin). O resultado é o mesmo de
+# chamar save() em cada título — BaseSaldo, SaldoDiarioBanco e crédito/estorno
+# no Saldo Supervisor —, mas com um UPDATE nos títulos, bulk_create/bulk_update
+# na BaseSaldo e um UPDATE F() por saldo de supervisor, tudo numa transação.
+
+from collections import OrderedDict
+from datetime import date
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import F
+
+from financeiro.models import (
+    ContasAPagar, BaseSaldo, SaldoSupervisor, MovimentacaoSupervisor,
+)
+from financeiro.saldos import movimentos_titulo, aplicar_movimentos, dados_base_saldo
+
+
+def alterar_status_titulos(queryset, status, **campos):
+    """
+    Aplica `status` (e os demais `campos`, ex.: data_baixa/usuario_baixa) a todos
+    os títulos do queryset de ContasAPagar ou ContasAReceber. Retorna quantos
+    títulos foram alterados.
+    """
+    modelo = queryset.model
+    tipo = 'CP' if modelo is ContasAPagar else 'CR'
+    relacionados = ['banco', 'usuario_baixa'] + (
+        ['fornecedor', 'empresa_pagadora'] if tipo == 'CP' else ['cliente', 'empresa_prestadora']
+    )
+
+    with transaction.atomic():
+        titulos = list(
+            modelo.objects.filter(pk__in=queryset.values('pk'))
+            .select_related(*relacionados).select_for_update(of=('self',)).order_by('pk')
+        )
+        if not titulos:
+            return 0
+        anteriores = {t.pk: (t.status, _movimentos(tipo, t)) for t in titulos}
+
+        # Mesma regra do save(): título pago sem data de baixa é baixado hoje
+        if status == 'PAGO' and 'data_baixa' not in campos:
+            hoje = date.today()
+            modelo.objects.filter(pk__in=anteriores, data_baixa__isnull=True).update(data_baixa=hoje)
+            for t in titulos:
+                t.data_baixa = t.data_baixa or hoje
+        modelo.objects.filter(pk__in=anteriores).update(status=status, **campos)
+        for t in titulos:
+            t.status = status
+            for campo, valor in campos.items():
+                setattr(t, campo, valor)
+
+        if tipo == 'CP':
+            _saldo_supervisor(titulos, {pk: st for pk, (st, _) in anteriores.items()})
+
+        aplicar_movimentos(
+            [m for _, movs in anteriores.values() for m in movs],
+            [m for t in titulos for m in _movimentos(tipo, t)],
+        )
+        _base_saldo(tipo, titulos)
+    return len(titulos)
+
+
+def _movimentos(tipo, titulo):
+    return movimentos_titulo(tipo, titulo.banco_id, titulo.status, titulo.data_baixa, titulo.valor)
+
+
+def _base_saldo(tipo, titulos):
+    """Cria/atualiza a linha de BaseSaldo dos pagos e remove a dos demais (signals de CP/CR)."""
+    pagos = {t.pk: t for t in titulos if t.status == 'PAGO'}
+    BaseSaldo.objects.filter(
+        origem=tipo, id_origem__in=[t.pk for t in titulos if t.pk not in pagos]
+    ).delete()
+
+    existentes = {b.id_origem: b for b in BaseSaldo.objects.filter(origem=tipo, id_origem__in=pagos)}
+    novas, alteradas = [], []
+    for pk, titulo in pagos.items():
+        dados = dados_base_saldo(tipo, titulo)
+        linha = existentes.get(pk)
+        if linha:
+            for campo, valor in dados.items():
+                setattr(linha, campo, valor)
+            alteradas.append(linha)
+        else:
+            novas.append(BaseSaldo(origem=tipo, id_origem=pk, **dados))
+    BaseSaldo.objects.bulk_create(novas, batch_size=500)
+    if alteradas:
+        BaseSaldo.objects.bulk_update(alteradas, list(dados_base_saldo(tipo, titulos[0])), batch_size=500)
+
+
+def _saldo_supervisor(titulos, status_anterior):
+    """Crédito, estorno e cancelamento no Saldo Supervisor (ContasAPagar._save_logic), agrupados."""
+    creditos = OrderedDict()
+    estornos, cancelamentos = [], []
+    for t in titulos:
+        if not t.supervisor_id:
+            continue
+        anterior = status_anterior[t.pk]
+        if t.status == 'PAGO' and anterior != 'PAGO':
+            creditos.setdefault(t.supervisor_id, []).append(t)
+        if anterior == 'PAGO' and t.status not in ('PAGO', 'CANCELADO'):
+            estornos.append(t.pk)
+        if t.status == 'CANCELADO' and anterior not in (None, 'CANCELADO'):
+            cancelamentos.append(t.pk)
+
+    if creditos:
+        _creditar(creditos)
+    if estornos:
+        _estornar(_primeira_movimentacao(estornos))
+    if cancelamentos:
+        _cancelar(_primeira_movimentacao(cancelamentos))
+
+
+def _primeira_movimentacao(ids_cp):
+    """A movimentação que o save() acharia com .filter(referencia_cp=...).first(), por CP."""
+    primeiras = {}
+    for mov in MovimentacaoSupervisor.objects.filter(referencia_cp_id__in=ids_cp):
+        primeiras.setdefault(mov.referencia_cp_id, mov)
+    return list(primeiras.values())
+
+
+def _creditar(creditos):
+    abertos = {}
+    for saldo in SaldoSupervisor.objects.filter(
+        supervisor_id__in=list(creditos), status='ABERTO'
+    ).order_by('-data_inicio'):
+        abertos.setdefault(saldo.supervisor_id, saldo)
+
+    movimentacoes = []
+    for supervisor_id, titulos in creditos.items():
+        saldo = abertos.get(supervisor_id) or SaldoSupervisor.objects.create(supervisor_id=supervisor_id)
+        SaldoSupervisor.objects.filter(pk=saldo.pk).update(
+            saldo_disponivel=F('saldo_disponivel') + sum((t.valor for t in titulos), Decimal('0'))
+        )
+        movimentacoes += [
+            MovimentacaoSupervisor(
+                saldo_supervisor=saldo, tipo='CREDITO', valor=t.valor,
+                descricao=f"CP {t.nota} — {t.fornecedor}", referencia_cp=t,
+            )
+            for t in titulos
+        ]
+    MovimentacaoSupervisor.objects.bulk_create(movimentacoes, batch_size=500)
+
+
+def _estornar(movimentacoes):
+    por_saldo = {}
+    for mov in movimentacoes:
+        por_saldo[mov.saldo_supervisor_id] = por_saldo.get(mov.saldo_supervisor_id, Decimal('0')) + mov.valor
+    for saldo_id, total in por_saldo.items():
+        SaldoSupervisor.objects.filter(pk=saldo_id).update(saldo_disponivel=F('saldo_disponivel') - total)
+    MovimentacaoSupervisor.objects.filter(pk__in=[m.pk for m in movimentacoes]).delete()
+    # Ciclo sem movimentações é removido para não bloquear novo crédito
+    SaldoSupervisor.objects.filter(pk__in=list(por_saldo), movimentacoes__isnull=True).delete()
+
+
+def _cancelar(movimentacoes):
+    saldos = {m.saldo_supervisor_id for m in movimentacoes}
+    sem_debitos = list(
+        SaldoSupervisor.objects.filter(pk__in=saldos)
+        .exclude(movimentacoes__tipo='DEBITO').values_list('pk', flat=True)
+    )
+    MovimentacaoSupervisor.objects.filter(saldo_supervisor_id__in=sem_debitos).delete()
+    SaldoSupervisor.objects.filter(pk__in=sem_debitos).update(saldo_disponivel=0, status='CANCELADO')
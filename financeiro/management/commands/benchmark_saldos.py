@@ -0,0 +1,106 @@
+# financeiro/management/commands/benchmark_saldos.py
+
+import random
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from cadastros.models import Banco, Empresa, Fornecedor, Cliente
+from financeiro.models import ContasAPagar, ContasAReceber, Transferencia, BaseSaldo
+from financeiro.saldos import calcular_saldos_bancos
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Popula (dentro de uma transação desfeita ao final) milhares de CP/CR/Transferências "
+        "e mede o número de consultas de calcular_saldos_bancos para quantidades crescentes "
+        "de bancos. Falha se o número de consultas crescer junto com os bancos."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--bancos', type=int, nargs='+', default=[5, 30, 100])
+        parser.add_argument('--linhas', type=int, default=3000, help="Linhas de CP, de CR e de Transferência.")
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **opts):
+        resultados = []
+        try:
+            with transaction.atomic():
+                for qtd_bancos in opts['bancos']:
+                    bancos = self._popular(qtd_bancos, opts['linhas'], opts['seed'])
+                    qs = Banco.objects.filter(pk__in=[b.pk for b in bancos])
+                    inicio = time.perf_counter()
+                    with CaptureQueriesContext(connection) as ctx:
+                        calcular_saldos_bancos(date.today(), bancos=qs)
+                    ms = (time.perf_counter() - inicio) * 1000
+                    resultados.append((qtd_bancos, len(ctx.captured_queries), ms))
+                    self.stdout.write(f"{qtd_bancos:>5} bancos: {len(ctx.captured_queries)} consultas, {ms:.1f} ms")
+                raise _Rollback
+        except _Rollback:
+            pass
+
+        consultas = {r[1] for r in resultados}
+        if len(consultas) > 1:
+            raise CommandError(f"Número de consultas variou com a quantidade de bancos: {sorted(consultas)}")
+        self.stdout.write(self.style.SUCCESS("OK — número de consultas constante."))
+
+    def _popular(self, qtd_bancos, linhas, seed):
+        rnd = random.Random(seed + qtd_bancos)
+        hoje = date.today()
+        sufixo = f"BENCH-{qtd_bancos}"
+
+        empresa = Empresa.objects.create(nome=f"Empresa {sufixo}")
+        fornecedor = Fornecedor.objects.create(razao_social=f"Fornecedor {sufixo}", cnpj_cpf=sufixo)
+        cliente = Cliente.objects.create(razao_social=f"Cliente {sufixo}", forma_recebimento='PIX')
+        bancos = Banco.objects.bulk_create([
+            Banco(nome=f"Banco {sufixo}-{i}", saldo_inicial=Decimal('1000')) for i in range(qtd_bancos)
+        ])
+
+        def _valor():
+            return Decimal(rnd.randint(100, 100000)) / 100
+
+        def _data():
+            return hoje - timedelta(days=rnd.randint(0, 720))
+
+        # bulk_create não dispara signals — a BaseSaldo não é necessária para o cálculo
+        ContasAPagar.objects.bulk_create([
+            ContasAPagar(
+                fornecedor=fornecedor, empresa_pagadora=empresa, banco=rnd.choice(bancos),
+                data_emissao=d, vencimento=d, nota=f"{sufixo}-CP-{i}", valor=_valor(),
+                status=rnd.choice(['PAGO', 'PAGO', 'PENDENTE']), data_baixa=d,
+            )
+            for i, d in ((i, _data()) for i in range(linhas))
+        ], batch_size=500)
+        ContasAReceber.objects.bulk_create([
+            ContasAReceber(
+                cliente=cliente, empresa_prestadora=empresa, banco=rnd.choice(bancos),
+                data_emissao=d, vencimento=d, nota=f"{sufixo}-CR-{i}", valor=_valor(),
+                status=rnd.choice(['PAGO', 'PAGO', 'PENDENTE']), data_baixa=d,
+            )
+            for i, d in ((i, _data()) for i in range(linhas))
+        ], batch_size=500)
+        Transferencia.objects.bulk_create([
+            Transferencia(
+                data=_data(), valor=_valor(), empresa=empresa,
+                banco_origem=rnd.choice(bancos), banco_destino=rnd.choice(bancos),
+                status=rnd.choice(['DEFINITIVA', 'TEMP_PENDENTE', 'CANCELADA']),
+            )
+            for _ in range(linhas)
+        ], batch_size=500)
+        BaseSaldo.objects.bulk_create([
+            BaseSaldo(
+                origem='SSUP', id_origem=i, nome=f"SSUP {sufixo}", empresa='-',
+                data_emissao=d, banco=rnd.choice(bancos).nome, vencimento=d,
+                valor=_valor(), status='PAGO', data_baixa=d,
+            )
+            for i, d in ((i, _data()) for i in range(linhas // 10))
+        ], batch_size=500)
+        return bancos
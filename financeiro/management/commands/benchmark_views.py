@@ -0,0 +1,191 @@
+# financeiro/management/commands/benchmark_views.py
+
+import json
+import statistics
+import subprocess
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth.models import Group, Permission
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from core.models import UsuarioCustomizado
+from financeiro.management.commands.seed_volume import GeradorVolume
+from workflow.models import Despesa
+
+
+class _Rollback(Exception):
+    pass
+
+
+# (nome, url, parâmetros GET, usuário, máximo de consultas, máximo de ms na mediana)
+# O limite de consultas é o que pega regressão de N+1; o de tempo é generoso e
+# pode ser ajustado à máquina com --fator-tempo.
+ORCAMENTOS = [
+    ("dashboard_financeiro", 'dashboard_gerencial', {}, 'admin', 15, 800),
+    ("dashboard_financeiro (histórico)", 'dashboard_gerencial',
+     {'filtro_vencimento': (date.today() - timedelta(days=90)).isoformat()}, 'admin', 15, 800),
+    ("fluxo_de_caixa", 'fluxo_de_caixa', {}, 'admin', 15, 1500),
+    ("painel_sla", 'painel_sla', {}, 'admin', 20, 1500),
+    ("painel_sla_tabela", 'painel_sla_tabela', {}, 'admin', 15, 1000),
+    ("relatorio_coberturas", 'relatorio_coberturas', {}, 'admin', 15, 1000),
+    ("ContasAPagarAdmin changelist", 'admin:financeiro_contasapagar_changelist', {}, 'admin', 20, 1500),
+    ("DespesaAdmin changelist", 'admin:workflow_despesa_changelist', {}, 'admin', 20, 1500),
+    ("DespesaAdmin changelist (RH)", 'admin:workflow_despesa_changelist', {}, 'rh', 20, 1500),
+    # Página só de despesas FOLHA: a coluna Despesa mostra a folha (pagamento → folha → tomador)
+    ("DespesaAdmin changelist (FOLHA)", 'admin:workflow_despesa_changelist',
+     {'tipo_lancamento__exact': 'FOLHA'}, 'admin', 20, 1500),
+]
+
+
+class _TempoSQL:
+    """execute_wrapper que soma o tempo gasto no banco (o captured_queries arredonda em ms)."""
+    def __init__(self):
+        self.segundos = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        inicio = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.segundos += time.perf_counter() - inicio
+
+
+def _commit_atual():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR,
+            capture_output=True, text=True, timeout=5,
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = (
+        "Gera a base do seed_volume (dentro de uma transação desfeita ao final) e mede, pelo "
+        "cliente de testes do Django, o tempo e o número de consultas dos painéis e changelists "
+        "mais usados. Grava o resultado em JSON e falha se alguma view estourar o orçamento."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--escala', type=float, default=0.1,
+                            help="Escala da base do seed_volume (0.1 ≈ 3 mil CP e 2 mil despesas).")
+        parser.add_argument('--hoje', type=date.fromisoformat, default=None,
+                            help="Data de referência da base AAAA-MM-DD (padrão: hoje).")
+        parser.add_argument('--repeticoes', type=int, default=5, help="Requisições medidas por view (após a primeira).")
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--saida', help="Arquivo JSON com o resultado (padrão: só imprime).")
+        parser.add_argument('--fator-tempo', type=float, default=1.0,
+                            help="Multiplica os limites de tempo (máquinas mais lentas, CI).")
+        parser.add_argument('--so', nargs='+', metavar='VIEW', help="Mede só as views com estes nomes.")
+
+    def handle(self, *args, **opts):
+        orcamentos = [o for o in ORCAMENTOS if not opts['so'] or o[0] in opts['so']]
+        if not orcamentos:
+            raise CommandError(f"Nenhuma view com esses nomes. Disponíveis: {', '.join(o[0] for o in ORCAMENTOS)}")
+
+        # Cache isolado: não lê nem suja o cache real (resumo por status, grupos)
+        caches = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'benchmark'}}
+        resultados = []
+        with override_settings(ALLOWED_HOSTS=['*'], CACHES=caches, DEBUG=False):
+            try:
+                with transaction.atomic():
+                    usuarios = self._popular(opts)
+                    for nome, url, params, perfil, max_consultas, max_ms in orcamentos:
+                        resultado = self._medir(usuarios[perfil], reverse(url), params, opts['repeticoes'])
+                        resultado.update(
+                            nome=nome, usuario=perfil, max_consultas=max_consultas,
+                            max_ms=round(max_ms * opts['fator_tempo'], 1),
+                        )
+                        resultados.append(resultado)
+                        self._imprimir(resultado)
+                    raise _Rollback
+            except _Rollback:
+                pass
+
+        relatorio = {
+            'commit': _commit_atual(),
+            'executado_em': timezone.now().isoformat(),
+            'banco': connection.vendor,
+            'escala': opts['escala'],
+            'seed': opts['seed'],
+            'repeticoes': opts['repeticoes'],
+            'views': resultados,
+        }
+        if opts['saida']:
+            Path(opts['saida']).write_text(json.dumps(relatorio, ensure_ascii=False, indent=2), encoding='utf-8')
+            self.stdout.write(f"Resultado gravado em {opts['saida']}")
+
+        estouros = [r['nome'] for r in resultados if r['problemas']]
+        if estouros:
+            raise CommandError(f"Fora do orçamento: {', '.join(estouros)}")
+        self.stdout.write(self.style.SUCCESS("OK — todas as views dentro do orçamento."))
+
+    def _medir(self, usuario, url, params, repeticoes):
+        client = Client()
+        client.force_login(usuario)
+
+        # Primeira requisição: caches frios. É a que conta para o limite de consultas.
+        sql = _TempoSQL()
+        with CaptureQueriesContext(connection) as ctx, connection.execute_wrapper(sql):
+            inicio = time.perf_counter()
+            resposta = client.get(url, params)
+            fria_ms = (time.perf_counter() - inicio) * 1000
+        consultas = len(ctx.captured_queries)
+
+        tempos = []
+        for _ in range(repeticoes):
+            inicio = time.perf_counter()
+            client.get(url, params)
+            tempos.append((time.perf_counter() - inicio) * 1000)
+
+        return {
+            'url': url,
+            'params': params,
+            'status': resposta.status_code,
+            'consultas': consultas,
+            'sql_ms': round(sql.segundos * 1000, 1),
+            'fria_ms': round(fria_ms, 1),
+            'mediana_ms': round(statistics.median(tempos), 1) if tempos else round(fria_ms, 1),
+            'max_ms_medido': round(max(tempos), 1) if tempos else round(fria_ms, 1),
+        }
+
+    def _imprimir(self, r):
+        r['problemas'] = []
+        if r['status'] != 200:
+            r['problemas'].append(f"HTTP {r['status']}")
+        if r['consultas'] > r['max_consultas']:
+            r['problemas'].append(f"{r['consultas']} consultas (máx. {r['max_consultas']})")
+        if r['mediana_ms'] > r['max_ms']:
+            r['problemas'].append(f"{r['mediana_ms']} ms (máx. {r['max_ms']})")
+
+        linha = (
+            f"{r['nome']:<36} {r['consultas']:>4} consultas  {r['sql_ms']:>8.1f} ms SQL  "
+            f"fria {r['fria_ms']:>8.1f} ms  mediana {r['mediana_ms']:>8.1f} ms"
+        )
+        if r['problemas']:
+            self.stdout.write(self.style.ERROR(f"✗ {linha}  ← {'; '.join(r['problemas'])}"))
+        else:
+            self.stdout.write(f"✓ {linha}")
+
+    def _popular(self, opts):
+        """Base do seed_volume (mesma seed e data, mesma base) mais os dois usuários medidos."""
+        gerador = GeradorVolume(seed=opts['seed'], escala=opts['escala'], hoje=opts['hoje'], prefixo='BENCH')
+        gerador.gerar()
+        if not Despesa.objects.filter(tipo_lancamento='FOLHA').exists():
+            raise CommandError("A base gerada não tem despesas FOLHA; aumente --escala.")
+
+        admin = UsuarioCustomizado.objects.create_superuser('__benchmark_admin__', password=None)
+        rh = gerador.por_grupo['Aprovador RH'][0]
+        Group.objects.get(name='Aprovador RH').permissions.add(*Permission.objects.filter(
+            content_type__app_label='workflow', codename__in=['view_despesa', 'change_despesa'],
+        ))
+        return {'admin': admin, 'rh': rh}
@@ -0,0 +1,159 @@
+# financeiro/management/commands/migrar_sqlite_postgres.py
+
+import time
+from pathlib import Path
+
+from django.apps import apps
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import connection, connections, transaction
+from django.db.migrations.recorder import MigrationRecorder
+
+from financeiro.management.commands.seed_volume import _datas_do_historico
+from financeiro.saldos import reconstruir_saldo_diario
+from financeiro.sequencias import sincronizar_sequencias
+
+ORIGEM = 'sqlite_origem'
+
+# Tabelas que o próprio migrate preenche no banco novo (tipos de conteúdo,
+# permissões, contador SS da 0021): são sempre substituídas pelas do SQLite,
+# com os mesmos ids, para as referências a elas continuarem valendo.
+SEMEADAS_PELO_MIGRATE = {'contenttypes.contenttype', 'auth.permission', 'financeiro.sequencial'}
+
+
+class Command(BaseCommand):
+    help = (
+        "Copia todos os dados do SQLite para o PostgreSQL configurado (DB_HOST), em lotes e numa "
+        "única transação, mantendo os ids. No fim acerta as sequências de autoincremento e as "
+        "sequências nativas do Sequencial, confere a contagem de cada tabela e recalcula a foto diária de saldos. Rode o migrate "
+        "no PostgreSQL antes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--origem', default=str(settings.BASE_DIR / 'db.sqlite3'),
+                            help="Arquivo SQLite de origem (padrão: db.sqlite3 do projeto).")
+        parser.add_argument('--lote', type=int, default=2000, help="Linhas por INSERT.")
+        parser.add_argument('--substituir', action='store_true',
+                            help="Apaga o que já existir no PostgreSQL antes de copiar.")
+
+    def handle(self, *args, **opts):
+        if connection.vendor != 'postgresql':
+            raise CommandError(
+                f"O banco configurado é {connection.vendor}; defina DB_HOST/DB_NAME/DB_USER/DB_PASSWORD "
+                "para apontar para o PostgreSQL de destino."
+            )
+        origem = Path(opts['origem'])
+        if not origem.exists():
+            raise CommandError(f"Arquivo SQLite não encontrado: {origem}")
+
+        self._conectar_origem(origem)
+        try:
+            self._conferir_migracoes()
+            modelos = self._modelos()
+            inicio = time.perf_counter()
+            with transaction.atomic():
+                self._preparar_destino(modelos, opts['substituir'])
+                with _datas_do_historico(*modelos):
+                    for modelo in modelos:
+                        self._copiar(modelo, opts['lote'])
+                self._acertar_sequencias(modelos)
+                self._conferir_contagens(modelos)
+                # A foto diária foi somada pelo SQLite em ponto flutuante (diferenças de
+                # centavos em somas grandes); no PostgreSQL a soma é decimal exata.
+                dias = reconstruir_saldo_diario()
+                self.stdout.write(f"Foto diária de saldos recalculada no PostgreSQL ({dias} linha(s)).")
+        finally:
+            connections[ORIGEM].close()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(modelos)} tabela(s) copiada(s) em {time.perf_counter() - inicio:.1f} s."
+        ))
+
+    def _conectar_origem(self, caminho):
+        config = {**connections.settings, ORIGEM: {'ENGINE': 'django.db.backends.sqlite3', 'NAME': str(caminho)}}
+        connections.settings[ORIGEM] = connections.configure_settings(config)[ORIGEM]
+
+    def _conferir_migracoes(self):
+        """Os dois bancos precisam estar no mesmo ponto das migrações (mesmas colunas)."""
+        na_origem = set(MigrationRecorder(connections[ORIGEM]).applied_migrations())
+        no_destino = set(MigrationRecorder(connection).applied_migrations())
+        if na_origem != no_destino:
+            faltando = sorted(f"{app}.{nome}" for app, nome in na_origem ^ no_destino)
+            raise CommandError(
+                "As migrações aplicadas no SQLite e no PostgreSQL são diferentes. Rode o migrate nos "
+                f"dois antes de copiar. Diferença: {', '.join(faltando[:10])}"
+                + (" ..." if len(faltando) > 10 else "")
+            )
+
+    def _modelos(self):
+        """Modelos com tabela própria (inclui as tabelas intermediárias de M2M)."""
+        tabelas_origem = set(connections[ORIGEM].introspection.table_names())
+        modelos = []
+        for modelo in apps.get_models(include_auto_created=True):
+            meta = modelo._meta
+            if meta.proxy or not meta.managed:
+                continue
+            if meta.db_table not in tabelas_origem:
+                self.stdout.write(self.style.WARNING(f"Sem tabela no SQLite, ignorado: {meta.db_table}"))
+                continue
+            modelos.append(modelo)
+        return modelos
+
+    def _preparar_destino(self, modelos, substituir):
+        ocupadas = [
+            m._meta.db_table for m in modelos
+            if m._meta.label_lower not in SEMEADAS_PELO_MIGRATE and m._base_manager.exists()
+        ]
+        if ocupadas and not substituir:
+            raise CommandError(
+                f"O PostgreSQL já tem dados em {', '.join(ocupadas)}. Use --substituir para apagá-los."
+            )
+        tabelas = [
+            m._meta.db_table for m in modelos
+            if substituir or m._meta.label_lower in SEMEADAS_PELO_MIGRATE
+        ]
+        # As FKs do Django no PostgreSQL são DEFERRABLE INITIALLY DEFERRED: dentro da
+        # transação a ordem das tabelas não importa, a checagem acontece no commit.
+        with connection.cursor() as cursor:
+            for sql in connection.ops.sql_flush(no_style(), tabelas, allow_cascade=True):
+                cursor.execute(sql)
+
+    def _copiar(self, modelo, lote):
+        inicio = time.perf_counter()
+        total = 0
+        linhas = []
+        for obj in modelo._base_manager.using(ORIGEM).order_by('pk').iterator(chunk_size=lote):
+            linhas.append(obj)
+            if len(linhas) >= lote:
+                total += self._gravar(modelo, linhas)
+                linhas = []
+        total += self._gravar(modelo, linhas)
+        if total:
+            self.stdout.write(
+                f"  {modelo._meta.db_table:<45} {total:>9} linha(s)  {time.perf_counter() - inicio:6.1f} s"
+            )
+
+    def _gravar(self, modelo, linhas):
+        if linhas:
+            modelo._base_manager.using('default').bulk_create(linhas)
+        return len(linhas)
+
+    def _acertar_sequencias(self, modelos):
+        # Autoincremento: cada sequência continua depois do maior id copiado
+        with connection.cursor() as cursor:
+            for sql in connection.ops.sequence_reset_sql(no_style(), modelos):
+                cursor.execute(sql)
+        acertados = sincronizar_sequencias()
+        if acertados:
+            self.stdout.write(f"Sequências nativas do Sequencial acertadas: {', '.join(acertados)}")
+
+    def _conferir_contagens(self, modelos):
+        divergentes = []
+        for modelo in modelos:
+            na_origem = modelo._base_manager.using(ORIGEM).count()
+            no_destino = modelo._base_manager.using('default').count()
+            if na_origem != no_destino:
+                divergentes.append(f"{modelo._meta.db_table}: SQLite {na_origem} x PostgreSQL {no_destino}")
+        if divergentes:
+            raise CommandError("Contagens divergentes (nada foi gravado):\n" + "\n".join(divergentes))
@@ -0,0 +1,43 @@
+# financeiro/management/commands/reconstruir_saldo_diario.py
+
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from financeiro.saldos import reconstruir_saldo_diario, calcular_saldos_bancos, saldos_bancos_na_data
+
+
+def _centavos(valor):
+    # No SQLite as somas voltam com resíduo de ponto flutuante (414847.9599999900)
+    return None if valor is None else Decimal(valor).quantize(Decimal('0.01'))
+
+
+class Command(BaseCommand):
+    help = (
+        "Recalcula do zero a foto diária de saldos (SaldoDiarioBanco) a partir de CP, CR, "
+        "Transferências e transferências de Saldo Supervisor."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verificar', action='store_true',
+            help="Não reconstrói: só compara a foto diária com o cálculo completo na data de hoje.",
+        )
+
+    def handle(self, *args, **opts):
+        if opts['verificar']:
+            hoje = timezone.now().date()
+            foto = {d['banco'].pk: _centavos(d['saldo']) for d in saldos_bancos_na_data(hoje)}
+            divergentes = [
+                f"{d['nome']}: foto R$ {foto.get(d['banco'].pk)} x cálculo R$ {_centavos(d['saldo'])}"
+                for d in calcular_saldos_bancos(hoje)
+                if foto.get(d['banco'].pk) != _centavos(d['saldo'])
+            ]
+            if divergentes:
+                raise CommandError("Saldos divergentes:\n" + "\n".join(divergentes))
+            self.stdout.write(self.style.SUCCESS("Foto diária confere com o cálculo completo."))
+            return
+
+        total = reconstruir_saldo_diario()
+        self.stdout.write(self.style.SUCCESS(f"{total} linha(s) de saldo diário geradas."))
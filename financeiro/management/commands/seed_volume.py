@@ -0,0 +1,653 @@
+# financeiro/management/commands/seed_volume.py
+#
+# Gera uma base com volume de produção para reproduzir lentidão localmente e
+# para o benchmark_views. Tudo sai de um random.Random(seed) e de uma data de
+# referência (--hoje): a mesma seed e a mesma data geram exatamente a mesma base.
+#
+# Os registros entram com bulk_create em lotes, sem passar pelos save()/signals
+# de cada linha. O que os signals manteriam é montado aqui mesmo, do mesmo jeito
+# que eles montariam:
+#
+# - BaseSaldo: linha 'CP'/'CR' de cada título pago (dados_base_saldo), duas 'TRF'
+#   por transferência não cancelada e 'SSUP' para cada transferência de saldo
+#   supervisor para banco;
+# - SaldoSupervisor/MovimentacaoSupervisor: CRÉDITO dos CPs pagos com
+#   supervisor, DÉBITO das caixinhas conferidas e das transferências SSUP;
+#   saldo_disponivel e total_debitos batem com as movimentações;
+# - Despesa: LogWorkflow de cada etapa percorrida, DespesaParticipante, CP
+#   'WF-<id>' das pagas, vínculos de Folha e de Lançamento Extra;
+# - SaldoDiarioBanco e TransicaoStatus reconstruídos no fim.
+
+import random
+import time
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+from django.contrib.auth.models import Group
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from cadastros.models import (
+    Banco, Cliente, Colaborador, Empresa, Filial, Fornecedor, MotivoAusencia, PlanoDeContas, Tomador,
+)
+from core.models import UsuarioCustomizado
+from extras.models import LancamentoExtra
+from financeiro.models import (
+    BaseSaldo, ContasAPagar, ContasAReceber, MovimentacaoSupervisor, SaldoSupervisor, Transferencia,
+)
+from financeiro.saldos import dados_base_saldo, reconstruir_saldo_diario
+from financeiro.sequencias import reservar_bloco
+from monitoramento_rh.models import ColaboradorInformal, Folha, ItemPagamento, PagamentoFolha
+from workflow.models import STATUS_WORKFLOW, ConfiguracaoSLA, Despesa, DespesaParticipante, LogWorkflow
+from workflow.transicoes import reconstruir_transicoes
+
+# Quantidades com --escala 1
+VOLUME = {
+    'bancos': 12,
+    'empresas': 6,
+    'fornecedores': 500,
+    'clientes': 300,
+    'tomadores': 60,
+    'filiais': 15,
+    'colaboradores': 800,
+    'contas_a_pagar': 30000,
+    'contas_a_receber': 20000,
+    'transferencias': 4000,
+    'despesas': 20000,
+    'folhas': 24,
+    'colaboradores_por_folha': 25,
+    'extras': 3000,
+}
+
+# Etapas de cada tipo de despesa, na ordem em que o workflow as percorre
+FLUXOS = {
+    'CAIXINHA': ['AGUARDANDO_FIN', 'PAGO', 'CONFERIDO'],
+    'SOLICITACAO': ['AGUARDANDO_RH', 'AGUARDANDO_FIN', 'DIRECIONADO_OP', 'PAGO', 'CONFERIDO'],
+    'EXTRA': ['AGUARDANDO_ADM', 'AGUARDANDO_RH', 'AGUARDANDO_FIN', 'PAGO'],
+    'FOLHA': ['AGUARDANDO_RH', 'AGUARDANDO_FIN', 'PAGO'],
+}
+ACOES = {
+    'AGUARDANDO_RH': 'Aprovou → RH',
+    'AGUARDANDO_FIN': 'Aprovou → Financeiro',
+    'DIRECIONADO_OP': 'Direcionou ao Operador',
+    'PAGO': 'FINALIZOU (PAGO)',
+    'CONFERIDO': 'CONFERIDO',
+    'CANCELADO': 'CANCELOU',
+}
+PERFIS = {
+    'Aprovador Financeiro': 'Financeiro',
+    'Aprovador RH': 'RH',
+    'Operador': 'Solicitante',
+    'Comercial': 'Comercial',
+    'Administrativo': 'Administrativo',
+}
+ROTULOS_STATUS = dict(STATUS_WORKFLOW)
+STATUS_FOLHA = {
+    'AGUARDANDO_ADM': 'RASCUNHO',
+    'AGUARDANDO_RH': 'AGUARDANDO_RH',
+    'AGUARDANDO_FIN': 'AGUARDANDO_FIN',
+    'PAGO': 'PAGA',
+    'CANCELADO': 'CANCELADA',
+}
+
+
+@contextmanager
+def _datas_do_historico(*modelos):
+    """
+    Desliga auto_now/auto_now_add dos modelos durante o bulk_create, para as
+    datas do histórico gerado serem gravadas como estão (e não "agora").
+    """
+    campos = [
+        (campo, campo.auto_now, campo.auto_now_add)
+        for modelo in modelos for campo in modelo._meta.concrete_fields
+        if getattr(campo, 'auto_now', False) or getattr(campo, 'auto_now_add', False)
+    ]
+    for campo, _, _ in campos:
+        campo.auto_now = campo.auto_now_add = False
+    try:
+        yield
+    finally:
+        for campo, auto_now, auto_now_add in campos:
+            campo.auto_now, campo.auto_now_add = auto_now, auto_now_add
+
+
+class GeradorVolume:
+    """Gera a base; `gerar()` devolve {modelo: quantidade criada}."""
+
+    def __init__(self, seed=42, escala=1.0, hoje=None, dias=730, prefixo='VOL', lote=1000, log=None):
+        self.rnd = random.Random(seed)
+        # Escalas pequenas ainda deixam alguns de cada cadastro (transferência precisa de dois bancos)
+        self.qtd = {k: max(min(v, 4), round(v * escala)) for k, v in VOLUME.items()}
+        self.qtd['colaboradores_por_folha'] = VOLUME['colaboradores_por_folha']
+        self.hoje = hoje or date.today()
+        self.dias = dias
+        self.prefixo = prefixo
+        self.lote = lote
+        self.log = log or (lambda msg: None)
+        # Nada no histórico passa do fim do dia de referência
+        self.limite = timezone.make_aware(datetime.combine(self.hoje, datetime.max.time()))
+        self.criados = {}
+        self.ids_despesas = []
+        self.base_saldo = []
+        self.participantes = []
+        self.caixinhas_conferidas = []
+
+    # --- utilitários ---
+
+    def _data(self, ate_dias=None):
+        return self.hoje - timedelta(days=self.rnd.randint(0, ate_dias or self.dias))
+
+    def _momento(self, dia):
+        hora = datetime.combine(dia, datetime.min.time()) + timedelta(minutes=self.rnd.randint(7 * 60, 19 * 60))
+        return timezone.make_aware(hora)
+
+    def _valor(self, minimo, maximo):
+        return Decimal(self.rnd.randint(minimo * 100, maximo * 100)) / 100
+
+    def _criar(self, modelo, objetos, **kwargs):
+        objetos = modelo.objects.bulk_create(objetos, batch_size=self.lote, **kwargs)
+        nome = modelo.__name__
+        self.criados[nome] = self.criados.get(nome, 0) + len(objetos)
+        return objetos
+
+    def _etapa(self, nome, funcao):
+        inicio = time.perf_counter()
+        funcao()
+        self.log(f"{nome}: {time.perf_counter() - inicio:.1f} s")
+
+    # --- geração ---
+
+    def gerar(self):
+        if Fornecedor.objects.filter(cnpj_cpf__startswith=f'{self.prefixo}-').exists():
+            raise CommandError(f"Já existe uma base com o prefixo {self.prefixo!r}; use outro --prefixo.")
+        with transaction.atomic():
+            self._etapa("cadastros", self._cadastros)
+            self._etapa("usuários", self._usuarios)
+            self._etapa("contas a pagar/receber", self._titulos)
+            self._etapa("transferências", self._transferencias)
+            self._etapa("folhas", self._folhas)
+            self._etapa("despesas", self._despesas)
+            self._etapa("lançamentos extras", self._extras)
+            self._etapa("saldo supervisor", self._saldo_supervisor)
+            self._etapa("base de saldos", lambda: self._criar(BaseSaldo, self.base_saldo))
+            self._etapa("participantes", lambda: self._criar(
+                DespesaParticipante, self.participantes, ignore_conflicts=True,
+            ))
+            self._etapa("saldo diário", reconstruir_saldo_diario)
+            self._etapa("transições", lambda: reconstruir_transicoes(
+                Despesa.objects.filter(pk__in=self.ids_despesas), lote=self.lote,
+            ))
+        return self.criados
+
+    def _cadastros(self):
+        p, q = self.prefixo, self.qtd
+        self.bancos = self._criar(Banco, [
+            Banco(nome=f'Banco {p} {i + 1:02d}', saldo_inicial=self._valor(0, 200000)) for i in range(q['bancos'])
+        ])
+        self.empresas = self._criar(Empresa, [Empresa(nome=f'Empresa {p} {i + 1:02d}') for i in range(q['empresas'])])
+        planos = self._criar(PlanoDeContas, [
+            PlanoDeContas(nome=nome) for nome in
+            ['Cobertura Falta', 'Folha de Pagamento', 'Material', 'Combustível', 'Manutenção', 'Impostos']
+        ])
+        self.plano_cobertura, self.plano_folha = planos[0], planos[1]
+        self.fornecedores = self._criar(Fornecedor, [
+            Fornecedor(
+                razao_social=f'Fornecedor {p} {i + 1:04d}', cnpj_cpf=f'{p}-F{i + 1:06d}',
+                forma_pagamento=self.rnd.choice(['PIX', 'BOLETO', 'TED']),
+                plano_de_contas=planos[i % len(planos)], letra_acesso='ABCD'[i % 4],
+            )
+            for i in range(q['fornecedores'])
+        ])
+        self.fornecedores_cobertura = [f for f in self.fornecedores if f.plano_de_contas_id == self.plano_cobertura.pk]
+        self.clientes = self._criar(Cliente, [
+            Cliente(
+                razao_social=f'Cliente {p} {i + 1:04d}', cnpj_cpf=f'{p}-C{i + 1:06d}',
+                forma_recebimento=self.rnd.choice(['PIX', 'BOLETO']), tipo=self.rnd.choice(['FIXO', 'EVENTUAL']),
+                dia_vencimento=self.rnd.randint(1, 28), valor_contrato=self._valor(1000, 50000),
+            )
+            for i in range(q['clientes'])
+        ])
+        self.tomadores = self._criar(Tomador, [Tomador(nome=f'Tomador {p} {i + 1:03d}') for i in range(q['tomadores'])])
+        self.filiais = self._criar(Filial, [Filial(nome=f'Filial {p} {i + 1:02d}') for i in range(q['filiais'])])
+        self.motivos = self._criar(MotivoAusencia, [
+            MotivoAusencia(nome=nome) for nome in
+            ['Atestado', 'Falta injustificada', 'Férias', 'Folga', 'Licença', 'Suspensão']
+        ])
+        self.colaboradores = self._criar(Colaborador, [
+            Colaborador(nome=f'Colaborador {p} {i + 1:05d}', cpf=f'{p}-{i + 1:08d}',
+                        filial=self.filiais[i % len(self.filiais)])
+            for i in range(q['colaboradores'])
+        ])
+        # Prazos dos painéis de SLA; uma configuração já existente é mantida
+        for status, dias in [('AGUARDANDO_COMERCIAL', 1), ('AGUARDANDO_ADM', 1), ('AGUARDANDO_RH', 2),
+                             ('AGUARDANDO_FIN', 2), ('DIRECIONADO_OP', 1)]:
+            ConfiguracaoSLA.objects.get_or_create(status=status, defaults={'prazo_dias': dias})
+
+    def _usuarios(self):
+        quantos = {'Aprovador Financeiro': 4, 'Aprovador RH': 4, 'Operador': 3, 'Comercial': 10, 'Administrativo': 8}
+        self.por_grupo = {}
+        usuarios = []
+        for grupo, n in quantos.items():
+            for i in range(n):
+                usuarios.append(UsuarioCustomizado(
+                    username=f'{self.prefixo.lower()}_{PERFIS[grupo].lower()}_{i + 1}',
+                    first_name=f'{PERFIS[grupo]} {i + 1}', password='!', is_staff=True,
+                ))
+                self.por_grupo.setdefault(grupo, []).append(usuarios[-1])
+        self._criar(UsuarioCustomizado, usuarios)
+        # Direto na tabela do M2M: novos usuários não têm grupos em cache a invalidar
+        grupos = {g: Group.objects.get_or_create(name=g)[0] for g in quantos}
+        Membro = UsuarioCustomizado.groups.through
+        self._criar(Membro, [
+            Membro(usuariocustomizado_id=u.pk, group_id=grupos[g].pk)
+            for g, lista in self.por_grupo.items() for u in lista
+        ])
+        self.financeiro = self.por_grupo['Aprovador Financeiro']
+        # Comercial e Administrativo fazem caixinhas e têm ciclo de saldo supervisor
+        self.supervisores = self.por_grupo['Comercial'] + self.por_grupo['Administrativo']
+
+    def _notas(self, prefixo, formato, quantidade):
+        return [formato.format(n) for n in reservar_bloco(prefixo, quantidade)]
+
+    def _titulos(self):
+        q = self.qtd
+        notas = self._notas('CP', 'CP-{:05d}', q['contas_a_pagar'])
+        cps = []
+        for nota in notas:
+            emissao = self._data()
+            vencimento = emissao + timedelta(days=self.rnd.choice([0, 7, 15, 30, 45]))
+            status = self._status_titulo(vencimento)
+            cps.append(ContasAPagar(
+                fornecedor=self.rnd.choice(self.fornecedores), empresa_pagadora=self.rnd.choice(self.empresas),
+                banco=self.rnd.choice(self.bancos), data_emissao=emissao, vencimento=vencimento, nota=nota,
+                valor=self._valor(50, 15000), status=status,
+                data_baixa=min(vencimento + timedelta(days=self.rnd.randint(-3, 5)), self.hoje) if status == 'PAGO' else None,
+                usuario_baixa=self.rnd.choice(self.financeiro) if status == 'PAGO' else None,
+                responsavel_pagamento=self.rnd.choice(self.financeiro),
+            ))
+        self._titulos_pagos('CP', self._criar(ContasAPagar, cps))
+
+        notas = self._notas('CR', 'CR-{:05d}', q['contas_a_receber'])
+        crs = []
+        for nota in notas:
+            emissao = self._data()
+            vencimento = emissao + timedelta(days=self.rnd.choice([10, 15, 30]))
+            status = self._status_titulo(vencimento)
+            crs.append(ContasAReceber(
+                cliente=self.rnd.choice(self.clientes), empresa_prestadora=self.rnd.choice(self.empresas),
+                banco=self.rnd.choice(self.bancos), data_emissao=emissao, vencimento=vencimento, nota=nota,
+                valor=self._valor(500, 40000), status=status,
+                data_baixa=min(vencimento + timedelta(days=self.rnd.randint(-2, 10)), self.hoje) if status == 'PAGO' else None,
+                usuario_baixa=self.rnd.choice(self.financeiro) if status == 'PAGO' else None,
+            ))
+        self._titulos_pagos('CR', self._criar(ContasAReceber, crs))
+
+    def _status_titulo(self, vencimento):
+        # Vencidos há mais de um mês quase sempre já foram baixados; os futuros, quase nunca
+        chance_pago = 0.95 if vencimento < self.hoje - timedelta(days=30) else 0.1 if vencimento > self.hoje else 0.6
+        sorteio = self.rnd.random()
+        if sorteio < 0.03:
+            return 'CANCELADO'
+        return 'PAGO' if sorteio < chance_pago else 'PENDENTE'
+
+    def _titulos_pagos(self, tipo, titulos):
+        # O que atualizar_saldo_cp/atualizar_saldo_cr gravariam na BaseSaldo
+        self.base_saldo += [
+            BaseSaldo(origem=tipo, id_origem=t.pk, **dados_base_saldo(tipo, t)) for t in titulos if t.status == 'PAGO'
+        ]
+
+    def _transferencias(self):
+        transferencias = []
+        for _ in range(self.qtd['transferencias']):
+            origem, destino = self.rnd.sample(self.bancos, 2)
+            dia = self._data()
+            status = self.rnd.choices(['DEFINITIVA', 'TEMP_PENDENTE', 'TEMP_DEVOLVIDA', 'CANCELADA'], [70, 10, 15, 5])[0]
+            transferencias.append(Transferencia(
+                data=dia, valor=self._valor(1000, 80000), empresa=self.rnd.choice(self.empresas),
+                banco_origem=origem, banco_destino=destino, status=status,
+                data_prevista_retorno=dia + timedelta(days=15) if status.startswith('TEMP') else None,
+                data_devolucao=min(dia + timedelta(days=self.rnd.randint(1, 30)), self.hoje)
+                if status == 'TEMP_DEVOLVIDA' else None,
+                criado_por=self.rnd.choice(self.financeiro),
+            ))
+        for trf in self._criar(Transferencia, transferencias):
+            if trf.status == 'CANCELADA':
+                continue
+            # As duas linhas que Transferencia.save() grava
+            comum = dict(
+                origem='TRF', id_origem=trf.pk, empresa=trf.empresa.nome, data_emissao=trf.data,
+                vencimento=trf.data, status='PAGO', data_baixa=trf.data, usuario_baixa=trf.criado_por.username,
+            )
+            self.base_saldo += [
+                BaseSaldo(nome=f"Transferência ➜ {trf.banco_destino.nome}", banco=trf.banco_origem.nome,
+                          valor=-trf.valor, **comum),
+                BaseSaldo(nome=f"Transferência ← {trf.banco_origem.nome}", banco=trf.banco_destino.nome,
+                          valor=trf.valor, **comum),
+            ]
+
+    def _folhas(self):
+        q = self.qtd
+        folhas = self._criar(Folha, [
+            Folha(
+                tomador=self.tomadores[i % len(self.tomadores)], tipo='SEMANAL' if i % 2 else 'QUINZENAL',
+                descricao=f'Folha {self.prefixo} {i + 1:02d}', fornecedor=self.rnd.choice(self.fornecedores),
+                empresa_pagadora=self.rnd.choice(self.empresas), plano_de_contas=self.plano_folha,
+            )
+            for i in range(q['folhas'])
+        ])
+        colaboradores = self._criar(ColaboradorInformal, [
+            ColaboradorInformal(
+                folha=folha, filial=self.rnd.choice(self.filiais), qt=i + 1,
+                nome=f'Informal {self.prefixo} {folha.pk}-{i + 1:03d}', cpf=f'{folha.pk:05d}{i:06d}',
+                banco=self.rnd.choice(['Itaú', 'Bradesco', 'Caixa', 'Nubank']),
+                agencia=f'{self.rnd.randint(1, 9999):04d}', conta=f'{self.rnd.randint(1, 999999):06d}-{i % 10}',
+                valor_padrao=self._valor(300, 1500),
+            )
+            for folha in folhas for i in range(q['colaboradores_por_folha'])
+        ])
+        por_folha = {}
+        for colaborador in colaboradores:
+            por_folha.setdefault(colaborador.folha_id, []).append(colaborador)
+
+        # Um pagamento por período, do início do histórico até hoje
+        pagamentos, itens_por_pagamento = [], []
+        for folha in folhas:
+            passo = timedelta(days=7 if folha.tipo == 'SEMANAL' else 14)
+            fim = self.hoje - timedelta(days=self.rnd.randint(0, 6))
+            ultimo_valor = {}
+            while fim > self.hoje - timedelta(days=self.dias):
+                itens = []
+                for colaborador in por_folha[folha.pk]:
+                    if self.rnd.random() < 0.05:
+                        continue
+                    anterior = ultimo_valor.get(colaborador.pk)
+                    atual = colaborador.valor_padrao if self.rnd.random() < 0.85 else self._valor(200, 1800)
+                    itens.append(ItemPagamento(
+                        colaborador=colaborador, valor_anterior=anterior, valor_atual=atual,
+                        justificativa='Ajuste de dias trabalhados' if anterior and anterior != atual else '',
+                    ))
+                    ultimo_valor[colaborador.pk] = atual
+                pagamentos.append(PagamentoFolha(
+                    folha=folha, data_inicio=fim - passo + timedelta(days=1), data_fim=fim, status='PAGA',
+                    total=sum((i.valor_atual for i in itens), Decimal('0')), banco_pagamento=self.rnd.choice(self.bancos),
+                    criado_por=self.rnd.choice(self.supervisores), criado_em=self._momento(fim),
+                    pago_em=min(self._momento(fim + timedelta(days=2)), self.limite),
+                ))
+                itens_por_pagamento.append(itens)
+                fim -= passo
+        with _datas_do_historico(PagamentoFolha):
+            self.pagamentos = self._criar(PagamentoFolha, pagamentos)
+        for pagamento, itens in zip(self.pagamentos, itens_por_pagamento):
+            for item in itens:
+                item.pagamento = pagamento
+        self._criar(ItemPagamento, [item for itens in itens_por_pagamento for item in itens])
+
+    def _despesas(self):
+        """Despesas soltas (caixinhas, solicitações, coberturas) e as dos pagamentos de folha."""
+        despesas = []
+        tipos = self.rnd.choices(['CAIXINHA', 'SOLICITACAO'], [55, 45], k=self.qtd['despesas'])
+        for tipo in tipos:
+            dia = self._data()
+            cobertura = tipo == 'SOLICITACAO' and self.rnd.random() < 0.6
+            solicitante = self.rnd.choice(self.supervisores if tipo == 'CAIXINHA' else self.supervisores + self.por_grupo['Aprovador RH'])
+            despesas.append(Despesa(
+                tipo_lancamento=tipo, data_despesa=dia, solicitante=solicitante,
+                fornecedor=self.rnd.choice(self.fornecedores_cobertura if cobertura else self.fornecedores),
+                valor=self._valor(20, 400) if tipo == 'CAIXINHA' else self._valor(80, 3000),
+                tomador=self.rnd.choice(self.tomadores), filial=self.rnd.choice(self.filiais),
+                colaborador_faltou=self.rnd.choice(self.colaboradores) if cobertura else None,
+                motivo_ausencia=self.rnd.choice(self.motivos) if cobertura else None,
+                inicio_cobertura=dia if cobertura else None,
+                fim_cobertura=dia + timedelta(days=self.rnd.randint(0, 4)) if cobertura else None,
+                nome_cobriu=f'COBRIDOR {self.rnd.randint(1, 300)}' if cobertura else None,
+                forma_pagamento=self.rnd.choice(['PIX', 'BANCO', 'DINHEIRO']),
+                empresa_pagadora=self.rnd.choice(self.empresas), banco_pagador=self.rnd.choice(self.bancos),
+            ))
+        for pagamento in self.pagamentos:
+            despesas.append(Despesa(
+                tipo_lancamento='FOLHA', data_despesa=pagamento.data_fim, valor=pagamento.total,
+                solicitante=pagamento.criado_por, tomador=pagamento.folha.tomador, pagamento_folha=pagamento,
+                empresa_pagadora=pagamento.folha.empresa_pagadora, banco_pagador=pagamento.banco_pagamento,
+                observacoes=f'Folha: {pagamento.folha}\nCompetência: {pagamento.data_inicio} a {pagamento.data_fim}',
+            ))
+        self._workflow(despesas)
+
+        # O PagamentoFolha acompanha o status da despesa (sincronização do DespesaAdmin)
+        por_status = {}
+        for despesa in despesas:
+            if despesa.pagamento_folha is not None and despesa.status != 'PAGO':
+                por_status.setdefault(STATUS_FOLHA.get(despesa.status, 'PAGA'), []).append(despesa.pagamento_folha_id)
+        for status, ids in por_status.items():
+            PagamentoFolha.objects.filter(pk__in=ids).update(status=status, pago_em=None)
+
+    def _workflow(self, despesas, fluxos=None):
+        """
+        Percorre as etapas de cada despesa (FLUXOS do tipo, ou a lista `fluxos`
+        paralela às despesas) e grava despesas, logs e CPs gerados no PAGO.
+        """
+        historicos = []
+        for n, despesa in enumerate(despesas):
+            fluxo = fluxos[n] if fluxos else FLUXOS[despesa.tipo_lancamento]
+            criada_em = self._momento(despesa.data_despesa)
+            # Quanto mais antiga, mais longe no fluxo; 4% são canceladas no caminho
+            idade = (self.hoje - despesa.data_despesa).days
+            ate = len(fluxo) if idade > 45 else self.rnd.randint(1, len(fluxo))
+            etapas = fluxo[:ate]
+            if self.rnd.random() < 0.04:
+                etapas = etapas[:self.rnd.randint(1, len(etapas))] + ['CANCELADO']
+            momentos = [criada_em]
+            for _ in etapas[1:]:
+                momentos.append(min(momentos[-1] + timedelta(hours=self.rnd.randint(1, 96)), self.limite))
+            despesa.status = etapas[-1]
+            despesa.data_criacao, despesa.data_ultima_alteracao = criada_em, momentos[-1]
+            despesa.operador = self.rnd.choice(self.por_grupo['Operador']) if 'DIRECIONADO_OP' in etapas else None
+            historicos.append(list(zip(etapas, momentos)))
+
+        with _datas_do_historico(Despesa):
+            despesas = self._criar(Despesa, despesas)
+        self.ids_despesas += [d.pk for d in despesas]
+
+        logs, cps = [], []
+        for despesa, historico in zip(despesas, historicos):
+            for i, (etapa, momento) in enumerate(historico):
+                grupo = self._grupo_da_etapa(etapa) if i else None
+                usuario = despesa.solicitante if grupo is None else self.rnd.choice(self.por_grupo[grupo])
+                logs.append(LogWorkflow(
+                    despesa=despesa, usuario=usuario, perfil_usuario=PERFIS.get(grupo, 'Solicitante'),
+                    acao=ACOES[etapa] if i else 'Criou Registro',
+                    observacao=f"Status: {ROTULOS_STATUS[etapa]}", data_hora=momento,
+                ))
+                if etapa == 'PAGO':
+                    cps.append(self._cp_da_despesa(despesa, usuario, timezone.localdate(momento)))
+                if etapa == 'CONFERIDO' and despesa.tipo_lancamento == 'CAIXINHA':
+                    self.caixinhas_conferidas.append((despesa, timezone.localdate(momento)))
+
+        with _datas_do_historico(LogWorkflow):
+            logs = self._criar(LogWorkflow, logs)
+        self.participantes += [
+            DespesaParticipante(despesa_id=log.despesa_id, usuario_id=log.usuario_id, motivo='LOG') for log in logs
+        ]
+        self._titulos_pagos('CP', self._criar(ContasAPagar, cps))
+        return despesas
+
+    def _grupo_da_etapa(self, etapa):
+        return {
+            'AGUARDANDO_ADM': 'Administrativo', 'AGUARDANDO_RH': 'Aprovador RH',
+            'AGUARDANDO_FIN': 'Aprovador RH', 'DIRECIONADO_OP': 'Aprovador Financeiro',
+            'PAGO': 'Operador', 'CONFERIDO': 'Aprovador Financeiro', 'CANCELADO': 'Aprovador Financeiro',
+        }[etapa]
+
+    def _cp_da_despesa(self, despesa, usuario, dia):
+        # O que DespesaAdmin.gerar_contas_a_pagar cria quando a despesa vira PAGO
+        folha = despesa.pagamento_folha.folha if despesa.pagamento_folha else None
+        fornecedor = folha.fornecedor if folha else despesa.fornecedor
+        return ContasAPagar(
+            fornecedor=fornecedor, empresa_pagadora=despesa.empresa_pagadora, banco=despesa.banco_pagador,
+            data_emissao=despesa.data_despesa, vencimento=dia, valor=despesa.valor, nota=f"WF-{despesa.pk}",
+            despesa_origem=despesa, status='PAGO', data_baixa=dia, usuario_baixa=usuario,
+            observacoes=f"Ref. Workflow #{despesa.pk} — {despesa.get_tipo_lancamento_display()}",
+            plano_de_contas=folha.plano_de_contas if folha else fornecedor.plano_de_contas,
+        )
+
+    def _extras(self):
+        """Lançamentos extras com o CR e a despesa EXTRA que automacao_extras criaria."""
+        notas = self._notas('LE', 'LE{:04d}', self.qtd['extras'])
+        fornecedor_extra, _ = Fornecedor.objects.get_or_create(
+            cnpj_cpf='00000000000000', defaults={'razao_social': 'LANÇAMENTOS EXTRAS (AUTO)'},
+        )
+        responsaveis = self.por_grupo['Administrativo'] + self.por_grupo['Aprovador RH']
+        clientes = {}
+        for tomador in self.tomadores:
+            clientes[tomador.pk], _ = Cliente.objects.get_or_create(
+                cnpj_cpf=f"TOM{tomador.id:017d}",
+                defaults={'razao_social': tomador.nome, 'dia_vencimento': 1, 'valor_contrato': 0, 'tipo': 'EVENTUAL'},
+            )
+
+        extras, crs, despesas, fluxos = [], [], [], []
+        for nota in notas:
+            emissao = self._data()
+            tomador, filial = self.rnd.choice(self.tomadores), self.rnd.choice(self.filiais)
+            administrativo = self.rnd.choice(responsaveis)
+            inicio = emissao - timedelta(days=self.rnd.randint(0, 10))
+            extra = LancamentoExtra(
+                nota_fiscal=nota, data_emissao=emissao, data_vencimento=emissao + timedelta(days=30),
+                valor_recebimento=self._valor(150, 4000), empresa_prestadora=self.rnd.choice(self.empresas),
+                banco_recebimento=self.rnd.choice(self.bancos), administrativo=administrativo,
+                inicio_cobertura=inicio, fim_cobertura=inicio + timedelta(days=self.rnd.randint(0, 6)),
+                tomador=tomador, filial=filial, motivo_ausencia=self.rnd.choice(self.motivos),
+                colaborador_faltou=self.rnd.choice(self.colaboradores),
+            )
+            status = self._status_titulo(extra.data_vencimento)
+            crs.append(ContasAReceber(
+                cliente=clientes[tomador.pk], empresa_prestadora=extra.empresa_prestadora,
+                banco=extra.banco_recebimento, data_emissao=emissao, vencimento=extra.data_vencimento,
+                valor=extra.valor_recebimento, nota=f"EXTRA-{nota}", status=status,
+                data_baixa=min(extra.data_vencimento, self.hoje) if status == 'PAGO' else None,
+                observacoes=f"Tipo: Extra | NF: {nota} | Filial: {filial}",
+            ))
+            # Quem cadastra para o RH já entra em AGUARDANDO_RH (ver automacao_extras)
+            rh = administrativo in self.por_grupo['Aprovador RH']
+            despesas.append(Despesa(
+                tipo_lancamento='EXTRA', solicitante=administrativo, fornecedor=fornecedor_extra,
+                valor=extra.valor_recebimento * Decimal('0.6'), data_despesa=emissao,
+                observacoes=f"Origem: Extra | NF: {nota}", inicio_cobertura=extra.inicio_cobertura,
+                fim_cobertura=extra.fim_cobertura, tomador=tomador, filial=filial,
+                motivo_ausencia=extra.motivo_ausencia, colaborador_faltou=extra.colaborador_faltou,
+                empresa_pagadora=extra.empresa_prestadora, banco_pagador=extra.banco_recebimento,
+            ))
+            fluxos.append(FLUXOS['EXTRA'][1:] if rh else FLUXOS['EXTRA'])
+            extras.append(extra)
+
+        crs = self._criar(ContasAReceber, crs)
+        self._titulos_pagos('CR', crs)
+        despesas = self._workflow(despesas, fluxos)
+        for extra, cr, despesa in zip(extras, crs, despesas):
+            extra.conta_receber_criada, extra.workflow_criado = cr, despesa
+            self.participantes.append(
+                DespesaParticipante(despesa_id=despesa.pk, usuario_id=extra.administrativo_id, motivo='EXTRA')
+            )
+        self._criar(LancamentoExtra, extras)
+
+    def _saldo_supervisor(self):
+        """
+        Um ciclo aberto por supervisor: CRÉDITOS vindos de CPs pagos com supervisor
+        (mensais, cobrindo as utilizações com folga), DÉBITOS das caixinhas
+        conferidas e, com o que sobra, transferências para banco (BaseSaldo SSUP).
+        """
+        debitos_por_sup = {}
+        for despesa, dia in self.caixinhas_conferidas:
+            debitos_por_sup.setdefault(despesa.solicitante_id, []).append((despesa, dia))
+
+        ciclos = {}
+        for supervisor in self.supervisores:
+            ciclo = SaldoSupervisor(supervisor=supervisor, data_inicio=self.hoje - timedelta(days=self.dias))
+            ciclo.save()
+            ciclos[supervisor.pk] = ciclo
+
+        creditos_cp, movimentacoes, ssup = [], [], []
+        notas = iter(self._notas('CP', 'CP-{:05d}', 24 * len(self.supervisores)))
+        for supervisor in self.supervisores:
+            ciclo = ciclos[supervisor.pk]
+            utilizacoes = debitos_por_sup.get(supervisor.pk, [])
+            total_debitos = sum((d.valor for d, _ in utilizacoes), Decimal('0'))
+            mensal = (total_debitos * Decimal('1.3') / 24).quantize(Decimal('0.01')) + Decimal('500')
+            for mes in range(24):
+                dia = self.hoje - timedelta(days=30 * mes + self.rnd.randint(0, 5))
+                creditos_cp.append(ContasAPagar(
+                    fornecedor=self.rnd.choice(self.fornecedores), empresa_pagadora=self.rnd.choice(self.empresas),
+                    banco=self.rnd.choice(self.bancos), data_emissao=dia, vencimento=dia, nota=next(notas),
+                    valor=mensal, status='PAGO', data_baixa=dia, usuario_baixa=self.rnd.choice(self.financeiro),
+                    supervisor=supervisor, observacoes='Reposição de saldo supervisor',
+                ))
+            for despesa, dia in utilizacoes:
+                movimentacoes.append(MovimentacaoSupervisor(
+                    saldo_supervisor=ciclo, tipo='DEBITO', valor=despesa.valor,
+                    descricao=f"Caixinha #{despesa.pk} — {despesa.fornecedor}", referencia_despesa_id=despesa.pk,
+                    data=dia,
+                ))
+            # Metade da folga volta para um banco
+            sobra = mensal * 24 - total_debitos
+            if sobra > 0:
+                banco, dia = self.rnd.choice(self.bancos), self._data(90)
+                movimentacoes.append(MovimentacaoSupervisor(
+                    saldo_supervisor=ciclo, tipo='DEBITO', valor=(sobra / 2).quantize(Decimal('0.01')),
+                    descricao=f"Transferência para {banco.nome}", data=dia,
+                ))
+                ssup.append((movimentacoes[-1], banco, dia))
+
+        creditos_cp = self._criar(ContasAPagar, creditos_cp)
+        self._titulos_pagos('CP', creditos_cp)
+        for cp in creditos_cp:
+            ciclo = ciclos[cp.supervisor_id]
+            ciclo.saldo_disponivel += cp.valor
+            movimentacoes.append(MovimentacaoSupervisor(
+                saldo_supervisor=ciclo, tipo='CREDITO', valor=cp.valor,
+                descricao=f"CP {cp.nota} — {cp.fornecedor}", referencia_cp=cp, data=cp.data_baixa,
+            ))
+
+        with _datas_do_historico(MovimentacaoSupervisor):
+            self._criar(MovimentacaoSupervisor, movimentacoes)
+        SaldoSupervisor.objects.bulk_update(list(ciclos.values()), ['saldo_disponivel'], batch_size=self.lote)
+        SaldoSupervisor.atualizar_total_debitos([c.pk for c in ciclos.values()])
+        self.criados['SaldoSupervisor'] = len(ciclos)
+
+        for mov, banco, dia in ssup:
+            nome = mov.saldo_supervisor.supervisor.first_name
+            self.base_saldo.append(BaseSaldo(
+                origem='SSUP', id_origem=mov.pk, nome=f"Transferência de {nome} (Saldo Supervisor)",
+                empresa='-', data_emissao=dia, banco=banco.nome, vencimento=dia, valor=mov.valor,
+                status='PAGO', data_baixa=dia, usuario_baixa=self.financeiro[0].username,
+            ))
+
+
+class Command(BaseCommand):
+    help = (
+        "Gera uma base com volume de produção (cadastros, dezenas de milhares de CP/CR, "
+        "transferências, despesas com histórico, folhas e extras), de forma determinística "
+        "a partir de --seed e --hoje, com BaseSaldo, saldo supervisor e saldo diário consistentes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--escala', type=float, default=1.0,
+                            help="Multiplica as quantidades padrão (0.1 = base pequena, 3 = três vezes maior).")
+        parser.add_argument('--hoje', type=date.fromisoformat, default=None,
+                            help="Data de referência AAAA-MM-DD (padrão: hoje). Fixe para bases idênticas entre dias.")
+        parser.add_argument('--dias', type=int, default=730, help="Dias de histórico antes de --hoje.")
+        parser.add_argument('--prefixo', default='VOL', help="Prefixo dos nomes e documentos gerados.")
+        parser.add_argument('--lote', type=int, default=1000, help="Tamanho dos lotes do bulk_create.")
+
+    def handle(self, *args, **opts):
+        inicio = time.perf_counter()
+        gerador = GeradorVolume(
+            seed=opts['seed'], escala=opts['escala'], hoje=opts['hoje'], dias=opts['dias'],
+            prefixo=opts['prefixo'], lote=opts['lote'], log=self.stdout.write,
+        )
+        criados = gerador.gerar()
+        for nome, quantidade in criados.items():
+            self.stdout.write(f"{quantidade:>8}  {nome}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Base gerada em {time.perf_counter() - inicio:.1f} s ({sum(criados.values())} registros)."
+        ))
@@ -0,0 +1,24 @@
+# financeiro/management/commands/sincronizar_sequencias.py
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from financeiro.sequencias import sincronizar_sequencias
+
+
+class Command(BaseCommand):
+    help = (
+        "Acerta as sequências nativas do PostgreSQL e os contadores da tabela Sequencial "
+        "para o maior dos dois (nenhum volta para trás). Rode depois de restaurar a tabela "
+        "Sequencial e antes de trocar SEQUENCIAL_BACKEND de 'postgres' para 'tabela', com o "
+        "sistema parado."
+    )
+
+    def handle(self, *args, **opts):
+        if connection.vendor != 'postgresql':
+            raise CommandError("Só há sequências nativas no PostgreSQL.")
+        acertados = sincronizar_sequencias()
+        if acertados:
+            self.stdout.write(self.style.SUCCESS(f"Acertados: {', '.join(acertados)}"))
+        else:
+            self.stdout.write(self.style.SUCCESS("Sequências e contadores já conferem."))
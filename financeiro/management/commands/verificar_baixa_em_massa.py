@@ -0,0 +1,167 @@
+# financeiro/management/commands/verificar_baixa_em_massa.py
+
+import random
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from cadastros.models import Banco, Empresa, Fornecedor, Cliente
+from core.models import UsuarioCustomizado
+from financeiro.baixas import alterar_status_titulos
+from financeiro.models import (
+    ContasAPagar, ContasAReceber, BaseSaldo, SaldoDiarioBanco, SaldoSupervisor, MovimentacaoSupervisor,
+)
+
+
+class _Rollback(Exception):
+    pass
+
+
+# (status, campos extras) de cada ação do admin
+ACOES = {
+    'pago': ('PAGO', lambda usuario, hoje: {'data_baixa': hoje, 'usuario_baixa': usuario}),
+    'cancelado': ('CANCELADO', lambda usuario, hoje: {}),
+    'pendente': ('PENDENTE', lambda usuario, hoje: {'data_baixa': None, 'usuario_baixa': None}),
+}
+
+
+def _por_titulo(queryset, status, **campos):
+    """Caminho antigo das ações: save() título a título (signals e _save_logic)."""
+    for obj in queryset:
+        obj.status = status
+        for campo, valor in campos.items():
+            setattr(obj, campo, valor)
+        obj.save()
+
+
+def _foto():
+    """Estado do razão comparável entre os dois caminhos (sem pks gerados)."""
+    diario = []
+    anterior = {}
+    for linha in SaldoDiarioBanco.objects.order_by('banco_id', 'dia').values_list(
+        'banco_id', 'dia', 'entradas', 'saidas', 'saldo'
+    ):
+        # Um dia cujo movimento líquido é zero pode ou não ter linha — o saldo é o mesmo
+        if anterior.get(linha[0], (0, 0, 0)) != linha[2:]:
+            diario.append(linha)
+        anterior[linha[0]] = linha[2:]
+    return {
+        'CP': sorted(ContasAPagar.objects.values_list('pk', 'status', 'data_baixa', 'usuario_baixa_id')),
+        'CR': sorted(ContasAReceber.objects.values_list('pk', 'status', 'data_baixa', 'usuario_baixa_id')),
+        'BaseSaldo': sorted(BaseSaldo.objects.values_list(
+            'origem', 'id_origem', 'nome', 'empresa', 'data_emissao', 'banco', 'vencimento',
+            'valor', 'status', 'data_baixa', 'usuario_baixa',
+        )),
+        'SaldoDiarioBanco': diario,
+        'SaldoSupervisor': sorted(SaldoSupervisor.objects.values_list(
+            'supervisor_id', 'status', 'saldo_disponivel', 'data_inicio',
+        )),
+        'MovimentacaoSupervisor': sorted(MovimentacaoSupervisor.objects.values_list(
+            'saldo_supervisor__supervisor_id', 'saldo_supervisor__status',
+            'tipo', 'valor', 'descricao', 'referencia_cp_id',
+        )),
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        "Teste de propriedade da baixa em massa: para cenários aleatórios (dentro de uma "
+        "transação desfeita ao final), aplica cada ação do admin título a título e pelo "
+        "serviço em massa, e falha se o razão resultante for diferente."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rodadas', type=int, default=30)
+        parser.add_argument('--titulos', type=int, default=40, help="CP e CR por rodada.")
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **opts):
+        divergencias = []
+        try:
+            with transaction.atomic():
+                base = self._cadastros()
+                for rodada in range(opts['rodadas']):
+                    rnd = random.Random(opts['seed'] + rodada)
+                    acao = rnd.choice(list(ACOES))
+                    diferencas = self._rodada(rnd, base, acao, opts['titulos'])
+                    if diferencas:
+                        divergencias.append(rodada)
+                        self.stdout.write(self.style.ERROR(f"✗ rodada {rodada} ({acao}): {', '.join(diferencas)}"))
+                    else:
+                        self.stdout.write(f"✓ rodada {rodada} ({acao})")
+                raise _Rollback
+        except _Rollback:
+            pass
+
+        if divergencias:
+            raise CommandError(f"Baixa em massa divergiu do save() título a título nas rodadas {divergencias}")
+        self.stdout.write(self.style.SUCCESS("OK — mesmo razão nos dois caminhos."))
+
+    def _cadastros(self):
+        sufixo = '__baixa__'
+        return {
+            'empresa': Empresa.objects.create(nome=f"Empresa {sufixo}"),
+            'fornecedor': Fornecedor.objects.create(razao_social=f"Fornecedor {sufixo}", cnpj_cpf=sufixo),
+            'cliente': Cliente.objects.create(razao_social=f"Cliente {sufixo}", forma_recebimento='PIX'),
+            'bancos': [Banco.objects.create(nome=f"Banco {sufixo}{i}") for i in range(3)],
+            'usuarios': [UsuarioCustomizado.objects.create(username=f"{sufixo}{i}") for i in range(4)],
+        }
+
+    def _rodada(self, rnd, base, acao, qtd):
+        try:
+            with transaction.atomic():
+                cps, crs = self._cenario(rnd, base, qtd)
+                status, campos = ACOES[acao]
+                campos = campos(rnd.choice(base['usuarios']), date.today())
+                selecionados = {
+                    ContasAPagar: rnd.sample(cps, k=rnd.randint(1, len(cps))),
+                    ContasAReceber: rnd.sample(crs, k=rnd.randint(1, len(crs))),
+                }
+
+                fotos = []
+                for caminho in (_por_titulo, alterar_status_titulos):
+                    try:
+                        with transaction.atomic():
+                            for modelo, ids in selecionados.items():
+                                caminho(modelo.objects.filter(pk__in=ids), status, **campos)
+                            fotos.append(_foto())
+                            raise _Rollback
+                    except _Rollback:
+                        pass
+                raise _Rollback
+        except _Rollback:
+            pass
+        return [chave for chave in fotos[0] if fotos[0][chave] != fotos[1][chave]]
+
+    def _cenario(self, rnd, base, qtd):
+        """Títulos em status variados; CPs pagos com supervisor geram crédito pelo caminho normal."""
+        hoje = date.today()
+        cps, crs = [], []
+        for i in range(qtd):
+            d = hoje - timedelta(days=rnd.randint(0, 30))
+            status = rnd.choice(['PENDENTE', 'PAGO', 'PAGO', 'CANCELADO'])
+            cp = ContasAPagar(
+                fornecedor=base['fornecedor'], empresa_pagadora=base['empresa'], banco=rnd.choice(base['bancos']),
+                data_emissao=d, vencimento=d, valor=Decimal(rnd.randint(100, 50000)) / 100,
+                supervisor=rnd.choice(base['usuarios'] + [None]), status=status,
+                data_baixa=d if status == 'PAGO' else None,
+            )
+            cp.save()
+            cps.append(cp.pk)
+            cr = ContasAReceber(
+                cliente=base['cliente'], empresa_prestadora=base['empresa'], banco=rnd.choice(base['bancos']),
+                data_emissao=d, vencimento=d, valor=Decimal(rnd.randint(100, 50000)) / 100, status=status,
+                data_baixa=d if status == 'PAGO' else None,
+            )
+            cr.save()
+            crs.append(cr.pk)
+
+        # Alguns ciclos já tiveram utilização (débito), o que impede o cancelamento
+        for saldo in SaldoSupervisor.objects.filter(status='ABERTO'):
+            if rnd.random() < 0.4:
+                MovimentacaoSupervisor.objects.create(
+                    saldo_supervisor=saldo, tipo='DEBITO', valor=Decimal('1.00'), descricao='Utilização',
+                )
+        return cps, crs
@@ -0,0 +1,114 @@
+# financeiro/management/commands/verificar_indices.py
+
+import re
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from financeiro.models import ContasAPagar, ContasAReceber, BaseSaldo, SaldoDiarioBanco
+from workflow.models import Despesa, LogWorkflow
+from financeiro.management.commands.benchmark_saldos import Command as BenchmarkSaldos
+
+
+class _Rollback(Exception):
+    pass
+
+
+def _consultas_quentes(bancos, despesa):
+    """(descrição, queryset) das consultas dos dashboards, admin e signals."""
+    hoje = date.today()
+    ids = [b.pk for b in bancos]
+    nomes = [b.nome for b in bancos]
+    return [
+        ("CP pendentes vencidos (dashboard)",
+         ContasAPagar.objects.filter(status='PENDENTE', vencimento__lt=hoje)),
+        ("CR pendentes vencidos (dashboard)",
+         ContasAReceber.objects.filter(status='PENDENTE', vencimento__lt=hoje)),
+        ("CP do ano (fluxo de caixa)",
+         ContasAPagar.objects.filter(vencimento__year=hoje.year)),
+        ("CR do ano (fluxo de caixa)",
+         ContasAReceber.objects.filter(vencimento__year=hoje.year)),
+        ("CP pagos por banco (saldos)",
+         ContasAPagar.objects.filter(banco_id__in=ids, status='PAGO', data_baixa__lte=hoje)),
+        ("CR pagos por banco (saldos)",
+         ContasAReceber.objects.filter(banco_id__in=ids, status='PAGO', data_baixa__lte=hoje)),
+        ("BaseSaldo por origem (signals)",
+         BaseSaldo.objects.filter(origem='CP', id_origem=1)),
+        ("BaseSaldo SSUP por banco (saldos)",
+         BaseSaldo.objects.filter(banco__in=nomes, origem='SSUP', data_baixa__lte=hoje)),
+        ("Saldo diário do banco até a data",
+         SaldoDiarioBanco.objects.filter(banco_id=ids[0], dia__lte=hoje).order_by('-dia')),
+        ("Despesas por status/tipo/período (painel SLA)",
+         Despesa.objects.filter(status='AGUARDANDO_FIN', tipo_lancamento='CAIXINHA',
+                                data_criacao__gte=timezone.now() - timedelta(days=30))),
+        ("Logs de uma despesa (diálogo)",
+         LogWorkflow.objects.filter(despesa=despesa).order_by('data_hora')),
+    ]
+
+
+class Command(BaseCommand):
+    help = (
+        "Popula (dentro de uma transação desfeita ao final) uma base de exemplo e roda "
+        "EXPLAIN nas consultas quentes. Falha se alguma delas varrer a tabela inteira."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--linhas', type=int, default=3000, help="Linhas de CP, de CR e de Transferência.")
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **opts):
+        falhas = []
+        try:
+            with transaction.atomic():
+                bancos = BenchmarkSaldos()._popular(5, opts['linhas'], opts['seed'])
+                despesa = self._popular_workflow(opts['linhas'])
+                self._preparar_planejador()
+
+                for descricao, qs in _consultas_quentes(bancos, despesa):
+                    tabela = qs.model._meta.db_table
+                    plano = qs.explain()
+                    if self._varredura_completa(plano, tabela):
+                        falhas.append(descricao)
+                        self.stdout.write(self.style.ERROR(f"✗ {descricao}"))
+                        self.stdout.write(plano)
+                    else:
+                        self.stdout.write(f"✓ {descricao}")
+                raise _Rollback
+        except _Rollback:
+            pass
+
+        if falhas:
+            raise CommandError(f"Consultas sem índice: {', '.join(falhas)}")
+        self.stdout.write(self.style.SUCCESS("OK — todas as consultas usam índice."))
+
+    def _popular_workflow(self, linhas):
+        from core.models import UsuarioCustomizado
+
+        usuario = UsuarioCustomizado.objects.create(username='__verificar_indices__')
+        tipos = ['CAIXINHA', 'SOLICITACAO', 'EXTRA', 'FOLHA']
+        status = ['AGUARDANDO_RH', 'AGUARDANDO_FIN', 'PAGO', 'CONFERIDO', 'CANCELADO']
+        despesas = Despesa.objects.bulk_create([
+            Despesa(valor=10, solicitante=usuario, tipo_lancamento=tipos[i % 4], status=status[i % 5])
+            for i in range(linhas)
+        ], batch_size=500)
+        LogWorkflow.objects.bulk_create([
+            LogWorkflow(despesa=d, usuario=usuario, perfil_usuario='-', acao='Criou')
+            for d in despesas for _ in range(3)
+        ], batch_size=500)
+        return despesas[0]
+
+    def _preparar_planejador(self):
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+            if connection.vendor == 'postgresql':
+                # Tabelas de teste são pequenas: o que importa é se existe um índice utilizável
+                cursor.execute('SET LOCAL enable_seqscan = off')
+
+    @staticmethod
+    def _varredura_completa(plano, tabela):
+        if connection.vendor == 'postgresql':
+            return re.search(rf'Seq Scan on {tabela}\b', plano) is not None
+        # SQLite: "SCAN tabela" sem "USING ... INDEX" é leitura da tabela inteira
+        return re.search(rf'\bSCAN {tabela}\b(?! USING)', plano) is not None
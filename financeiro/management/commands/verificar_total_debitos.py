@@ -0,0 +1,39 @@
+# financeiro/management/commands/verificar_total_debitos.py
+
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import F, Q, Sum, Value, DecimalField
+from django.db.models.functions import Coalesce
+
+from financeiro.models import SaldoSupervisor
+
+
+class Command(BaseCommand):
+    help = (
+        "Confere SaldoSupervisor.total_debitos contra a soma dos DÉBITOS das movimentações. "
+        "Falha se houver divergência; com --corrigir, recalcula os ciclos divergentes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--corrigir', action='store_true')
+
+    def handle(self, *args, **opts):
+        divergentes = list(
+            SaldoSupervisor.objects.annotate(
+                soma=Coalesce(
+                    Sum('movimentacoes__valor', filter=Q(movimentacoes__tipo='DEBITO')),
+                    Value(Decimal('0')), output_field=DecimalField(max_digits=12, decimal_places=2),
+                )
+            ).exclude(total_debitos=F('soma')).values_list('pk', 'numero', 'total_debitos', 'soma')
+        )
+        for _, numero, gravado, soma in divergentes:
+            self.stdout.write(f"{numero}: gravado R$ {gravado}, movimentações R$ {soma}")
+
+        if not divergentes:
+            self.stdout.write(self.style.SUCCESS("OK — total_debitos confere em todos os ciclos."))
+            return
+        if not opts['corrigir']:
+            raise CommandError(f"{len(divergentes)} ciclo(s) com total_debitos divergente. Use --corrigir.")
+        SaldoSupervisor.atualizar_total_debitos([pk for pk, *_ in divergentes])
+        self.stdout.write(self.style.SUCCESS(f"{len(divergentes)} ciclo(s) corrigido(s)."))
@@ -0,0 +1,93 @@
+# Generated by Django 5.2.2 on 2026-10-18 12:38
+
+from decimal import Decimal
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Sum
+
+
+def popular_saldo_diario(apps, schema_editor):
+    """
+    Foto diária inicial (mesma regra de financeiro.saldos.reconstruir_saldo_diario,
+    copiada aqui para a migração não depender do código atual): CR entra, CP sai,
+    transferências entram no destino e saem da origem (a devolvida é estornada na
+    data de devolução) e BaseSaldo 'SSUP' entra no banco de mesmo nome.
+    """
+    Banco = apps.get_model('cadastros', 'Banco')
+    SaldoDiarioBanco = apps.get_model('financeiro', 'SaldoDiarioBanco')
+    zero = Decimal('0')
+    diario = {}
+
+    def somar(banco_id, dia, entrada, saida):
+        if banco_id and dia:
+            e, s = diario.get((banco_id, dia), (zero, zero))
+            diario[(banco_id, dia)] = (e + entrada, s + saida)
+
+    for modelo, na_entrada in (('ContasAReceber', True), ('ContasAPagar', False)):
+        linhas = (
+            apps.get_model('financeiro', modelo).objects.filter(status='PAGO', data_baixa__isnull=False)
+            .order_by().values('banco_id', 'data_baixa').annotate(total=Sum('valor'))
+        )
+        for row in linhas:
+            total = row['total'] or zero
+            somar(row['banco_id'], row['data_baixa'], *((total, zero) if na_entrada else (zero, total)))
+
+    trf = apps.get_model('financeiro', 'Transferencia').objects.exclude(status='CANCELADA')
+    for campo, na_entrada in (('banco_destino_id', True), ('banco_origem_id', False)):
+        for row in trf.order_by().values(campo, 'data').annotate(total=Sum('valor')):
+            total = row['total'] or zero
+            somar(row[campo], row['data'], *((total, zero) if na_entrada else (zero, total)))
+        devolvidas = trf.filter(status='TEMP_DEVOLVIDA', data_devolucao__isnull=False).order_by()
+        for row in devolvidas.values(campo, 'data', 'data_devolucao').annotate(total=Sum('valor')):
+            total = row['total'] or zero
+            dia = max(row['data'], row['data_devolucao'])
+            somar(row[campo], dia, *((-total, zero) if na_entrada else (zero, -total)))
+
+    ids_por_nome = {}
+    for banco_id, nome in Banco.objects.values_list('id', 'nome'):
+        ids_por_nome.setdefault(nome, []).append(banco_id)
+    ssup = (
+        apps.get_model('financeiro', 'BaseSaldo').objects.filter(origem='SSUP', data_baixa__isnull=False)
+        .order_by().values('banco', 'data_baixa').annotate(total=Sum('valor'))
+    )
+    for row in ssup:
+        for banco_id in ids_por_nome.get(row['banco'], []):
+            somar(banco_id, row['data_baixa'], row['total'] or zero, zero)
+
+    linhas = []
+    acumulado = {}
+    for (banco_id, dia), (entrada, saida) in sorted(diario.items()):
+        e, s = acumulado.get(banco_id, (zero, zero))
+        e, s = e + entrada, s + saida
+        acumulado[banco_id] = (e, s)
+        linhas.append(SaldoDiarioBanco(banco_id=banco_id, dia=dia, entradas=e, saidas=s, saldo=e - s))
+    SaldoDiarioBanco.objects.bulk_create(linhas, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cadastros', '0010_alter_colaboradorinfo_cpf'),
+        ('financeiro', '0017_fornecedor_nullable_contasapagar'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SaldoDiarioBanco',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('dia', models.DateField(verbose_name='Dia')),
+                ('entradas', models.DecimalField(decimal_places=2, default=0, max_digits=15, verbose_name='Entradas Acumuladas')),
+                ('saidas', models.DecimalField(decimal_places=2, default=0, max_digits=15, verbose_name='Saídas Acumuladas')),
+                ('saldo', models.DecimalField(decimal_places=2, default=0, max_digits=15, verbose_name='Saldo Acumulado')),
+                ('banco', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='saldos_diarios', to='cadastros.banco', verbose_name='Banco')),
+            ],
+            options={
+                'verbose_name': 'Saldo Diário do Banco',
+                'verbose_name_plural': 'Saldos Diários dos Bancos',
+                'unique_together': {('banco', 'dia')},
+            },
+        ),
+        migrations.RunPython(popular_saldo_diario, migrations.RunPython.noop),
+    ]
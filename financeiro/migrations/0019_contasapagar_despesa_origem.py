@@ -0,0 +1,40 @@
+# Generated by Django 5.2.2 on 2026-10-18 12:42
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def vincular_despesas_workflow(apps, schema_editor):
+    """Preenche despesa_origem a partir das notas 'WF-<id>' geradas pelo workflow."""
+    ContasAPagar = apps.get_model('financeiro', 'ContasAPagar')
+    Despesa = apps.get_model('workflow', 'Despesa')
+
+    contas = []
+    for conta in ContasAPagar.objects.filter(nota__startswith='WF-').only('pk', 'nota'):
+        sufixo = conta.nota[3:]
+        if sufixo.isdigit():
+            conta.despesa_origem_id = int(sufixo)
+            contas.append(conta)
+
+    existentes = set(
+        Despesa.objects.filter(pk__in={c.despesa_origem_id for c in contas}).values_list('pk', flat=True)
+    )
+    contas = [c for c in contas if c.despesa_origem_id in existentes]
+    ContasAPagar.objects.bulk_update(contas, ['despesa_origem'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('financeiro', '0018_saldodiariobanco'),
+        ('workflow', '0020_despesa_pagamento_folha_alter_despesa_fornecedor_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='contasapagar',
+            name='despesa_origem',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='contas_a_pagar', to='workflow.despesa', verbose_name='Despesa de Origem (Workflow)'),
+        ),
+        migrations.RunPython(vincular_despesas_workflow, migrations.RunPython.noop),
+    ]
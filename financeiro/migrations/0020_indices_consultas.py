@@ -0,0 +1,49 @@
+# Generated by Django 5.2.2 on 2026-10-18 12:43
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cadastros', '0010_alter_colaboradorinfo_cpf'),
+        ('financeiro', '0019_contasapagar_despesa_origem'),
+        ('workflow', '0020_despesa_pagamento_folha_alter_despesa_fornecedor_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='basesaldo',
+            index=models.Index(fields=['origem', 'id_origem'], name='bs_origem_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='basesaldo',
+            index=models.Index(fields=['banco', 'origem', 'data_baixa'], name='bs_banco_origem_baixa_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='contasapagar',
+            index=models.Index(fields=['status', 'vencimento'], name='cp_status_venc_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='contasapagar',
+            index=models.Index(fields=['vencimento'], name='cp_venc_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='contasapagar',
+            index=models.Index(fields=['banco', 'status', 'data_baixa'], name='cp_banco_status_baixa_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='contasareceber',
+            index=models.Index(fields=['status', 'vencimento'], name='cr_status_venc_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='contasareceber',
+            index=models.Index(fields=['vencimento'], name='cr_venc_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='contasareceber',
+            index=models.Index(fields=['banco', 'status', 'data_baixa'], name='cr_banco_status_baixa_idx'),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.2 on 2026-10-18 13:10
+
+from django.db import migrations
+from django.db.models import Max
+
+
+def iniciar_contador_ss(apps, schema_editor):
+    """
+    O número 'SS-' vinha do maior id + 1; o contador 'SS' começa do maior entre
+    o último número já gravado e o maior id, para não repetir nenhum deles.
+    """
+    Sequencial = apps.get_model('financeiro', 'Sequencial')
+    SaldoSupervisor = apps.get_model('financeiro', 'SaldoSupervisor')
+
+    ultimo = SaldoSupervisor.objects.aggregate(m=Max('id'))['m'] or 0
+    for numero in SaldoSupervisor.objects.filter(numero__startswith='SS-').values_list('numero', flat=True):
+        if numero[3:].isdigit():
+            ultimo = max(ultimo, int(numero[3:]))
+
+    contador, criado = Sequencial.objects.get_or_create(prefixo='SS', defaults={'ultimo_numero': ultimo})
+    if not criado and contador.ultimo_numero < ultimo:
+        contador.ultimo_numero = ultimo
+        contador.save(update_fields=['ultimo_numero'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('financeiro', '0020_indices_consultas'),
+    ]
+
+    operations = [
+        migrations.RunPython(iniciar_contador_ss, migrations.RunPython.noop),
+    ]
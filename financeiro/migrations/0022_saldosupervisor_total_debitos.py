@@ -0,0 +1,33 @@
+# Generated by Django 5.2.2 on 2026-10-18 13:04
+
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def preencher_total_debitos(apps, schema_editor):
+    SaldoSupervisor = apps.get_model('financeiro', 'SaldoSupervisor')
+    MovimentacaoSupervisor = apps.get_model('financeiro', 'MovimentacaoSupervisor')
+    debitos = (
+        MovimentacaoSupervisor.objects.filter(saldo_supervisor=OuterRef('pk'), tipo='DEBITO')
+        .order_by().values('saldo_supervisor').annotate(total=Sum('valor')).values('total')
+    )
+    SaldoSupervisor.objects.update(total_debitos=Coalesce(Subquery(debitos), Value(Decimal('0'))))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('financeiro', '0021_sequencial_saldo_supervisor'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='saldosupervisor',
+            name='total_debitos',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=12, verbose_name='Total de Débitos'),
+        ),
+        migrations.RunPython(preencher_total_debitos, migrations.RunPython.noop),
+    ]
@@ -1,6 +1,8 @@
 # financeiro/models.py
 
+from decimal import Decimal
 from django.db import models, transaction
+from django.db.models.functions import Coalesce
 from django.utils import timezone
 from django.contrib import messages
 from datetime import date
@@ -60,6 +62,11 @@ class ContasAPagar(models.Model):
     )
     data_baixa = models.DateField(null=True, blank=True, verbose_name="Data de Baixa/Pagamento")
     usuario_baixa = models.ForeignKey(UsuarioCustomizado, on_delete=models.SET_NULL, null=True, blank=True, verbose_name="Usuário da Baixa")
+    despesa_origem = models.ForeignKey(
+        'workflow.Despesa', on_delete=models.SET_NULL,
+        null=True, blank=True, related_name='contas_a_pagar',
+        verbose_name="Despesa de Origem (Workflow)"
+    )
 
     def status_visual(self):
         hoje = date.today()
@@ -91,10 +98,8 @@ class ContasAPagar(models.Model):
 
     def _save_logic(self, request=None, *args, **kwargs):
         if not self.nota:
-            contador, created = Sequencial.objects.get_or_create(prefixo='CP', defaults={'ultimo_numero': 0})
-            contador.ultimo_numero += 1
-            contador.save()
-            self.nota = f"CP-{contador.ultimo_numero:05d}"
+            from financeiro.sequencias import proximo_numero
+            self.nota = f"CP-{proximo_numero('CP'):05d}"
             if request:
                 messages.success(request, f"SUCESSO! Conta a Pagar criada: {self.nota}")
         if self.status == 'PAGO' and not self.data_baixa:
@@ -193,6 +198,13 @@ class ContasAPagar(models.Model):
     class Meta:
         verbose_name = "Conta a Pagar"
         verbose_name_plural = "Contas a Pagar"
+        indexes = [
+            # dashboard / fluxo de caixa: status + vencimento
+            models.Index(fields=['status', 'vencimento'], name='cp_status_venc_idx'),
+            models.Index(fields=['vencimento'], name='cp_venc_idx'),
+            # saldos por banco: banco + PAGO + data_baixa <= data
+            models.Index(fields=['banco', 'status', 'data_baixa'], name='cp_banco_status_baixa_idx'),
+        ]
 
 
 class ContasAReceber(models.Model):
@@ -234,20 +246,24 @@ class ContasAReceber(models.Model):
     status_visual.admin_order_field = 'vencimento'
 
     def save(self, request=None, *args, **kwargs):
-        if not self.nota:
-            contador, created = Sequencial.objects.get_or_create(prefixo='CR', defaults={'ultimo_numero': 0})
-            contador.ultimo_numero += 1
-            contador.save()
-            self.nota = f"CR-{contador.ultimo_numero:05d}"
-            if request:
-                messages.success(request, f"SUCESSO! Conta a Receber criada: {self.nota}")
-        if self.status == 'PAGO' and not self.data_baixa:
-            self.data_baixa = date.today()
-        super().save(*args, **kwargs)
+        with transaction.atomic():
+            if not self.nota:
+                from financeiro.sequencias import proximo_numero
+                self.nota = f"CR-{proximo_numero('CR'):05d}"
+                if request:
+                    messages.success(request, f"SUCESSO! Conta a Receber criada: {self.nota}")
+            if self.status == 'PAGO' and not self.data_baixa:
+                self.data_baixa = date.today()
+            super().save(*args, **kwargs)
 
     class Meta:
         verbose_name = "Conta a Receber"
         verbose_name_plural = "Contas a Receber"
+        indexes = [
+            models.Index(fields=['status', 'vencimento'], name='cr_status_venc_idx'),
+            models.Index(fields=['vencimento'], name='cr_venc_idx'),
+            models.Index(fields=['banco', 'status', 'data_baixa'], name='cr_banco_status_baixa_idx'),
+        ]
 
 
 class BaseSaldo(models.Model):
@@ -270,6 +286,34 @@ class BaseSaldo(models.Model):
         verbose_name = "Base de Saldo (Extrato)"
         verbose_name_plural = "Base de Saldos (Extrato)"
         ordering = ['-data_baixa']
+        indexes = [
+            # signals de CP/CR/TRF localizam a linha pela origem
+            models.Index(fields=['origem', 'id_origem'], name='bs_origem_id_idx'),
+            # saldos por banco: SSUP por nome do banco até a data
+            models.Index(fields=['banco', 'origem', 'data_baixa'], name='bs_banco_origem_baixa_idx'),
+        ]
+
+
+class SaldoDiarioBanco(models.Model):
+    """
+    Foto diária acumulada de cada banco: entradas, saídas e saldo (sem o saldo
+    inicial do banco) considerando tudo que foi baixado até o dia, inclusive.
+    Mantida incrementalmente por financeiro/saldos.py — reconstrua com
+    `manage.py reconstruir_saldo_diario`.
+    """
+    banco = models.ForeignKey(Banco, on_delete=models.CASCADE, related_name='saldos_diarios', verbose_name="Banco")
+    dia = models.DateField(verbose_name="Dia")
+    entradas = models.DecimalField(max_digits=15, decimal_places=2, default=0, verbose_name="Entradas Acumuladas")
+    saidas = models.DecimalField(max_digits=15, decimal_places=2, default=0, verbose_name="Saídas Acumuladas")
+    saldo = models.DecimalField(max_digits=15, decimal_places=2, default=0, verbose_name="Saldo Acumulado")
+
+    def __str__(self):
+        return f"{self.banco} | {self.dia} | R$ {self.saldo}"
+
+    class Meta:
+        verbose_name = "Saldo Diário do Banco"
+        verbose_name_plural = "Saldos Diários dos Bancos"
+        unique_together = ('banco', 'dia')
 
 
 class GerarFixo(models.Model):
@@ -332,14 +376,24 @@ class Transferencia(models.Model):
         )
 
     def save(self, *args, **kwargs):
+        from financeiro.saldos import movimentos_transferencia, aplicar_movimentos
+
         is_new = not self.pk
 
         # Preenche data de devolução automaticamente
         if self.status == 'TEMP_DEVOLVIDA' and not self.data_devolucao:
             self.data_devolucao = date.today()
 
+        anterior = None if is_new else Transferencia.objects.filter(pk=self.pk).first()
+
         super().save(*args, **kwargs)
 
+        # Rola o saldo diário dos bancos envolvidos (desfaz o estado anterior, aplica o novo)
+        aplicar_movimentos(
+            movimentos_transferencia(anterior) if anterior else [],
+            movimentos_transferencia(self),
+        )
+
         # Remove registros anteriores para recriar atualizados (cobre edições e cancelamentos)
         BaseSaldo.objects.filter(origem='TRF', id_origem=self.pk).delete()
 
@@ -377,7 +431,10 @@ class Transferencia(models.Model):
             )
 
     def delete(self, *args, **kwargs):
+        from financeiro.saldos import movimentos_transferencia, aplicar_movimentos
+
         BaseSaldo.objects.filter(origem='TRF', id_origem=self.pk).delete()
+        aplicar_movimentos(movimentos_transferencia(self), [])
         super().delete(*args, **kwargs)
 
 
@@ -401,6 +458,9 @@ class SaldoSupervisor(models.Model):
     )
     data_fechamento = models.DateTimeField(null=True, blank=True, verbose_name="Data do Fechamento")
     observacao_fechamento = models.TextField(blank=True, verbose_name="Observações do Fechamento")
+    # Soma dos DÉBITOS das movimentações (a utilização do ciclo), mantida pelos signals
+    # de MovimentacaoSupervisor (conferência: manage.py verificar_total_debitos)
+    total_debitos = models.DecimalField(max_digits=12, decimal_places=2, default=0, editable=False, verbose_name="Total de Débitos")
 
     class Meta:
         verbose_name = "Saldo Supervisor"
@@ -412,17 +472,17 @@ class SaldoSupervisor(models.Model):
             if SaldoSupervisor.objects.filter(supervisor=self.supervisor, status='ABERTO').exists():
                 nome = self.supervisor.first_name.strip() or self.supervisor.username
                 raise ValueError(f"Já existe um saldo aberto para {nome}. Feche o ciclo atual antes de criar um novo.")
-        if not self.numero:
-            ultimo = SaldoSupervisor.objects.order_by('-id').first()
-            proximo = (ultimo.id + 1) if ultimo else 1
-            self.numero = f"SS-{proximo:05d}"
-        super().save(*args, **kwargs)
+        with transaction.atomic():
+            # Número e registro na mesma transação: se o save falhar, o número volta
+            if not self.numero:
+                from financeiro.sequencias import proximo_numero
+                self.numero = f"SS-{proximo_numero('SS'):05d}"
+            super().save(*args, **kwargs)
 
     @property
     def utilizacao(self):
-        return self.movimentacoes.filter(tipo='DEBITO').aggregate(
-            total=models.Sum('valor')
-        )['total'] or 0
+        # Soma dos débitos já gravada no próprio ciclo (ver total_debitos)
+        return self.total_debitos
 
     @property
     def saldo(self):
@@ -432,6 +492,17 @@ class SaldoSupervisor(models.Model):
         nome = self.supervisor.first_name.strip() or self.supervisor.username
         return f"{nome} — {self.data_inicio.strftime('%d/%m/%Y')} ({self.get_status_display()})"
 
+    @classmethod
+    def atualizar_total_debitos(cls, ids):
+        """Recalcula total_debitos dos saldos informados com um único UPDATE."""
+        debitos = (
+            MovimentacaoSupervisor.objects.filter(saldo_supervisor=models.OuterRef('pk'), tipo='DEBITO')
+            .order_by().values('saldo_supervisor').annotate(total=models.Sum('valor')).values('total')
+        )
+        cls.objects.filter(pk__in=ids).update(
+            total_debitos=Coalesce(models.Subquery(debitos), models.Value(Decimal('0')))
+        )
+
 
 class MovimentacaoSupervisor(models.Model):
     TIPO_CHOICES = [
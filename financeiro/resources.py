@@ -1,11 +1,35 @@
 from import_export import resources, fields
 from import_export.widgets import ForeignKeyWidget, ManyToManyWidget
 from .models import ContasAPagar, ContasAReceber
+from .sequencias import reservar_bloco
 from cadastros.models import Fornecedor, Empresa, Banco, PlanoDeContas, Cliente
 from core.models import UsuarioCustomizado
 
 
-class ContasAPagarResource(resources.ModelResource):
+class NotaSequencialMixin:
+    """
+    Linhas importadas sem nota recebem os números de uma vez (um único bloco do
+    contador), em vez de um incremento por linha no save().
+    """
+    prefixo_nota = None
+
+    def before_import(self, dataset, **kwargs):
+        super().before_import(dataset, **kwargs)
+        if 'nota' not in dataset.headers:
+            return
+        notas = list(dataset['nota'])
+        vazias = [i for i, nota in enumerate(notas) if not nota]
+        if not vazias:
+            return
+        for i, numero in zip(vazias, reservar_bloco(self.prefixo_nota, len(vazias))):
+            notas[i] = f"{self.prefixo_nota}-{numero:05d}"
+        posicao = dataset.headers.index('nota')
+        del dataset['nota']
+        dataset.insert_col(posicao, notas, header='nota')
+
+
+class ContasAPagarResource(NotaSequencialMixin, resources.ModelResource):
+    prefixo_nota = 'CP'
 
     fornecedor = fields.Field(
         column_name='Fornecedor',
@@ -67,7 +91,8 @@ class ContasAPagarResource(resources.ModelResource):
         export_order = fields
 
 
-class ContasAReceberResource(resources.ModelResource):
+class ContasAReceberResource(NotaSequencialMixin, resources.ModelResource):
+    prefixo_nota = 'CR'
 
     cliente = fields.Field(
         column_name='Cliente',
@@ -0,0 +1,266 @@
+# financeiro/saldos.py
+
+from decimal import Decimal
+from django.db import transaction
+from django.db.models import Sum, F, OuterRef, Subquery
+
+from cadastros.models import Banco
+from financeiro.models import ContasAPagar, ContasAReceber, Transferencia, BaseSaldo
+
+
+def _totais_por(qs, campo):
+    """Agrupa o queryset por `campo` e devolve {valor_do_campo: soma}."""
+    return {
+        row[campo]: row['total'] or Decimal('0')
+        for row in qs.order_by().values(campo).annotate(total=Sum('valor'))
+    }
+
+
+def calcular_saldos_bancos(data_referencia, bancos=None):
+    """
+    Calcula entradas, saídas e saldo de cada banco na data de referência.
+
+    Usa um número fixo de consultas agrupadas (uma por tipo de lançamento),
+    independente da quantidade de bancos. Retorna uma lista de dicts na ordem
+    do queryset `bancos` (padrão: todos os bancos que entram no saldo geral).
+    """
+    if bancos is None:
+        bancos = Banco.objects.filter(entra_no_saldo_geral=True)
+    bancos = list(bancos)
+    ids = [b.pk for b in bancos]
+    nomes = {b.nome for b in bancos}
+
+    cr = _totais_por(
+        ContasAReceber.objects.filter(banco_id__in=ids, status='PAGO', data_baixa__lte=data_referencia),
+        'banco_id',
+    )
+    cp = _totais_por(
+        ContasAPagar.objects.filter(banco_id__in=ids, status='PAGO', data_baixa__lte=data_referencia),
+        'banco_id',
+    )
+
+    # Transferências devolvidas dentro do período não devem contar (efeito líquido = zero)
+    trf = Transferencia.objects.filter(data__lte=data_referencia).exclude(status='CANCELADA').exclude(
+        status='TEMP_DEVOLVIDA', data_devolucao__lte=data_referencia
+    )
+    trf_entrada = _totais_por(trf.filter(banco_destino_id__in=ids), 'banco_destino_id')
+    trf_saida = _totais_por(trf.filter(banco_origem_id__in=ids), 'banco_origem_id')
+
+    # Transferências de Saldo Supervisor para o banco (origem exclusiva 'SSUP' —
+    # não gerada por CP/CR/Transferencia, então não há risco de contar em dobro).
+    # BaseSaldo guarda o banco pelo nome, por isso o agrupamento é por 'banco'.
+    ssup = _totais_por(
+        BaseSaldo.objects.filter(origem='SSUP', banco__in=nomes, data_baixa__lte=data_referencia),
+        'banco',
+    )
+
+    resultado = []
+    zero = Decimal('0')
+    for banco in bancos:
+        total_entradas = cr.get(banco.pk, zero)
+        total_saidas = cp.get(banco.pk, zero)
+        transferencias_entrada = trf_entrada.get(banco.pk, zero)
+        transferencias_saida = trf_saida.get(banco.pk, zero)
+        transferencias_supervisor = ssup.get(banco.nome, zero)
+
+        saldo_inicial = banco.saldo_inicial or zero
+        entradas = total_entradas + transferencias_entrada + transferencias_supervisor
+        saidas = total_saidas + transferencias_saida
+        resultado.append({
+            'banco': banco,
+            'nome': banco.nome,
+            'saldo_inicial': saldo_inicial,
+            'entradas': entradas,
+            'saidas': saidas,
+            'saldo': saldo_inicial + entradas - saidas,
+        })
+    return resultado
+
+
+def dados_base_saldo(tipo, titulo):
+    """Campos da linha de BaseSaldo de um CP (valor negativo) ou CR (positivo) pago."""
+    return {
+        'nome': str(titulo.fornecedor if tipo == 'CP' else titulo.cliente),
+        'empresa': str(titulo.empresa_pagadora if tipo == 'CP' else titulo.empresa_prestadora),
+        'data_emissao': titulo.data_emissao,
+        'banco': str(titulo.banco),
+        'vencimento': titulo.vencimento,
+        'valor': titulo.valor * -1 if tipo == 'CP' else titulo.valor,
+        'status': titulo.status,
+        'data_baixa': titulo.data_baixa,
+        # Pega o usuário se existir, senão coloca 'Sistema'
+        'usuario_baixa': str(titulo.usuario_baixa) if titulo.usuario_baixa else 'Sistema',
+    }
+
+
+# ── Saldo diário materializado (SaldoDiarioBanco) ─────────────────────────────
+# Cada lançamento vira uma lista de movimentos (banco_id, dia, entrada, saída).
+# Ao salvar/excluir, a diferença entre os movimentos antigos e os novos é
+# aplicada só nos dias >= ao dia afetado ("rola o sufixo"), com um UPDATE F().
+
+def movimentos_titulo(tipo, banco_id, status, data_baixa, valor):
+    """Movimentos de um CR (entrada) ou CP (saída). Só conta quando PAGO."""
+    if status != 'PAGO' or not banco_id or not data_baixa or not valor:
+        return []
+    if tipo == 'CR':
+        return [(banco_id, data_baixa, valor, Decimal('0'))]
+    return [(banco_id, data_baixa, Decimal('0'), valor)]
+
+
+def movimentos_transferencia(trf):
+    """
+    Movimentos de uma transferência. A devolvida deixa de contar a partir da
+    data de devolução, então gera um estorno nesse dia.
+    """
+    if trf.status == 'CANCELADA' or not trf.valor:
+        return []
+    zero = Decimal('0')
+    movimentos = [
+        (trf.banco_destino_id, trf.data, trf.valor, zero),
+        (trf.banco_origem_id, trf.data, zero, trf.valor),
+    ]
+    if trf.status == 'TEMP_DEVOLVIDA' and trf.data_devolucao:
+        dia = max(trf.data, trf.data_devolucao)
+        movimentos += [
+            (trf.banco_destino_id, dia, -trf.valor, zero),
+            (trf.banco_origem_id, dia, zero, -trf.valor),
+        ]
+    return movimentos
+
+
+def movimentos_ssup(base_saldo):
+    """Transferência de Saldo Supervisor (BaseSaldo 'SSUP') — o banco é guardado pelo nome."""
+    if base_saldo.origem != 'SSUP' or not base_saldo.data_baixa:
+        return []
+    return [
+        (banco_id, base_saldo.data_baixa, base_saldo.valor, Decimal('0'))
+        for banco_id in Banco.objects.filter(nome=base_saldo.banco).values_list('id', flat=True)
+    ]
+
+
+def aplicar_movimentos(anteriores, novos):
+    """Aplica em SaldoDiarioBanco a diferença entre os movimentos antigos e os novos."""
+    delta = {}
+    for sinal, movimentos in ((-1, anteriores), (1, novos)):
+        for banco_id, dia, entrada, saida in movimentos:
+            e, s = delta.get((banco_id, dia), (Decimal('0'), Decimal('0')))
+            delta[(banco_id, dia)] = (e + sinal * entrada, s + sinal * saida)
+
+    with transaction.atomic():
+        for (banco_id, dia), (entrada, saida) in sorted(delta.items()):
+            if entrada or saida:
+                _rolar_sufixo(banco_id, dia, entrada, saida)
+
+
+def _rolar_sufixo(banco_id, dia, entrada, saida):
+    from financeiro.models import SaldoDiarioBanco
+
+    if not SaldoDiarioBanco.objects.filter(banco_id=banco_id, dia=dia).exists():
+        # Abre a linha do dia copiando o acumulado do último dia anterior
+        anterior = (
+            SaldoDiarioBanco.objects.filter(banco_id=banco_id, dia__lt=dia)
+            .order_by('-dia').values('entradas', 'saidas', 'saldo').first()
+        ) or {}
+        SaldoDiarioBanco.objects.get_or_create(banco_id=banco_id, dia=dia, defaults=anterior)
+
+    SaldoDiarioBanco.objects.filter(banco_id=banco_id, dia__gte=dia).update(
+        entradas=F('entradas') + entrada,
+        saidas=F('saidas') + saida,
+        saldo=F('saldo') + entrada - saida,
+    )
+
+
+def saldos_bancos_na_data(data_referencia, bancos=None):
+    """
+    Mesmo resultado de calcular_saldos_bancos, lido da foto diária: uma única
+    consulta pega a última linha de SaldoDiarioBanco de cada banco até a data.
+    """
+    from financeiro.models import SaldoDiarioBanco
+
+    if bancos is None:
+        bancos = Banco.objects.filter(entra_no_saldo_geral=True)
+    ultimo = SaldoDiarioBanco.objects.filter(
+        banco=OuterRef('pk'), dia__lte=data_referencia
+    ).order_by('-dia')
+    bancos = bancos.annotate(
+        _entradas=Subquery(ultimo.values('entradas')[:1]),
+        _saidas=Subquery(ultimo.values('saidas')[:1]),
+    )
+
+    resultado = []
+    zero = Decimal('0')
+    for banco in bancos:
+        saldo_inicial = banco.saldo_inicial or zero
+        entradas = banco._entradas or zero
+        saidas = banco._saidas or zero
+        resultado.append({
+            'banco': banco,
+            'nome': banco.nome,
+            'saldo_inicial': saldo_inicial,
+            'entradas': entradas,
+            'saidas': saidas,
+            'saldo': saldo_inicial + entradas - saidas,
+        })
+    return resultado
+
+
+def reconstruir_saldo_diario(apps=None):
+    """
+    Apaga e recalcula toda a SaldoDiarioBanco a partir de CP, CR, Transferências
+    e BaseSaldo 'SSUP', com consultas agrupadas por banco e dia.
+    Aceita o registro `apps` para poder ser usada dentro de migrações.
+    """
+    if apps is None:
+        from django.apps import apps
+    get = apps.get_model
+    BancoM = get('cadastros', 'Banco')
+    SaldoDiario = get('financeiro', 'SaldoDiarioBanco')
+    zero = Decimal('0')
+
+    diario = {}
+
+    def _somar(banco_id, dia, entrada, saida):
+        e, s = diario.get((banco_id, dia), (zero, zero))
+        diario[(banco_id, dia)] = (e + entrada, s + saida)
+
+    for tipo, modelo in (('CR', 'ContasAReceber'), ('CP', 'ContasAPagar')):
+        linhas = (
+            get('financeiro', modelo).objects.filter(status='PAGO', data_baixa__isnull=False)
+            .order_by().values('banco_id', 'data_baixa').annotate(total=Sum('valor'))
+        )
+        for row in linhas:
+            for mov in movimentos_titulo(tipo, row['banco_id'], 'PAGO', row['data_baixa'], row['total']):
+                _somar(*mov)
+
+    trf = get('financeiro', 'Transferencia').objects.exclude(status='CANCELADA')
+    for campo_banco, na_entrada in (('banco_destino_id', True), ('banco_origem_id', False)):
+        for row in trf.order_by().values(campo_banco, 'data').annotate(total=Sum('valor')):
+            _somar(row[campo_banco], row['data'], *((row['total'], zero) if na_entrada else (zero, row['total'])))
+        devolvidas = trf.filter(status='TEMP_DEVOLVIDA', data_devolucao__isnull=False).order_by()
+        for row in devolvidas.values(campo_banco, 'data', 'data_devolucao').annotate(total=Sum('valor')):
+            dia = max(row['data'], row['data_devolucao'])
+            _somar(row[campo_banco], dia, *((-row['total'], zero) if na_entrada else (zero, -row['total'])))
+
+    ids_por_nome = {}
+    for banco_id, nome in BancoM.objects.values_list('id', 'nome'):
+        ids_por_nome.setdefault(nome, []).append(banco_id)
+    ssup = (
+        get('financeiro', 'BaseSaldo').objects.filter(origem='SSUP', data_baixa__isnull=False)
+        .order_by().values('banco', 'data_baixa').annotate(total=Sum('valor'))
+    )
+    for row in ssup:
+        for banco_id in ids_por_nome.get(row['banco'], []):
+            _somar(banco_id, row['data_baixa'], row['total'], zero)
+
+    linhas = []
+    acumulado = {}
+    for (banco_id, dia), (entrada, saida) in sorted(diario.items()):
+        e, s = acumulado.get(banco_id, (zero, zero))
+        e, s = e + entrada, s + saida
+        acumulado[banco_id] = (e, s)
+        linhas.append(SaldoDiario(banco_id=banco_id, dia=dia, entradas=e, saidas=s, saldo=e - s))
+
+    with transaction.atomic():
+        SaldoDiario.objects.all().delete()
+        SaldoDiario.objects.bulk_create(linhas, batch_size=1000)
+    return len(linhas)
@@ -0,0 +1,121 @@
+# financeiro/sequencias.py
+#
+# Numeração sequencial das notas (CP-, CR-, LE, SS-). O contador em Sequencial
+# é incrementado com um UPDATE ... SET ultimo_numero = ultimo_numero + n, que
+# trava a linha até o fim da transação: dois workers nunca recebem o mesmo
+# número, e um rollback devolve o número (sem buracos).
+#
+# Com settings.SEQUENCIAL_BACKEND = 'postgres' os números vêm de sequências
+# nativas do PostgreSQL (nextval), sem travar a linha do contador — mais rápido
+# sob concorrência, mas um rollback deixa o número para trás (pode haver buraco).
+# Nesse modo o contador da tabela não acompanha a sequência: antes de voltar
+# para 'tabela', rode manage.py sincronizar_sequencias (com o sistema parado),
+# senão a tabela volta a entregar números já usados.
+
+import re
+
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+from django.db.models import F
+
+from financeiro.models import Sequencial
+
+
+def proximo_numero(prefixo):
+    """Reserva e devolve o próximo número do contador `prefixo`."""
+    return reservar_bloco(prefixo, 1)[0]
+
+
+def reservar_bloco(prefixo, quantidade):
+    """
+    Reserva `quantidade` números de uma vez (importações em massa) e devolve a
+    lista em ordem crescente. No backend de tabela o bloco é contíguo.
+    """
+    if quantidade < 1:
+        return []
+    if _backend() == 'postgres':
+        return _reservar_postgres(prefixo, quantidade)
+    return _reservar_tabela(prefixo, quantidade)
+
+
+def _backend():
+    backend = getattr(settings, 'SEQUENCIAL_BACKEND', 'tabela')
+    if backend == 'postgres' and connection.vendor != 'postgresql':
+        return 'tabela'
+    return backend
+
+
+def _reservar_tabela(prefixo, quantidade):
+    with transaction.atomic():
+        # O UPDATE vem antes da leitura: quem chega depois espera a trava da linha
+        # (no SQLite, a trava do banco) em vez de ler um valor que vai mudar.
+        if not Sequencial.objects.filter(prefixo=prefixo).update(ultimo_numero=F('ultimo_numero') + quantidade):
+            try:
+                with transaction.atomic():
+                    Sequencial.objects.create(prefixo=prefixo, ultimo_numero=quantidade)
+                return list(range(1, quantidade + 1))
+            except IntegrityError:
+                # Outro worker criou o contador ao mesmo tempo
+                Sequencial.objects.filter(prefixo=prefixo).update(ultimo_numero=F('ultimo_numero') + quantidade)
+        ultimo = Sequencial.objects.filter(prefixo=prefixo).values_list('ultimo_numero', flat=True).get()
+    return list(range(ultimo - quantidade + 1, ultimo + 1))
+
+
+_sequencias_criadas = set()
+
+
+def _nome_sequencia(prefixo):
+    return 'financeiro_seq_' + re.sub(r'[^a-z0-9]', '_', prefixo.lower())
+
+
+def _reservar_postgres(prefixo, quantidade):
+    nome = _nome_sequencia(prefixo)
+    with connection.cursor() as cursor:
+        if nome not in _sequencias_criadas:
+            _criar_sequencia(cursor, prefixo, nome)
+            # CREATE SEQUENCE é transacional: se a transação do chamador for desfeita,
+            # a sequência some junto. Só lembra dela depois do commit.
+            transaction.on_commit(lambda: _sequencias_criadas.add(nome))
+        cursor.execute('SELECT nextval(%s) FROM generate_series(1, %s)', [nome, quantidade])
+        return sorted(row[0] for row in cursor.fetchall())
+
+
+def _criar_sequencia(cursor, prefixo, nome):
+    # A sequência começa depois do último número já gravado na tabela.
+    # Trava a linha do contador para duas criações simultâneas não divergirem.
+    with transaction.atomic():
+        contador, _ = Sequencial.objects.select_for_update().get_or_create(
+            prefixo=prefixo, defaults={'ultimo_numero': 0}
+        )
+        cursor.execute(f'CREATE SEQUENCE IF NOT EXISTS "{nome}" START WITH {contador.ultimo_numero + 1}')
+
+
+def sincronizar_sequencias():
+    """
+    Põe cada sequência nativa que já existe e o ultimo_numero do seu contador no
+    maior dos dois: a sequência avança até o contador (depois de copiar ou
+    restaurar a tabela Sequencial) e o contador avança até o último número que a
+    sequência entregou (antes de voltar ao backend de tabela). Nenhum dos dois
+    volta para trás. As sequências que não existem são criadas no primeiro uso, já
+    a partir do contador. Devolve os prefixos acertados.
+    """
+    if connection.vendor != 'postgresql':
+        return []
+    acertados = []
+    with transaction.atomic(), connection.cursor() as cursor:
+        for contador in Sequencial.objects.select_for_update().order_by('prefixo'):
+            nome = _nome_sequencia(contador.prefixo)
+            cursor.execute('SELECT to_regclass(%s)', [nome])
+            if cursor.fetchone()[0] is None:
+                continue
+            cursor.execute(f'SELECT last_value, is_called FROM "{nome}"')
+            ultimo_valor, chamada = cursor.fetchone()
+            entregue = ultimo_valor if chamada else ultimo_valor - 1
+            if contador.ultimo_numero > entregue:
+                cursor.execute('SELECT setval(%s, %s, true)', [nome, contador.ultimo_numero])
+            elif entregue > contador.ultimo_numero:
+                Sequencial.objects.filter(pk=contador.pk).update(ultimo_numero=entregue)
+            else:
+                continue
+            acertados.append(contador.prefixo)
+    return acertados
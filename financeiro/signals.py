@@ -1,30 +1,36 @@
 # financeiro/signals.py
 
-from django.db.models.signals import post_save, post_delete
+from django.db.models.signals import pre_save, post_save, post_delete
 from django.dispatch import receiver
-from .models import ContasAPagar, ContasAReceber, BaseSaldo
+from .models import ContasAPagar, ContasAReceber, BaseSaldo, SaldoSupervisor, MovimentacaoSupervisor
+from .saldos import movimentos_titulo, movimentos_ssup, aplicar_movimentos, dados_base_saldo
+
+
+def _movimentos(tipo, obj):
+    return movimentos_titulo(tipo, obj.banco_id, obj.status, obj.data_baixa, obj.valor)
+
+
+# --- 0. SALDO DIÁRIO: guarda como o título estava antes de salvar ---
+@receiver(pre_save, sender=ContasAPagar)
+@receiver(pre_save, sender=ContasAReceber)
+def guardar_movimento_anterior(sender, instance, **kwargs):
+    tipo = 'CP' if sender is ContasAPagar else 'CR'
+    anterior = None
+    if instance.pk:
+        anterior = sender.objects.filter(pk=instance.pk).only('banco', 'status', 'data_baixa', 'valor').first()
+    instance._movimentos_anteriores = _movimentos(tipo, anterior) if anterior else []
 
 # --- 1. AUTOMAÇÃO CONTAS A PAGAR (CP) ---
 @receiver(post_save, sender=ContasAPagar)
 def atualizar_saldo_cp(sender, instance, **kwargs):
+    aplicar_movimentos(getattr(instance, '_movimentos_anteriores', []), _movimentos('CP', instance))
     # Só gera saldo se estiver PAGO
     if instance.status == 'PAGO':
         # Cria ou Atualiza a linha na BaseSaldo
         BaseSaldo.objects.update_or_create(
             origem='CP',           # Marca que veio do CP
             id_origem=instance.id, # Guarda o ID original para poder editar depois
-            defaults={
-                'nome': str(instance.fornecedor),
-                'empresa': str(instance.empresa_pagadora),
-                'data_emissao': instance.data_emissao,
-                'banco': str(instance.banco),
-                'vencimento': instance.vencimento,
-                'valor': instance.valor * -1, # NEGATIVO (Saída de dinheiro)
-                'status': instance.status,
-                'data_baixa': instance.data_baixa,
-                # Pega o usuário se existir, senão coloca 'Sistema'
-                'usuario_baixa': str(instance.usuario_baixa) if instance.usuario_baixa else 'Sistema'
-            }
+            defaults=dados_base_saldo('CP', instance),  # valor NEGATIVO (saída de dinheiro)
         )
     else:
         # Se você desmarcar o PAGO (voltar para Pendente), removemos do saldo
@@ -33,21 +39,12 @@ def atualizar_saldo_cp(sender, instance, **kwargs):
 # --- 2. AUTOMAÇÃO CONTAS A RECEBER (CR) ---
 @receiver(post_save, sender=ContasAReceber)
 def atualizar_saldo_cr(sender, instance, **kwargs):
+    aplicar_movimentos(getattr(instance, '_movimentos_anteriores', []), _movimentos('CR', instance))
     if instance.status == 'PAGO':
         BaseSaldo.objects.update_or_create(
             origem='CR',
             id_origem=instance.id,
-            defaults={
-                'nome': str(instance.cliente),
-                'empresa': str(instance.empresa_prestadora),
-                'data_emissao': instance.data_emissao,
-                'banco': str(instance.banco),
-                'vencimento': instance.vencimento,
-                'valor': instance.valor, # POSITIVO (Entrada de dinheiro)
-                'status': instance.status,
-                'data_baixa': instance.data_baixa,
-                'usuario_baixa': str(instance.usuario_baixa) if instance.usuario_baixa else 'Sistema'
-            }
+            defaults=dados_base_saldo('CR', instance),  # valor POSITIVO (entrada de dinheiro)
         )
     else:
         # Se deixou de ser PAGO, remove
@@ -57,7 +54,48 @@ def atualizar_saldo_cr(sender, instance, **kwargs):
 @receiver(post_delete, sender=ContasAPagar)
 def remove_saldo_cp(sender, instance, **kwargs):
     BaseSaldo.objects.filter(origem='CP', id_origem=instance.id).delete()
+    aplicar_movimentos(_movimentos('CP', instance), [])
 
 @receiver(post_delete, sender=ContasAReceber)
 def remove_saldo_cr(sender, instance, **kwargs):
-    BaseSaldo.objects.filter(origem='CR', id_origem=instance.id).delete()
\ No newline at end of file
+    BaseSaldo.objects.filter(origem='CR', id_origem=instance.id).delete()
+    aplicar_movimentos(_movimentos('CR', instance), [])
+
+# --- 4. TRANSFERÊNCIA DE SALDO SUPERVISOR PARA BANCO (BaseSaldo 'SSUP') ---
+@receiver(pre_save, sender=BaseSaldo)
+def guardar_movimento_anterior_ssup(sender, instance, **kwargs):
+    anterior = None
+    if instance.pk:
+        anterior = (
+            sender.objects.filter(pk=instance.pk, origem='SSUP')
+            .only('origem', 'banco', 'data_baixa', 'valor').first()
+        )
+    instance._movimentos_anteriores = movimentos_ssup(anterior) if anterior else []
+
+@receiver(post_save, sender=BaseSaldo)
+def saldo_diario_ssup(sender, instance, **kwargs):
+    # Edição (valor, data ou banco) desfaz o movimento antigo e aplica o novo
+    aplicar_movimentos(getattr(instance, '_movimentos_anteriores', []), movimentos_ssup(instance))
+
+@receiver(post_delete, sender=BaseSaldo)
+def remove_saldo_diario_ssup(sender, instance, **kwargs):
+    if instance.origem == 'SSUP':
+        aplicar_movimentos(movimentos_ssup(instance), [])
+
+# --- 5. SALDO SUPERVISOR: total de débitos desnormalizado ---
+@receiver(pre_save, sender=MovimentacaoSupervisor)
+def guardar_saldo_anterior(sender, instance, **kwargs):
+    # Se a movimentação trocar de ciclo, o ciclo antigo também precisa ser recalculado
+    instance._saldo_anterior_id = (
+        sender.objects.filter(pk=instance.pk).values_list('saldo_supervisor_id', flat=True).first()
+        if instance.pk else None
+    )
+
+@receiver(post_save, sender=MovimentacaoSupervisor)
+def atualizar_total_debitos(sender, instance, **kwargs):
+    ids = {instance.saldo_supervisor_id, getattr(instance, '_saldo_anterior_id', None)} - {None}
+    SaldoSupervisor.atualizar_total_debitos(ids)
+
+@receiver(post_delete, sender=MovimentacaoSupervisor)
+def remove_total_debitos(sender, instance, **kwargs):
+    SaldoSupervisor.atualizar_total_debitos([instance.saldo_supervisor_id])
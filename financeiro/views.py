@@ -11,13 +11,44 @@ from django.db.models import Sum, Count
 from django.utils import timezone
 
 from cadastros.models import Fornecedor, Banco, Cliente, Empresa
-from financeiro.models import ContasAPagar, ContasAReceber, Transferencia, BaseSaldo
+from financeiro.models import ContasAPagar, ContasAReceber
+from financeiro.saldos import calcular_saldos_bancos, saldos_bancos_na_data
+
+
+MESES_PT = ['Jan','Fev','Mar','Abr','Mai','Jun','Jul','Ago','Set','Out','Nov','Dez']
+LIMITE_ITENS_FLUXO = 500
+
+
+def _fluxo_querysets(ano, status_filtro, filtro_cliente, filtro_plano, filtro_filial):
+    """
+    Querysets base de entradas (CR) e despesas (CP) do fluxo de caixa, já com
+    os filtros da tela. A filial de uma despesa vem da despesa do workflow que
+    a gerou (despesa_origem).
+    """
+    cr_qs = ContasAReceber.objects.filter(vencimento__year=ano)
+    cp_qs = ContasAPagar.objects.filter(vencimento__year=ano)
+    if status_filtro != 'TODOS':
+        cr_qs = cr_qs.filter(status=status_filtro)
+        cp_qs = cp_qs.filter(status=status_filtro)
+    if filtro_cliente:
+        cr_qs = cr_qs.filter(cliente__id=filtro_cliente)
+    if filtro_plano:
+        cp_qs = cp_qs.filter(plano_de_contas__id=filtro_plano)
+    if filtro_filial:
+        cp_qs = cp_qs.filter(despesa_origem__filial_id=filtro_filial)
+    return cr_qs, cp_qs
+
+
+def _linha_pivot(por_mes):
+    """Converte {mes: total} na lista de 12 meses + total da linha."""
+    totais = [por_mes.get(m, Decimal('0')) for m in range(1, 13)]
+    return totais, sum(totais)
 
 
 @staff_member_required
 @permission_required('financeiro.view_contasareceber', raise_exception=True)
 def fluxo_de_caixa(request):
-    from collections import defaultdict
+    from django.db.models.functions import ExtractMonth
     from cadastros.models import PlanoDeContas
 
     hoje = date.today()
@@ -28,40 +59,29 @@ def fluxo_de_caixa(request):
     filtro_plano    = request.GET.get('plano', '')
     filtro_filial   = request.GET.get('filial', '')
 
-    meses = list(range(1, 13))
-    MESES_PT = ['Jan','Fev','Mar','Abr','Mai','Jun','Jul','Ago','Set','Out','Nov','Dez']
-
     def fmt(val):
         if not val:
             return ''
         return '{:,.2f}'.format(float(val)).replace(',','X').replace('.',',').replace('X','.')
 
-    # ── ENTRADAS ──────────────────────────────────────────────
-    cr_qs = ContasAReceber.objects.filter(vencimento__year=ano)
-    if status_filtro != 'TODOS':
-        cr_qs = cr_qs.filter(status=status_filtro)
-    if filtro_cliente:
-        cr_qs = cr_qs.filter(cliente__id=filtro_cliente)
+    cr_qs, cp_qs = _fluxo_querysets(ano, status_filtro, filtro_cliente, filtro_plano, filtro_filial)
 
-    # pivot: {cliente_nome: {mes: {'total': X, 'itens': [...]}}}
-    entradas_pivot = defaultdict(lambda: defaultdict(lambda: {'total': Decimal('0'), 'itens': []}))
-    for row in cr_qs.select_related('cliente'):
-        nome = row.cliente.razao_social if row.cliente else '—'
-        mes  = row.vencimento.month
-        entradas_pivot[nome][mes]['total'] += row.valor or Decimal('0')
-        entradas_pivot[nome][mes]['itens'].append({
-            'descricao':  row.observacoes or str(row.cliente),
-            'valor':      row.valor,
-            'vencimento': row.vencimento,
-            'status':     row.get_status_display(),
-        })
+    # Totais agrupados no banco: uma linha por (cliente, mês) / (plano, filial, mês).
+    # Os títulos de cada célula são carregados sob demanda em fluxo_de_caixa_itens.
+
+    # ── ENTRADAS ──────────────────────────────────────────────
+    # pivot: {(cliente_id, cliente_nome): {mes: total}}
+    entradas_pivot = {}
+    for row in (cr_qs.order_by()
+                .values('cliente_id', 'cliente__razao_social', mes=ExtractMonth('vencimento'))
+                .annotate(total=Sum('valor'))):
+        chave = (row['cliente_id'], row['cliente__razao_social'] or '—')
+        entradas_pivot.setdefault(chave, {})[row['mes']] = row['total'] or Decimal('0')
 
     entradas_rows = []
-    for nome, meses_vals in entradas_pivot.items():
-        totais    = [meses_vals[m]['total'] if m in meses_vals else Decimal('0') for m in meses]
-        itens_mes = [meses_vals[m]['itens'] if m in meses_vals else [] for m in meses]
-        total     = sum(totais)
-        entradas_rows.append({'nome': nome, 'meses': totais, 'itens_mes': itens_mes, 'total': total})
+    for (cliente_id, nome), meses_vals in entradas_pivot.items():
+        totais, total = _linha_pivot(meses_vals)
+        entradas_rows.append({'nome': nome, 'cliente_id': cliente_id or '', 'meses': totais, 'total': total})
     entradas_rows.sort(key=lambda r: r['total'], reverse=True)
 
     totais_entradas_mes = [
@@ -70,68 +90,27 @@ def fluxo_de_caixa(request):
     total_entradas = sum(totais_entradas_mes)
 
     # ── DESPESAS ──────────────────────────────────────────────
-    cp_qs = ContasAPagar.objects.filter(vencimento__year=ano)
-    if status_filtro != 'TODOS':
-        cp_qs = cp_qs.filter(status=status_filtro)
-    if filtro_plano:
-        cp_qs = cp_qs.filter(plano_de_contas__id=filtro_plano)
-    # Pré-carrega mapa nota→filial para todas as despesas WF do ano de uma vez
-    from workflow.models import Despesa as WFDespesa
-    wf_ids_no_ano = [
-        int(n.split('-')[1])
-        for n in cp_qs.filter(nota__startswith='WF-').values_list('nota', flat=True)
-        if n and n.startswith('WF-') and n.split('-')[1].isdigit()
-    ]
-    wf_filial_map = {
-        str(d.pk): d.filial.nome if d.filial else 'Sem Filial'
-        for d in WFDespesa.objects.filter(pk__in=wf_ids_no_ano).select_related('filial')
-    }
-
-    if filtro_filial:
-        from cadastros.models import Filial
-        filial_obj = Filial.objects.filter(pk=filtro_filial).first()
-        filial_nome_filtro = filial_obj.nome if filial_obj else None
-        notas_wf_da_filial = [
-            f'WF-{wf_id}' for wf_id, nome in wf_filial_map.items() if nome == filial_nome_filtro
-        ]
-        cp_qs = cp_qs.filter(nota__in=notas_wf_da_filial)
-
-    # pivot: {plano: {filial: {mes: {'total': X, 'itens': [...]}}}}
-    despesas_pivot = defaultdict(
-        lambda: defaultdict(
-            lambda: defaultdict(lambda: {'total': Decimal('0'), 'itens': []})
-        )
-    )
-    for row in cp_qs.select_related('plano_de_contas', 'fornecedor'):
-        plano = row.plano_de_contas.nome if row.plano_de_contas else 'Sem Plano de Contas'
-        mes   = row.vencimento.month
-
-        filial_nome = 'Sem Filial'
-        if row.nota and row.nota.startswith('WF-'):
-            wf_id_str = row.nota.split('-')[1]
-            filial_nome = wf_filial_map.get(wf_id_str, 'Sem Filial')
-
-        despesas_pivot[plano][filial_nome][mes]['total'] += row.valor or Decimal('0')
-        despesas_pivot[plano][filial_nome][mes]['itens'].append({
-            'nota':       row.nota,
-            'descricao':  row.observacoes or str(row.fornecedor),
-            'valor':      row.valor,
-            'vencimento': row.vencimento,
-            'status':     row.get_status_display(),
-        })
+    # pivot: {(plano_id, plano_nome): {(filial_id, filial_nome): {mes: total}}}
+    despesas_pivot = {}
+    for row in (cp_qs.order_by()
+                .values('plano_de_contas_id', 'plano_de_contas__nome',
+                        'despesa_origem__filial_id', 'despesa_origem__filial__nome',
+                        mes=ExtractMonth('vencimento'))
+                .annotate(total=Sum('valor'))):
+        plano = (row['plano_de_contas_id'], row['plano_de_contas__nome'] or 'Sem Plano de Contas')
+        filial = (row['despesa_origem__filial_id'], row['despesa_origem__filial__nome'] or 'Sem Filial')
+        despesas_pivot.setdefault(plano, {}).setdefault(filial, {})[row['mes']] = row['total'] or Decimal('0')
 
     despesas_rows = []
-    for plano, filiais_vals in despesas_pivot.items():
+    for (plano_id, plano), filiais_vals in despesas_pivot.items():
         filiais_rows = []
         plano_totais = [Decimal('0')] * 12
-        for filial_nome, meses_vals in filiais_vals.items():
-            totais_f = [meses_vals[m]['total'] if m in meses_vals else Decimal('0') for m in meses]
-            itens_mes_f = [meses_vals[m]['itens'] if m in meses_vals else [] for m in meses]
-            total_f = sum(totais_f)
+        for (filial_id, filial_nome), meses_vals in filiais_vals.items():
+            totais_f, total_f = _linha_pivot(meses_vals)
             filiais_rows.append({
                 'nome': filial_nome,
+                'filial_id': filial_id or '',
                 'meses': totais_f,
-                'itens_mes': itens_mes_f,
                 'total': total_f,
             })
             for i, v in enumerate(totais_f):
@@ -140,6 +119,7 @@ def fluxo_de_caixa(request):
         total_plano = sum(plano_totais)
         despesas_rows.append({
             'plano': plano,
+            'plano_id': plano_id or '',
             'meses': plano_totais,
             'filiais': filiais_rows,
             'total': total_plano,
@@ -185,6 +165,69 @@ def fluxo_de_caixa(request):
     return render(request, 'admin/financeiro/fluxo_de_caixa.html', context)
 
 
+@staff_member_required
+@permission_required('financeiro.view_contasareceber', raise_exception=True)
+def fluxo_de_caixa_itens(request):
+    """
+    Drill-down do fluxo de caixa: devolve em JSON os títulos de uma linha do
+    pivot (cliente, ou plano + filial), opcionalmente de um único mês.
+    Usa os mesmos filtros da tela; ids vazios significam "sem cliente/plano/filial".
+    """
+    from django.db.models.functions import ExtractMonth
+
+    tipo = request.GET.get('tipo')
+    if tipo not in ('entradas', 'despesas'):
+        return JsonResponse({'error': 'tipo inválido'}, status=400)
+    try:
+        ano = int(request.GET.get('ano', date.today().year))
+        mes = int(request.GET['mes']) if request.GET.get('mes') else None
+    except ValueError:
+        return JsonResponse({'error': 'ano/mes inválido'}, status=400)
+    # ids da linha e filtros da tela: inteiros ou vazios
+    try:
+        ids = {
+            campo: int(request.GET[campo]) if request.GET.get(campo) else ''
+            for campo in ('cliente', 'plano', 'filial', 'filtro_cliente', 'filtro_plano', 'filtro_filial')
+        }
+    except ValueError:
+        return JsonResponse({'error': 'cliente/plano/filial inválido'}, status=400)
+
+    cr_qs, cp_qs = _fluxo_querysets(
+        ano,
+        request.GET.get('status', 'TODOS'),
+        ids['filtro_cliente'],
+        ids['filtro_plano'],
+        ids['filtro_filial'],
+    )
+
+    if tipo == 'entradas':
+        cliente_id = ids['cliente']
+        qs = cr_qs.filter(cliente_id=cliente_id) if cliente_id else cr_qs.filter(cliente__isnull=True)
+        qs = qs.select_related('cliente')
+    else:
+        plano_id = ids['plano']
+        filial_id = ids['filial']
+        qs = cp_qs.filter(plano_de_contas_id=plano_id) if plano_id else cp_qs.filter(plano_de_contas__isnull=True)
+        qs = qs.filter(despesa_origem__filial_id=filial_id) if filial_id else qs.filter(despesa_origem__filial__isnull=True)
+        qs = qs.select_related('fornecedor')
+    if mes:
+        qs = qs.filter(vencimento__month=mes)
+
+    qs = qs.annotate(mes=ExtractMonth('vencimento')).order_by('vencimento', 'pk')
+    itens = []
+    for row in qs[:LIMITE_ITENS_FLUXO + 1]:
+        itens.append({
+            'nota':       row.nota,
+            'descricao':  row.observacoes or str(row.cliente if tipo == 'entradas' else row.fornecedor),
+            'valor':      str(row.valor or Decimal('0')),
+            'vencimento': row.vencimento.isoformat(),
+            'mes':        row.mes,
+            'status':     row.get_status_display(),
+        })
+    truncado = len(itens) > LIMITE_ITENS_FLUXO
+    return JsonResponse({'itens': itens[:LIMITE_ITENS_FLUXO], 'truncado': truncado})
+
+
 @staff_member_required
 def get_fornecedor_info(request):
     fornecedor_id = request.GET.get('id')
@@ -216,50 +259,9 @@ def dashboard_financeiro(request):
         data_referencia = timezone.now().date()
         modo_tempo = 'ATUAL'
 
-    bancos = Banco.objects.filter(entra_no_saldo_geral=True)
-    dados_bancos = []
-    saldo_geral = 0
-
-    for banco in bancos:
-        total_entradas = ContasAReceber.objects.filter(
-            banco=banco, status='PAGO', data_baixa__lte=data_referencia
-        ).aggregate(total=Sum('valor'))['total'] or 0
-
-        total_saidas = ContasAPagar.objects.filter(
-            banco=banco, status='PAGO', data_baixa__lte=data_referencia
-        ).aggregate(total=Sum('valor'))['total'] or 0
-
-        # Transferências devolvidas dentro do período não devem contar (efeito líquido = zero)
-        transferencias_entrada = Transferencia.objects.filter(
-            banco_destino=banco,
-            data__lte=data_referencia
-        ).exclude(status='CANCELADA').exclude(
-            status='TEMP_DEVOLVIDA', data_devolucao__lte=data_referencia
-        ).aggregate(total=Sum('valor'))['total'] or 0
-
-        transferencias_saida = Transferencia.objects.filter(
-            banco_origem=banco,
-            data__lte=data_referencia
-        ).exclude(status='CANCELADA').exclude(
-            status='TEMP_DEVOLVIDA', data_devolucao__lte=data_referencia
-        ).aggregate(total=Sum('valor'))['total'] or 0
-
-        # Transferências de Saldo Supervisor para o banco (origem exclusiva 'SSUP' —
-        # não gerada por CP/CR/Transferencia, então não há risco de contar em dobro)
-        transferencias_supervisor = BaseSaldo.objects.filter(
-            banco=banco.nome, origem='SSUP', data_baixa__lte=data_referencia
-        ).aggregate(total=Sum('valor'))['total'] or 0
-
-        saldo_inicial = getattr(banco, 'saldo_inicial', 0) or 0
-        saldo = saldo_inicial + total_entradas - total_saidas + transferencias_entrada - transferencias_saida + transferencias_supervisor
-        saldo_geral += saldo
-
-        dados_bancos.append({
-            'nome': banco.nome,
-            'entradas': total_entradas + transferencias_entrada + transferencias_supervisor,
-            'saidas': total_saidas + transferencias_saida,
-            'saldo': saldo
-        })
+    # Lido da foto diária (SaldoDiarioBanco): uma consulta, qualquer que seja a data
+    dados_bancos = saldos_bancos_na_data(data_referencia)
+    saldo_geral = sum(b['saldo'] for b in dados_bancos)
 
     def calcular_resumo(Modelo):
         qs = Modelo.objects.filter(status='PENDENTE')
@@ -365,6 +367,7 @@ def ajustar_saldos_bancos(request):
 
     if request.method == 'POST':
         try:
+            alterados = []
             for banco in bancos:
                 valor_str = request.POST.get(f'saldo_inicial_{banco.id}')
                 if valor_str is not None:
@@ -374,13 +377,18 @@ def ajustar_saldos_bancos(request):
                         banco.saldo_inicial = Decimal(valor_str or '0')
                     except InvalidOperation:
                         banco.saldo_inicial = Decimal('0')
-                    banco.save()
+                    alterados.append(banco)
+            Banco.objects.bulk_update(alterados, ['saldo_inicial'])
 
             messages.success(request, "✅ Saldos iniciais atualizados com sucesso!")
             return redirect('ajustar_saldos')
         except Exception as e:
             messages.error(request, f"Erro ao atualizar saldos: {e}")
 
+    # Saldo atual de cada conta (mesmo cálculo do Dashboard) para conferência do ajuste
+    for dados in calcular_saldos_bancos(timezone.now().date(), bancos=bancos):
+        dados['banco'].saldo_atual = dados['saldo']
+
     context = {
         'bancos': bancos,
         'site_header': 'Malupe Admin',
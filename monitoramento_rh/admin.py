@@ -6,13 +6,14 @@ from django.utils import timezone
 from django.utils.html import format_html
 from django.db import models
 from django.db.models import Sum
-from .models import CoberturasRH, Folha, ColaboradorInformal, PagamentoFolha, ItemPagamento
+from core.grupos import grupos_do_usuario
+from .models import CoberturasRH, Folha, ColaboradorInformal, PagamentoFolha, ItemPagamento, ultimo_valor_pago
 
 
 def _in_group(user, *names):
     if user.is_superuser:
         return True
-    return user.groups.filter(name__in=names).exists()
+    return not grupos_do_usuario(user).isdisjoint(names)
 
 
 @admin.register(CoberturasRH)
@@ -408,19 +409,21 @@ class PagamentoFolhaAdmin(admin.ModelAdmin):
         PagamentoFolha.objects.filter(pk=pagamento.pk).update(status=status_novo)
 
     def _gerar_ou_atualizar_itens(self, pagamento):
-        for colab in pagamento.folha.colaboradores.filter(ativo=True):
-            if not ItemPagamento.objects.filter(pagamento=pagamento, colaborador=colab).exists():
-                ultimo = (ItemPagamento.objects
-                          .filter(colaborador=colab, pagamento__status='PAGA')
-                          .order_by('-pagamento__data_fim')
-                          .values_list('valor_atual', flat=True)
-                          .first())
-                ItemPagamento.objects.create(
-                    pagamento=pagamento,
-                    colaborador=colab,
-                    valor_anterior=ultimo,
-                    valor_atual=colab.valor_padrao,
-                )
+        # Colaboradores ativos ainda sem item neste pagamento, já com o último valor pago
+        faltantes = (
+            pagamento.folha.colaboradores.filter(ativo=True)
+            .exclude(pk__in=ItemPagamento.objects.filter(pagamento=pagamento).values('colaborador_id'))
+            .annotate(ultimo=ultimo_valor_pago())
+        )
+        ItemPagamento.objects.bulk_create([
+            ItemPagamento(
+                pagamento=pagamento,
+                colaborador=colab,
+                valor_anterior=colab.ultimo,
+                valor_atual=colab.valor_padrao,
+            )
+            for colab in faltantes
+        ])
         self._recalcular_total(pagamento)
 
     def _recalcular_total(self, pagamento):
@@ -439,10 +442,13 @@ class PagamentoFolhaAdmin(admin.ModelAdmin):
         # já em AGUARDANDO_FIN — o campo valor_atual permanece editável nesse
         # status). Sem isso, o WF fica com o valor antigo, dessincronizado.
         from workflow.models import Despesa
+        from workflow.resumo import invalidar_resumos
         try:
             despesa = pagamento.despesa_wf
         except ObjectDoesNotExist:
             despesa = None
         if despesa is not None and despesa.valor != total:
             Despesa.objects.filter(pk=despesa.pk).update(valor=total)
+            # .update() não dispara o post_save que invalida o resumo da lista
+            invalidar_resumos()
 
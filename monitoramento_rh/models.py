@@ -107,3 +107,17 @@ class ItemPagamento(models.Model):
         verbose_name = 'Item de Pagamento'
         verbose_name_plural = 'Itens de Pagamento'
         ordering = ['colaborador__banco', 'colaborador__nome']
+
+
+def ultimo_valor_pago(colaborador='pk'):
+    """
+    Subquery com o valor_atual do item do último pagamento PAGA de cada
+    colaborador — para anotar um queryset inteiro em uma única consulta.
+    `colaborador` é o caminho, na consulta externa, até o id do colaborador.
+    """
+    return models.Subquery(
+        ItemPagamento.objects
+        .filter(colaborador=models.OuterRef(colaborador), pagamento__status='PAGA')
+        .order_by('-pagamento__data_fim')
+        .values('valor_atual')[:1]
+    )
@@ -1,6 +1,7 @@
+from decimal import Decimal
 from django.http import JsonResponse
 from django.contrib.admin.views.decorators import staff_member_required
-from .models import ColaboradorInformal, ItemPagamento
+from .models import ColaboradorInformal, ultimo_valor_pago
 
 
 @staff_member_required
@@ -11,17 +12,14 @@ def api_colaboradores_folha(request):
 
     colaboradores = ColaboradorInformal.objects.filter(
         folha_id=folha_id, ativo=True
-    ).select_related('filial').order_by('banco', 'nome')
+    ).select_related('filial').annotate(
+        ultimo_valor=ultimo_valor_pago()
+    ).order_by('banco', 'nome')
 
     result = []
     for c in colaboradores:
-        ultimo_valor = (
-            ItemPagamento.objects
-            .filter(colaborador=c, pagamento__status='PAGA')
-            .order_by('-pagamento__data_fim')
-            .values_list('valor_atual', flat=True)
-            .first()
-        )
+        # Valor vindo de subquery: no SQLite não volta com as 2 casas do campo
+        ultimo_valor = c.ultimo_valor.quantize(Decimal('0.01')) if c.ultimo_valor is not None else None
         result.append({
             'nome':          c.nome,
             'cpf':           c.cpf,
@@ -50,11 +50,13 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'core.middleware.MetricasMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.middleware.PerfilMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'core.middleware.TrocaSenhaObrigatoriaMiddleware',
@@ -80,16 +82,90 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'teste_django.wsgi.application'
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
-        'OPTIONS': {
-            'timeout': 30,
-        },
+# Banco: PostgreSQL quando DB_HOST está definido (docker-compose), senão o SQLite
+# local. No Postgres a conexão fica aberta entre requisições por DB_CONN_MAX_AGE
+# segundos e é testada antes de ser reaproveitada (CONN_HEALTH_CHECKS). Com
+# DB_POOL=True cada worker usa o pool do psycopg 3 no lugar da conexão
+# persistente (o Django não aceita os dois juntos). Para levar os dados do SQLite:
+# manage.py migrar_sqlite_postgres
+if os.environ.get('DB_HOST'):
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get('DB_NAME', 'malupe_db'),
+            'USER': os.environ.get('DB_USER', 'postgres'),
+            'PASSWORD': os.environ.get('DB_PASSWORD', ''),
+            'HOST': os.environ['DB_HOST'],
+            'PORT': os.environ.get('DB_PORT', '5432'),
+            'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', 60)),
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {
+                'connect_timeout': int(os.environ.get('DB_CONNECT_TIMEOUT', 10)),
+            },
+        }
+    }
+    if os.environ.get('DB_POOL', 'False') == 'True':
+        DATABASES['default']['CONN_MAX_AGE'] = 0
+        DATABASES['default']['OPTIONS']['pool'] = {
+            'min_size': int(os.environ.get('DB_POOL_MIN', 2)),
+            'max_size': int(os.environ.get('DB_POOL_MAX', 10)),
+            'timeout': int(os.environ.get('DB_POOL_TIMEOUT', 30)),
+        }
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': BASE_DIR / 'db.sqlite3',
+            'OPTIONS': {
+                'timeout': 30,
+            },
+        }
     }
+
+# Numeração das notas (financeiro/sequencias.py): 'tabela' (sem buracos) ou
+# 'postgres' (sequências nativas, só vale com banco PostgreSQL). Para voltar de
+# 'postgres' para 'tabela', rode antes manage.py sincronizar_sequencias
+SEQUENCIAL_BACKEND = os.environ.get('SEQUENCIAL_BACKEND', 'tabela')
+
+# Arquivamento de comprovantes (workflow/arquivamento.py): origem dos arquivos
+# ('cloudinary' ou 'local' = default_storage), pasta dos ZIPs, downloads simultâneos
+# e segundos sem sinal de vida até um job ser dado como interrompido
+COMPROVANTES_BACKEND = os.environ.get('COMPROVANTES_BACKEND', 'cloudinary')
+ARQUIVAMENTO_DIR = os.environ.get('ARQUIVAMENTO_DIR', BASE_DIR / 'arquivamentos')
+ARQUIVAMENTO_THREADS = int(os.environ.get('ARQUIVAMENTO_THREADS', 8))
+ARQUIVAMENTO_SEM_SINAL = int(os.environ.get('ARQUIVAMENTO_SEM_SINAL', 600))
+
+# Cache compartilhado entre os workers do gunicorn e os comandos agendados (grupos
+# do usuário, resumo da lista de despesas, diálogo do workflow, uso da nuvem)
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ.get('CACHE_DIR', BASE_DIR / 'cache_django'),
+        'OPTIONS': {'MAX_ENTRIES': 20000},
+    },
 }
 
+# Uso da nuvem (extras/uso_nuvem.py): cliente ('cloudinary' ou 'falso'), segundos
+# em que o número é considerado atual e até quando um número vencido ainda é exibido
+USO_NUVEM_CLIENTE = os.environ.get('USO_NUVEM_CLIENTE', 'cloudinary')
+USO_NUVEM_TTL = int(os.environ.get('USO_NUVEM_TTL', 300))
+USO_NUVEM_MAX_STALE = int(os.environ.get('USO_NUVEM_MAX_STALE', 24 * 60 * 60))
+
+# Métricas por view (core/metricas.py): liga/desliga a medição, requisições acima
+# de METRICAS_LENTO_MS vão para o log com os SQL repetidos, amostras guardadas por
+# view em cada worker, segundos entre publicações no cache e token (Bearer) do
+# endpoint texto para o coletor do Prometheus (vazio = só staff logado)
+METRICAS_ATIVAS = os.environ.get('METRICAS_ATIVAS', 'True') == 'True'
+METRICAS_LENTO_MS = int(os.environ.get('METRICAS_LENTO_MS', 1000))
+METRICAS_JANELA = int(os.environ.get('METRICAS_JANELA', 500))
+METRICAS_PUBLICAR = int(os.environ.get('METRICAS_PUBLICAR', 10))
+METRICAS_TOKEN = os.environ.get('METRICAS_TOKEN', '')
+
+# Perfil sob demanda (core/perfis.py, ?perfil=1 com a permissão
+# core.perfilar_requisicoes): pasta dos .prof/.json e quantos perfis manter
+PERFIS_DIR = os.environ.get('PERFIS_DIR', BASE_DIR / 'perfis')
+PERFIS_MAX = int(os.environ.get('PERFIS_MAX', 50))
+
 AUTH_PASSWORD_VALIDATORS = [
     { 'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator', },
     { 'NAME': 'django.contrib.auth.password_validation.MinimumLengthValidator', },
@@ -200,6 +276,22 @@ JAZZMIN_SETTINGS = {
                 "new_window": False,
                 "permissions": ["auth.add_user"]
             }
+        ],
+        "core": [
+            {
+                "name": "Métricas de Requisições",
+                "url": "/admin/metricas/",
+                "icon": "fas fa-stopwatch",
+                "new_window": False,
+                "permissions": ["auth.add_user"]
+            },
+            {
+                "name": "Perfis de Requisições",
+                "url": "/admin/perfis/",
+                "icon": "fas fa-microscope",
+                "new_window": False,
+                "permissions": ["core.perfilar_requisicoes"]
+            }
         ]
     },
 
@@ -245,6 +337,15 @@ STORAGES = {
     "staticfiles": {
         "BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage",
     },
+    # Comprovantes: endereçados por SHA-256 no storage "default", com cache
+    # local em disco e miniaturas (workflow/armazenamento.py)
+    "comprovantes": {
+        "BACKEND": "workflow.armazenamento.ComprovanteStorage",
+        "OPTIONS": {
+            "cache_dir": os.environ.get('COMPROVANTES_CACHE_DIR', BASE_DIR / 'cache_comprovantes'),
+            "cache_max_bytes": int(os.environ.get('COMPROVANTES_CACHE_MB', 512)) * 1024 * 1024,
+        },
+    },
 }
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
@@ -3,10 +3,10 @@ URL configuration for teste_django project.
 """
 from django.contrib import admin
 from django.urls import path
-from financeiro.views import get_fornecedor_info, dashboard_financeiro, gerar_fixos_mensais, ajustar_saldos_bancos, fluxo_de_caixa
-from extras.views import cloudinary_usage_api, cloudinary_storage_page
-from core.views import trocar_senha_obrigatoria
-from workflow.views import relatorio_coberturas, exportar_coberturas_detalhado, painel_sla, painel_sla_tabela, api_colaborador_info
+from financeiro.views import get_fornecedor_info, dashboard_financeiro, gerar_fixos_mensais, ajustar_saldos_bancos, fluxo_de_caixa, fluxo_de_caixa_itens
+from extras.views import cloudinary_usage_api, cloudinary_storage_page, arquivamento_status, arquivamento_download
+from core.views import trocar_senha_obrigatoria, painel_metricas, metricas_texto, lista_perfis, detalhe_perfil, download_perfil
+from workflow.views import relatorio_coberturas, exportar_coberturas_detalhado, painel_sla, painel_sla_tabela, exportar_painel_sla_tabela, api_colaborador_info, miniatura_comprovante
 from monitoramento_rh.views import api_colaboradores_folha
 
 # --- PERSONALIZAÇÃO DO SISTEMA MALUPE ---
@@ -21,12 +21,22 @@ urlpatterns = [
     path('admin/financeiro/gerar-fixos/', gerar_fixos_mensais, name='gerar_fixos_mensais'),
     path('admin/financeiro/ajustar-saldos/', ajustar_saldos_bancos, name='ajustar_saldos'),
     path('admin/financeiro/fluxo-de-caixa/', fluxo_de_caixa, name='fluxo_de_caixa'),
+    path('admin/financeiro/fluxo-de-caixa/itens/', fluxo_de_caixa_itens, name='fluxo_de_caixa_itens'),
     path('admin/api/cloudinary-usage/', cloudinary_usage_api, name='api_cloudinary_usage'),
     path('admin/workflow/cloudinary-storage/', cloudinary_storage_page, name='cloudinary_storage_page'),
+    path('admin/workflow/cloudinary-storage/arquivamento/<int:pk>/', arquivamento_status, name='arquivamento_status'),
+    path('admin/workflow/cloudinary-storage/arquivamento/<int:pk>/download/', arquivamento_download, name='arquivamento_download'),
     path('admin/monitoramento-rh/coberturas/', relatorio_coberturas, name='relatorio_coberturas'),
     path('admin/monitoramento-rh/coberturas/exportar/', exportar_coberturas_detalhado, name='exportar_coberturas_detalhado'),
     path('admin/workflow/painel-sla/', painel_sla, name='painel_sla'),
     path('admin/workflow/painel-sla/tabela/', painel_sla_tabela, name='painel_sla_tabela'),
+    path('admin/workflow/painel-sla/tabela/exportar/', exportar_painel_sla_tabela, name='painel_sla_tabela_exportar'),
+    path('admin/workflow/despesa/<int:pk>/comprovante/miniatura/', miniatura_comprovante, name='miniatura_comprovante'),
+    path('admin/metricas/', painel_metricas, name='metricas'),
+    path('admin/metricas/texto/', metricas_texto, name='metricas_texto'),
+    path('admin/perfis/', lista_perfis, name='perfis'),
+    path('admin/perfis/<str:nome>/', detalhe_perfil, name='perfil_detalhe'),
+    path('admin/perfis/<str:nome>/download/', download_perfil, name='perfil_download'),
 
     # 2. API
     path('api/fornecedor-info/', get_fornecedor_info, name='api_fornecedor_info'),
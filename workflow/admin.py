@@ -1,24 +1,26 @@
 # workflow/admin.py
 
 from django.contrib import admin
-from django.db.models import Sum, Count, Q
+from django.db.models import Count, Q, Max
+from django.core.cache import cache
+from django.template.loader import render_to_string
 from django.utils.safestring import mark_safe
-from django.utils.html import escape
+from django.utils.html import escape, format_html
+from django.urls import reverse
 from django import forms
 from django.utils import timezone
 from django.contrib.auth.models import Group
-import io, zipfile, os, mimetypes
-from django.http import HttpResponse
-from django.conf import settings
-import cloudinary
-import cloudinary.uploader
-import urllib.request
+from django.shortcuts import redirect
 
 from rangefilter.filters import DateRangeFilterBuilder
 
-from .models import Despesa, LogWorkflow, STATUS_WORKFLOW, ConfiguracaoSLA
+from .arquivamento import iniciar_arquivamento
+from .armazenamento import eh_imagem
+from .resumo import resumo_por_status
+from .models import Despesa, LogWorkflow, DespesaParticipante, STATUS_WORKFLOW, ConfiguracaoSLA
 from financeiro.models import ContasAPagar
 from core.models import UsuarioCustomizado
+from core.grupos import grupos_do_usuario
 
 
 # Filtros de texto ocultos para a barra de pesquisa customizada
@@ -227,7 +229,7 @@ class DespesaForm(forms.ModelForm):
         if self.request and 'status' in self.fields:
             user = self.request.user
             if not user.is_superuser:
-                grupos_usuario = list(user.groups.values_list('name', flat=True))
+                grupos_usuario = grupos_do_usuario(user)
 
                 if self.instance.pk:
                     status_atual = self.instance.status
@@ -340,8 +342,8 @@ class DespesaForm(forms.ModelForm):
             ]
 
             user = self.request.user if hasattr(self, 'request') else None
-            is_admin_group = user and user.groups.filter(name='Administrativo').exists()
-            is_rh_group = user and user.groups.filter(name='Aprovador RH').exists()
+            is_admin_group = user and 'Administrativo' in grupos_do_usuario(user)
+            is_rh_group = user and 'Aprovador RH' in grupos_do_usuario(user)
             is_extra = self.instance.tipo_lancamento == 'EXTRA'
 
             if is_extra and is_admin_group and self.instance.status == 'AGUARDANDO_ADM':
@@ -419,6 +421,18 @@ class LogInline(admin.TabularInline):
     classes = ['collapse']
 
 
+# Cor do selo de perfil no histórico de diálogo
+CORES_PERFIL_DIALOGO = {
+    'Administrativo': '#e67e22',
+    'RH':             '#f39c12',
+    'Financeiro':     '#3498db',
+    'Operador':       '#9b59b6',
+    'Comercial':      '#1abc9c',
+    'Admin':          '#2c3e50',
+    'Solicitante':    '#7f8c8d',
+}
+
+
 @admin.register(Despesa)
 class DespesaAdmin(admin.ModelAdmin):
     form = DespesaForm
@@ -441,61 +455,21 @@ class DespesaAdmin(admin.ModelAdmin):
             self.message_user(request, "Acesso negado: apenas superusuários podem executar esta ação.", level='error')
             return
 
-        cfg = settings.CLOUDINARY_STORAGE
-        cloudinary.config(
-            cloud_name=cfg['CLOUD_NAME'],
-            api_key=cfg['API_KEY'],
-            api_secret=cfg['API_SECRET'],
-        )
-
         com_comprovante = queryset.exclude(comprovante='').exclude(comprovante__isnull=True)
         if not com_comprovante.exists():
             self.message_user(request, "Nenhuma das ocorrências selecionadas possui comprovante.", level='warning')
             return
 
-        buffer = io.BytesIO()
-        total, erros = 0, 0
-
-        with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as zf:
-            for despesa in com_comprovante:
-                try:
-                    url = despesa.comprovante.url
-                    with urllib.request.urlopen(url) as resp:
-                        data = resp.read()
-                        content_type = resp.headers.get('Content-Type', '').split(';')[0].strip()
-                        ext = mimetypes.guess_extension(content_type) or ''
-                        ext = {'.jpe': '.jpg', '.jpeg': '.jpg'}.get(ext, ext)
-                    if not ext:
-                        _, ext = os.path.splitext(despesa.comprovante.name)
-                    ext = ext.lstrip('.').lower() or 'bin'
-                    nome_arquivo = f"ocorrencia_{despesa.id}_comprovante.{ext}"
-                    zf.writestr(nome_arquivo, data)
-
-                    # Remove do Cloudinary usando o public_id
-                    public_id = despesa.comprovante.name.rsplit('.', 1)[0]
-                    cloudinary.uploader.destroy(public_id, resource_type='raw', invalidate=True)
-                    cloudinary.uploader.destroy(public_id, resource_type='image', invalidate=True)
-
-                    despesa.comprovante = None
-                    despesa.save(update_fields=['comprovante'])
-                    total += 1
-                except Exception:
-                    erros += 1
-
-        buffer.seek(0)
-        response = HttpResponse(buffer, content_type='application/zip')
-        response['Content-Disposition'] = 'attachment; filename="comprovantes_malupe.zip"'
-
-        msg = f"{total} comprovante(s) baixado(s) e removido(s) da nuvem."
-        if erros:
-            msg += f" {erros} arquivo(s) com erro (mantidos na nuvem)."
-        self.message_user(request, msg)
-        return response
+        # Download, ZIP e remoção da nuvem rodam em segundo plano (workflow/arquivamento.py)
+        job = iniciar_arquivamento(request.user, com_comprovante.values_list('pk', flat=True))
+        self.message_user(request, f"Arquivamento de {job.total} comprovante(s) iniciado. O ZIP fica disponível ao concluir.")
+        return redirect('arquivamento_status', pk=job.pk)
 
     baixar_e_limpar_comprovantes.short_description = "⬇ Baixar comprovantes e liberar espaço na nuvem"
 
     list_display = ('id', 'data_criacao_display', 'tipo_badge', 'solicitante', 'despesa_display',
-                    'valor_formatado', 'data_ultimo_status', 'hora_ultimo_status', 'status_badge', 'botao_detalhes')
+                    'valor_formatado', 'comprovante_lista_display', 'data_ultimo_status', 'hora_ultimo_status',
+                    'status_badge', 'botao_detalhes')
     list_filter = (
         'tipo_lancamento',
         'status',
@@ -522,7 +496,8 @@ class DespesaAdmin(admin.ModelAdmin):
         'CANCELADO': '#c0392b'
     }
 
-    _DISPLAY_ONLY_FIELDS = {'dialogo_display', 'folha_resumo_display', 'itens_folha_display'}
+    _DISPLAY_ONLY_FIELDS = {'dialogo_display', 'folha_resumo_display', 'itens_folha_display',
+                            'comprovante_miniatura_display'}
 
     def get_form(self, request, obj=None, **kwargs):
         if 'fields' in kwargs:
@@ -544,15 +519,16 @@ class DespesaAdmin(admin.ModelAdmin):
 
     # --- VISIBILIDADE ---
     def get_queryset(self, request):
+        # pagamento_folha__folha__tomador: despesa_display mostra a folha nas despesas FOLHA
         qs = super().get_queryset(request).select_related(
-            'fornecedor', 'solicitante', 'operador', 'tomador', 'filial'
+            'fornecedor', 'solicitante', 'operador', 'tomador', 'filial', 'pagamento_folha__folha__tomador'
         )
         user = request.user
 
         if user.is_superuser:
             return qs
 
-        grupos = list(user.groups.values_list('name', flat=True))
+        grupos = grupos_do_usuario(user)
 
         # Financeiro e Operador enxergam tudo
         if 'Aprovador Financeiro' in grupos or 'Operador' in grupos:
@@ -560,12 +536,13 @@ class DespesaAdmin(admin.ModelAdmin):
 
         # RH: seus próprios + solicitações/extras/folhas em AGUARDANDO_RH + já atuou
         # Caixinhas de outros perfis nunca passam pelo RH
+        # "Já atuou"/"extras dele" vêm do índice DespesaParticipante (subconsulta, sem DISTINCT)
         if 'Aprovador RH' in grupos:
             return qs.filter(
                 Q(solicitante=user) |
                 Q(status='AGUARDANDO_RH', tipo_lancamento__in=['SOLICITACAO', 'EXTRA', 'FOLHA']) |
-                Q(logs__usuario=user)
-            ).distinct()
+                Q(pk__in=DespesaParticipante.visiveis(user, 'LOG'))
+            )
 
         # Comercial: somente caixinhas feitas por ele
         if 'Comercial' in grupos:
@@ -574,14 +551,14 @@ class DespesaAdmin(admin.ModelAdmin):
         # Administrativo: seus próprios registros + extras direcionados a ele
         filtro_base = Q(solicitante=user)
         if 'Administrativo' in grupos:
-            filtro_base |= Q(lancamentoextra__administrativo=user)
+            filtro_base |= Q(pk__in=DespesaParticipante.visiveis(user, 'EXTRA'))
 
-        return qs.filter(filtro_base).distinct()
+        return qs.filter(filtro_base)
 
     # --- CAMPOS TRAVADOS (READONLY) ---
     def get_readonly_fields(self, request, obj=None):
         ro_fields = ['tipo_lancamento', 'data_ultima_alteracao', 'dialogo_display',
-                     'folha_resumo_display', 'itens_folha_display']
+                     'folha_resumo_display', 'itens_folha_display', 'comprovante_miniatura_display']
 
         # Novo registro para usuário comum: status é auto-definido, exibe só-leitura
         if not obj and not request.user.is_superuser:
@@ -594,10 +571,10 @@ class DespesaAdmin(admin.ModelAdmin):
 
         if obj:
             user = request.user
-            grupos = list(user.groups.values_list('name', flat=True))
+            grupos = grupos_do_usuario(user)
 
             if user.is_superuser:
-                base = ['dialogo_display']
+                base = ['dialogo_display', 'comprovante_miniatura_display']
                 if obj and obj.tipo_lancamento == 'FOLHA':
                     base += ['folha_resumo_display', 'itens_folha_display', 'valor']
                 return base
@@ -629,7 +606,7 @@ class DespesaAdmin(admin.ModelAdmin):
     # --- FIELDSETS ---
     def get_fieldsets(self, request, obj=None):
         user = request.user
-        grupos = list(user.groups.values_list('name', flat=True))
+        grupos = grupos_do_usuario(user)
 
         tipo = obj.tipo_lancamento if obj else request.GET.get('tipo', 'CAIXINHA')
 
@@ -675,6 +652,8 @@ class DespesaAdmin(admin.ModelAdmin):
                 'observacoes'
             )
 
+        if tipo == 'CAIXINHA' and obj and obj.comprovante:
+            campos_lancamento = list(campos_lancamento) + ['comprovante_miniatura_display']
         if not obj:
             campos_lancamento = list(campos_lancamento) + ['confirmar_duplicidade']
         fieldsets = [
@@ -763,7 +742,7 @@ class DespesaAdmin(admin.ModelAdmin):
         if user.is_superuser:
             return True
 
-        grupos = list(user.groups.values_list('name', flat=True))
+        grupos = grupos_do_usuario(user)
 
         # Usa sempre o status e tipo gravados no banco, não o valor em memória
         # (que pode ter sido modificado pelo POST antes da validação falhar)
@@ -863,7 +842,7 @@ class DespesaAdmin(admin.ModelAdmin):
             if form.cleaned_data.get('tipo_lancamento'):
                 obj.tipo_lancamento = form.cleaned_data['tipo_lancamento']
 
-            grupos_user = list(request.user.groups.values_list('name', flat=True))
+            grupos_user = grupos_do_usuario(request.user)
 
             if obj.tipo_lancamento == 'EXTRA':
                 # EXTRA sempre começa no Administrativo (criado por outro perfil)
@@ -896,7 +875,7 @@ class DespesaAdmin(admin.ModelAdmin):
             if status_novo == 'AGUARDANDO_RH' and 'status' in form.changed_data:
                 acao_log = "Aprovou → RH"
             elif status_novo == 'AGUARDANDO_FIN' and 'status' in form.changed_data:
-                grupos_user = list(request.user.groups.values_list('name', flat=True))
+                grupos_user = grupos_do_usuario(request.user)
                 if 'Operador' in grupos_user:
                     acao_log = "Devolveu ao Financeiro"
                 else:
@@ -915,7 +894,7 @@ class DespesaAdmin(admin.ModelAdmin):
                 acao_log = "Editou"
 
             if obj.tipo_lancamento == 'EXTRA' and obj.status == 'CANCELADO':
-                if request.user.groups.filter(name='Aprovador Financeiro').exists():
+                if 'Aprovador Financeiro' in grupos_do_usuario(request.user):
                     try:
                         if hasattr(obj, 'lancamentoextra'):
                             extra_origem = obj.lancamentoextra
@@ -972,7 +951,7 @@ class DespesaAdmin(admin.ModelAdmin):
                 from monitoramento_rh.models import PagamentoFolha as _PF
                 _PF.objects.filter(pk=obj.pagamento_folha_id).update(status=novo_status_pf)
 
-        grupos = list(request.user.groups.values_list('name', flat=True))
+        grupos = grupos_do_usuario(request.user)
         perfil = "Solicitante"
         if request.user.is_superuser:
             perfil = "Admin"
@@ -1018,7 +997,7 @@ class DespesaAdmin(admin.ModelAdmin):
             )
             return
 
-        if not ContasAPagar.objects.filter(nota=f"WF-{despesa.id}").exists():
+        if not ContasAPagar.objects.filter(despesa_origem=despesa).exists():
             partes_obs = [f"Ref. Workflow #{despesa.id} — {despesa.get_tipo_lancamento_display()}"]
             if despesa.filial:
                 partes_obs.append(f"Filial: {despesa.filial}")
@@ -1039,6 +1018,7 @@ class DespesaAdmin(admin.ModelAdmin):
                 vencimento=timezone.now().date(),
                 valor=despesa.valor,
                 nota=f"WF-{despesa.id}",
+                despesa_origem=despesa,
                 status='PAGO',
                 data_baixa=timezone.now().date(),
                 usuario_baixa=request.user,
@@ -1086,10 +1066,9 @@ class DespesaAdmin(admin.ModelAdmin):
             qs = response.context_data['cl'].queryset
         except (AttributeError, KeyError):
             qs = Despesa.objects.none()
-        ids_distintos = qs.order_by().values_list('id', flat=True).distinct()
-        metrics = Despesa.objects.filter(id__in=ids_distintos).values('status').annotate(total_valor=Sum('valor'), total_qtd=Count('id'))
+        # Um GROUP BY sobre o próprio queryset filtrado (já sem duplicatas), em cache curto
         summary = []
-        for item in metrics:
+        for item in resumo_por_status(qs, request):
             st = item['status']
             cor = self.CORES_SISTEMA.get(st, '#95a5a6')
             if 'CANCELADO' in st:
@@ -1303,6 +1282,26 @@ class DespesaAdmin(admin.ModelAdmin):
 
     botao_detalhes.short_description = "Ação"
 
+    def _miniatura_html(self, obj, tamanho, altura):
+        # A miniatura vem do cache local (workflow/armazenamento.py); o original só ao clicar
+        if not eh_imagem(obj.comprovante.name):
+            return format_html('<a href="{}" target="_blank" title="Abrir comprovante">📄</a>', obj.comprovante.url)
+        return format_html(
+            '<a href="{}" target="_blank"><img src="{}?tamanho={}" loading="lazy" alt="Comprovante" '
+            'style="max-height:{}px; border-radius:4px; border:1px solid #ddd;"></a>',
+            obj.comprovante.url, reverse('miniatura_comprovante', args=[obj.pk]), tamanho, altura,
+        )
+
+    def comprovante_lista_display(self, obj):
+        return self._miniatura_html(obj, 'lista', 48) if obj.comprovante else '—'
+
+    comprovante_lista_display.short_description = "Comprovante"
+
+    def comprovante_miniatura_display(self, obj):
+        return self._miniatura_html(obj, 'detalhe', 360) if obj and obj.comprovante else '—'
+
+    comprovante_miniatura_display.short_description = "Pré-visualização"
+
     def data_criacao_display(self, obj):
         if obj.data_criacao:
             from django.utils import timezone as tz
@@ -1334,54 +1333,32 @@ class DespesaAdmin(admin.ModelAdmin):
         """Exibe o histórico de ações como um diálogo cronológico."""
         if not obj or not obj.pk:
             return '—'
-        logs = obj.logs.order_by('data_hora')
-        if not logs.exists():
+        ultimo_log = obj.logs.aggregate(ultimo=Max('id'), qtd=Count('id'))
+        if not ultimo_log['ultimo']:
             return '—'
 
-        CORES_PERFIL = {
-            'Administrativo': '#e67e22',
-            'RH':             '#f39c12',
-            'Financeiro':     '#3498db',
-            'Operador':       '#9b59b6',
-            'Comercial':      '#1abc9c',
-            'Admin':          '#2c3e50',
-            'Solicitante':    '#7f8c8d',
-        }
-
-        html = '<div style="display:flex;flex-direction:column;gap:12px;padding:8px 0;">'
-        for log in logs:
-            from django.utils import timezone as tz
-            dt = tz.localtime(log.data_hora).strftime('%d/%m/%Y %H:%M')
-            cor = CORES_PERFIL.get(log.perfil_usuario, '#95a5a6')
-            nome = log.usuario.get_full_name() or log.usuario.username
-
-            # Separa linhas de observação
-            obs_raw = log.observacao or ''
-            linhas = obs_raw.split('\n')
-            status_line = linhas[0] if linhas else ''
-            extras = [l for l in linhas[1:] if l.strip()]
-
-            corpo = f'<span style="font-size:12px;color:#555;">{status_line}</span>'
-            for extra in extras:
-                if extra.startswith('[QUESTIONAMENTO]'):
-                    texto = extra.replace('[QUESTIONAMENTO]', '').strip()
-                    corpo += f'<div style="margin-top:6px;background:#fff3cd;border-left:3px solid #f39c12;padding:6px 10px;border-radius:4px;"><strong>❓ Questionamento:</strong> {texto}</div>'
-                elif extra.startswith('[MENSAGEM]'):
-                    texto = extra.replace('[MENSAGEM]', '').strip()
-                    corpo += f'<div style="margin-top:6px;background:#d4edda;border-left:3px solid #28a745;padding:6px 10px;border-radius:4px;"><strong>💬 Mensagem:</strong> {texto}</div>'
-
-            html += f'''
-            <div style="border-left:4px solid {cor};padding:8px 12px;background:#fafafa;border-radius:0 6px 6px 0;">
-                <div style="display:flex;align-items:center;gap:8px;margin-bottom:4px;">
-                    <span style="background:{cor};color:white;padding:2px 8px;border-radius:10px;font-size:11px;font-weight:bold;">{log.perfil_usuario}</span>
-                    <strong style="font-size:13px;">{nome}</strong>
-                    <span style="font-size:11px;color:#888;">{dt}</span>
-                    <span style="margin-left:auto;font-size:11px;font-style:italic;color:#666;">{log.acao}</span>
-                </div>
-                {corpo}
-            </div>'''
-
-        html += '</div>'
+        # Logs só são acrescentados: o último id (e a quantidade) identifica o fragmento
+        chave = f"wf_dialogo:{obj.pk}:{ultimo_log['ultimo']}:{ultimo_log['qtd']}"
+        html = cache.get(chave)
+        if html is None:
+            itens = []
+            for log in obj.logs.select_related('usuario').order_by('data_hora'):
+                # Separa linhas de observação
+                linhas = (log.observacao or '').split('\n')
+                extras = []
+                for extra in linhas[1:]:
+                    for tipo in ('QUESTIONAMENTO', 'MENSAGEM'):
+                        if extra.startswith(f'[{tipo}]'):
+                            extras.append((tipo, extra.replace(f'[{tipo}]', '').strip()))
+                itens.append({
+                    'log': log,
+                    'cor': CORES_PERFIL_DIALOGO.get(log.perfil_usuario, '#95a5a6'),
+                    'nome': log.usuario.get_full_name() or log.usuario.username,
+                    'status_line': linhas[0],
+                    'extras': extras,
+                })
+            html = render_to_string('admin/workflow/despesa/dialogo.html', {'itens': itens})
+            cache.set(chave, html, 60 * 60 * 24)
         return mark_safe(html)
 
     dialogo_display.short_description = "Histórico de Diálogo"
@@ -3,3 +3,6 @@ from django.apps import AppConfig
 
 class WorkflowConfig(AppConfig):
     name = 'workflow'
+
+    def ready(self):
+        import workflow.signals
@@ -0,0 +1,252 @@
+# workflow/armazenamento.py
+#
+# Storage dos comprovantes (STORAGES['comprovantes']). Envolve o storage remoto
+# (Cloudinary em produção) com:
+#
+# - endereçamento por conteúdo: o arquivo é gravado como
+#   comprovantes/sha256/<2 primeiros>/<sha256>.<ext>, então o mesmo print enviado
+#   várias vezes ocupa um único arquivo na nuvem;
+# - cache local em disco (LRU por data de acesso, limitado a cache_max_bytes):
+#   abrir um comprovante já visto não vai à nuvem;
+# - miniaturas geradas com Pillow a partir do cache, para a lista e o detalhe
+#   do DespesaAdmin não carregarem o original.
+#
+# Nomes antigos (comprovantes/AAAA/MM/...) continuam funcionando: só os novos
+# uploads passam a ser endereçados por conteúdo.
+#
+# No Cloudinary o upload vai com public_id fixo (o hash), sem o sufixo aleatório
+# que o RawMediaCloudinaryStorage acrescenta; o nome gravado é o public_id
+# devolvido, já com o prefixo 'media/'.
+
+import hashlib
+import os
+import re
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import Storage, storages
+from django.utils.functional import cached_property
+from django.utils.module_loading import import_string
+
+EXTENSOES_IMAGEM = {'.png', '.jpg', '.jpeg', '.gif', '.webp', '.bmp'}
+
+# comprovantes/sha256/ab/<hash>.ext, com ou sem o prefixo do storage remoto
+NOME_ENDERECADO = re.compile(r'(^|/)comprovantes/sha256/[0-9a-f]{2}/[0-9a-f]{64}(\.[a-z0-9]+)?$')
+
+# Segundos entre recontagens completas do tamanho do cache (outros processos
+# também gravam nele; entre uma e outra vale o total acumulado deste processo)
+RECONTAR_CACHE = 300
+
+
+def storage_comprovantes():
+    return storages['comprovantes']
+
+
+def eh_imagem(nome):
+    return Path(nome or '').suffix.lower() in EXTENSOES_IMAGEM
+
+
+class ComprovanteStorage(Storage):
+    def __init__(self, remoto=None, cache_dir=None, cache_max_bytes=512 * 1024 * 1024):
+        # remoto: caminho da classe de storage ou None para STORAGES['default']
+        self._remoto = remoto
+        self.cache_dir = Path(cache_dir or Path(settings.BASE_DIR) / 'cache_comprovantes')
+        self.cache_max_bytes = cache_max_bytes
+        self._trava = threading.Lock()
+        self._tamanho_cache = None
+        self._contado_em = 0.0
+
+    @cached_property
+    def remoto(self):
+        if self._remoto is None:
+            return storages['default']
+        if isinstance(self._remoto, str):
+            return import_string(self._remoto)()
+        return self._remoto
+
+    # --- API do Storage ---
+
+    def get_available_name(self, name, max_length=None):
+        # O nome definitivo sai do conteúdo em _save; nome repetido é o mesmo arquivo
+        return name
+
+    def _save(self, name, content):
+        digest = hashlib.sha256()
+        with tempfile.SpooledTemporaryFile(max_size=10 * 1024 * 1024) as tmp:
+            if hasattr(content, 'seek'):
+                content.seek(0)
+            for pedaco in content.chunks():
+                digest.update(pedaco)
+                tmp.write(pedaco)
+            hexa = digest.hexdigest()
+            nome = self._nome_remoto(f"comprovantes/sha256/{hexa[:2]}/{hexa}{Path(name).suffix.lower()}")
+            if not self.remoto.exists(nome):
+                tmp.seek(0)
+                nome = self._enviar(nome, tmp)
+            tmp.seek(0)
+            self._guardar_no_cache(nome, tmp)
+        return nome
+
+    def _open(self, name, mode='rb'):
+        caminho = self._do_cache(name)
+        if caminho is None:
+            with self.remoto.open(name, 'rb') as original:
+                caminho = self._guardar_no_cache(name, original)
+        return File(open(caminho, 'rb'), name=name)
+
+    def delete(self, name):
+        self.remoto.delete(name)
+        self.descartar_local(name)
+
+    def exists(self, name):
+        return self._caminho_cache(name).exists() or self.remoto.exists(name)
+
+    def size(self, name):
+        caminho = self._caminho_cache(name)
+        return caminho.stat().st_size if caminho.exists() else self.remoto.size(name)
+
+    def url(self, name):
+        return self.remoto.url(name)
+
+    def listdir(self, path):
+        return self.remoto.listdir(path)
+
+    # --- Nomes no storage remoto ---
+
+    @staticmethod
+    def eh_enderecado(name):
+        """O nome é de um arquivo endereçado por conteúdo (o conteúdo nunca muda)?"""
+        return bool(NOME_ENDERECADO.search(name or ''))
+
+    def _eh_cloudinary(self):
+        from cloudinary_storage.storage import MediaCloudinaryStorage
+        return isinstance(self.remoto, MediaCloudinaryStorage)
+
+    def _nome_remoto(self, nome):
+        """O nome com que o arquivo fica no remoto (no Cloudinary, o public_id)."""
+        if not self._eh_cloudinary():
+            return nome
+        nome = self.remoto._prepend_prefix(nome)
+        if self.remoto._get_resource_type(nome) != 'raw':
+            nome = os.path.splitext(nome)[0]  # image/video: a extensão vira o formato
+        return nome
+
+    def _enviar(self, nome, arquivo):
+        if not self._eh_cloudinary():
+            return self.remoto.save(nome, File(arquivo, name=nome))
+        import cloudinary.uploader
+        pasta, public_id = nome.rsplit('/', 1)
+        resposta = cloudinary.uploader.upload(
+            arquivo, public_id=public_id, folder=pasta, use_filename=False,
+            unique_filename=False, overwrite=False,
+            resource_type=self.remoto._get_resource_type(nome), tags=self.remoto.TAG,
+        )
+        return resposta['public_id']
+
+    # --- Cache local e miniaturas ---
+
+    def descartar_local(self, name):
+        """Apaga o original e as miniaturas de `name` do cache local."""
+        chave = self._chave(name)
+        self._caminho_cache(name).unlink(missing_ok=True)
+        pasta = self.cache_dir / 'miniaturas'
+        if pasta.exists():
+            for miniatura in pasta.glob(f'{chave}_*'):
+                miniatura.unlink(missing_ok=True)
+
+    def miniatura(self, name, largura, altura):
+        """Caminho local de uma miniatura JPEG de `name` ou None se não for imagem."""
+        from PIL import Image, ImageOps, UnidentifiedImageError
+
+        destino = self.cache_dir / 'miniaturas' / f'{self._chave(name)}_{largura}x{altura}.jpg'
+        if destino.exists():
+            os.utime(destino)
+            return destino
+        try:
+            with self.open(name) as original, Image.open(original) as imagem:
+                imagem = ImageOps.exif_transpose(imagem)
+                imagem.thumbnail((largura, altura))
+                if imagem.mode in ('RGBA', 'LA', 'P'):
+                    imagem = imagem.convert('RGBA')
+                    fundo = Image.new('RGB', imagem.size, 'white')
+                    fundo.paste(imagem, mask=imagem.getchannel('A'))
+                    imagem = fundo
+                else:
+                    imagem = imagem.convert('RGB')
+                destino.parent.mkdir(parents=True, exist_ok=True)
+                with tempfile.NamedTemporaryFile(dir=destino.parent, delete=False) as tmp:
+                    imagem.save(tmp, 'JPEG', quality=80)
+                os.replace(tmp.name, destino)
+        except (UnidentifiedImageError, OSError):
+            return None
+        self._limitar_cache(destino.stat().st_size)
+        return destino
+
+    def _chave(self, name):
+        return hashlib.sha256(name.encode()).hexdigest()
+
+    def _caminho_cache(self, name):
+        chave = self._chave(name)
+        return self.cache_dir / 'originais' / chave[:2] / f'{chave}{Path(name).suffix.lower()}'
+
+    def _do_cache(self, name):
+        caminho = self._caminho_cache(name)
+        try:
+            os.utime(caminho)  # marca o acesso para o LRU
+        except FileNotFoundError:
+            return None
+        return caminho
+
+    def _guardar_no_cache(self, name, arquivo):
+        caminho = self._caminho_cache(name)
+        caminho.parent.mkdir(parents=True, exist_ok=True)
+        with tempfile.NamedTemporaryFile(dir=caminho.parent, delete=False) as tmp:
+            for pedaco in iter(lambda: arquivo.read(1024 * 1024), b''):
+                tmp.write(pedaco)
+        os.replace(tmp.name, caminho)
+        self._limitar_cache(caminho.stat().st_size)
+        return caminho
+
+    def _limitar_cache(self, gravados):
+        """
+        Soma `gravados` bytes ao total do cache e, só quando ele passa do limite,
+        percorre a pasta e remove os arquivos acessados há mais tempo até caber em
+        90% do limite.
+        """
+        with self._trava:
+            if self._tamanho_cache is None or time.monotonic() - self._contado_em > RECONTAR_CACHE:
+                self._tamanho_cache = sum(tamanho for _, tamanho, _ in self._arquivos_do_cache())
+                self._contado_em = time.monotonic()
+            else:
+                self._tamanho_cache += gravados
+            if self._tamanho_cache <= self.cache_max_bytes:
+                return
+            arquivos = self._arquivos_do_cache()
+            total = sum(tamanho for _, tamanho, _ in arquivos)
+            for _, tamanho, caminho in sorted(arquivos):
+                if total <= self.cache_max_bytes * 0.9:
+                    break
+                try:
+                    os.remove(caminho)
+                except FileNotFoundError:
+                    pass
+                total -= tamanho
+            self._tamanho_cache = total
+            self._contado_em = time.monotonic()
+
+    def _arquivos_do_cache(self):
+        """(acesso, tamanho, caminho) de cada arquivo do cache."""
+        arquivos = []
+        for raiz, _, nomes in os.walk(self.cache_dir):
+            for nome in nomes:
+                caminho = os.path.join(raiz, nome)
+                try:
+                    info = os.stat(caminho)
+                except FileNotFoundError:
+                    continue
+                arquivos.append((info.st_mtime, info.st_size, caminho))
+        return arquivos
@@ -0,0 +1,345 @@
+# workflow/arquivamento.py
+#
+# Arquivamento de comprovantes em segundo plano. A página de armazenamento (e a
+# ação do DespesaAdmin) só cria o ArquivamentoComprovantes e dispara uma thread;
+# a thread baixa os arquivos com um pool limitado, grava cada um no ZIP em disco
+# assim que chega, confere o ZIP fechado (CRC e tamanho de cada entrada) e só
+# então remove os originais do armazenamento, também em paralelo.
+#
+# Se o processo morrer no meio, nada foi removido antes da conferência, e cada
+# despesa só perde o comprovante logo depois de o arquivo dela sair da nuvem: basta
+# disparar um novo arquivamento com as mesmas despesas. A thread grava um sinal de
+# vida (atualizado_em) a cada passo; marcar_interrompidos() põe em ERRO os jobs
+# sem sinal há ARQUIVAMENTO_SEM_SINAL segundos (worker reiniciado, timeout...), e
+# as páginas de armazenamento e de status chamam essa função antes de mostrar os jobs.
+#
+# zip_em_streaming é o download simples (sem remover nada): o ZIP vai sendo
+# enviado ao navegador enquanto os arquivos chegam, sem montar tudo em memória.
+#
+# settings.COMPROVANTES_BACKEND escolhe de onde vêm os arquivos: 'cloudinary'
+# (produção) ou 'local' (lê e apaga pelo storage do campo comprovante — em
+# desenvolvimento, pasta local; o comando verificar_arquivamento usa uma temporária).
+
+import mimetypes
+import os
+import threading
+import zipfile
+import zlib
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from datetime import timedelta
+from itertools import islice
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import ArquivamentoComprovantes, Despesa
+
+
+class ArmazenamentoCloudinary:
+    def __init__(self):
+        import cloudinary
+        cfg = settings.CLOUDINARY_STORAGE
+        cloudinary.config(
+            cloud_name=cfg['CLOUD_NAME'],
+            api_key=cfg['API_KEY'],
+            api_secret=cfg['API_SECRET'],
+        )
+
+    def baixar(self, nome):
+        import urllib.request
+        with urllib.request.urlopen(_storage().url(nome), timeout=60) as resp:
+            content_type = resp.headers.get('Content-Type', '').split(';')[0].strip()
+            return resp.read(), content_type
+
+    def remover(self, nome):
+        import cloudinary.uploader
+        # Mesmo public_id do upload (prefixo do storage; raw mantém a extensão).
+        # RESOURCE_TYPE 'auto': o arquivo pode ter subido como raw ou como image
+        public_id = _storage()._nome_remoto(nome)
+        resultados = [
+            cloudinary.uploader.destroy(public_id, resource_type='raw', invalidate=True).get('result'),
+            cloudinary.uploader.destroy(os.path.splitext(public_id)[0], resource_type='image', invalidate=True).get('result'),
+        ]
+        # 'not found' nos dois tipos: o arquivo não saiu da nuvem por aqui, a despesa fica com ele
+        if 'ok' not in resultados:
+            raise IOError(f"Cloudinary não removeu {public_id}: {resultados}")
+        _storage().descartar_local(nome)
+
+
+class ArmazenamentoLocal:
+    def __init__(self, storage=None):
+        self.storage = storage or _storage()
+
+    def baixar(self, nome):
+        with self.storage.open(nome, 'rb') as f:
+            return f.read(), mimetypes.guess_type(nome)[0] or ''
+
+    def remover(self, nome):
+        self.storage.delete(nome)
+
+
+def _storage():
+    return Despesa._meta.get_field('comprovante').storage
+
+
+BACKENDS = {
+    'cloudinary': ArmazenamentoCloudinary,
+    'local': ArmazenamentoLocal,
+}
+
+
+def backend_padrao():
+    return BACKENDS[getattr(settings, 'COMPROVANTES_BACKEND', 'cloudinary')]()
+
+
+def nome_no_zip(despesa_id, nome_arquivo, content_type):
+    """ocorrencia_<id>_comprovante.<ext>, com a extensão vinda do Content-Type ou do nome."""
+    ext = (mimetypes.guess_extension(content_type) or '') if content_type else ''
+    # mimetypes pode retornar .jpe/.jpeg → normaliza para .jpg
+    ext = {'.jpe': '.jpg', '.jpeg': '.jpg'}.get(ext, ext)
+    if not ext:
+        _, ext = os.path.splitext(nome_arquivo)
+    ext = ext.lstrip('.').lower() or 'bin'
+    return f"ocorrencia_{despesa_id}_comprovante.{ext}"
+
+
+def iniciar_arquivamento(usuario, ids):
+    """Cria o job para as despesas (com comprovante) de `ids` e o dispara após o commit."""
+    ids = list(
+        Despesa.objects.filter(pk__in=ids).exclude(comprovante='').exclude(comprovante__isnull=True)
+        .order_by('pk').values_list('pk', flat=True)
+    )
+    job = ArquivamentoComprovantes.objects.create(usuario=usuario, despesas=ids, total=len(ids))
+    transaction.on_commit(lambda: threading.Thread(
+        target=_executar_em_thread, args=(job.pk,), name=f'arquivamento-{job.pk}', daemon=True,
+    ).start())
+    return job
+
+
+def _executar_em_thread(job_id):
+    try:
+        executar_arquivamento(job_id)
+    finally:
+        connections.close_all()
+
+
+def executar_arquivamento(job_id, backend=None, workers=None):
+    """Roda o job (na thread do chamador). Devolve o job atualizado."""
+    backend = backend or backend_padrao()
+    workers = workers or getattr(settings, 'ARQUIVAMENTO_THREADS', 8)
+    job = ArquivamentoComprovantes.objects.get(pk=job_id)
+    _atualizar(job, status='EXECUTANDO')
+
+    destino = Path(settings.ARQUIVAMENTO_DIR)
+    destino.mkdir(parents=True, exist_ok=True)
+    caminho = destino / f"comprovantes_{job.pk}_{timezone.localtime():%Y%m%d_%H%M%S}.zip"
+    parcial = caminho.with_suffix('.zip.parcial')
+    try:
+        arquivos = arquivos_das_despesas(job.despesas)
+        gravados = _baixar_para_zip(job, backend, arquivos, parcial, workers)
+        conferidos = _conferir_zip(parcial, gravados)
+        if len(conferidos) != len(gravados):
+            raise RuntimeError(
+                f"{len(gravados) - len(conferidos)} entrada(s) do ZIP não conferem; nada foi removido."
+            )
+        parcial.replace(caminho)
+        _atualizar(job, arquivo=caminho.name)
+
+        removidos = _remover(job, backend, {pk: arquivos[pk] for pk in conferidos}, workers)
+        mensagem = f"{job.baixados} comprovante(s) arquivado(s), {removidos} removido(s) da nuvem."
+        if job.erros or removidos < len(conferidos):
+            mensagem += (
+                f" {job.erros} com erro no download e {len(conferidos) - removidos} com erro na "
+                f"remoção ou trocado(s) durante o arquivamento (mantidos na nuvem)."
+            )
+        _atualizar(job, status='CONCLUIDO', removidos=removidos, mensagem=mensagem,
+                   concluido_em=timezone.now())
+    except Exception as e:
+        parcial.unlink(missing_ok=True)
+        _atualizar(job, status='ERRO', mensagem=str(e), concluido_em=timezone.now())
+    return job
+
+
+def arquivos_das_despesas(ids):
+    """{despesa_id: nome do comprovante} das despesas de `ids` que têm comprovante."""
+    return dict(
+        Despesa.objects.filter(pk__in=ids).exclude(comprovante='')
+        .exclude(comprovante__isnull=True).order_by('pk').values_list('pk', 'comprovante')
+    )
+
+
+class _SaidaZip:
+    """
+    Destino só-escrita e sem seek para o zipfile: sem seek ele grava cada
+    entrada com data descriptor (tamanho e CRC depois dos dados), e o que foi
+    escrito sai em pedaços pelo gerador de zip_em_streaming.
+    """
+    def __init__(self):
+        self._pedacos = []
+        self._posicao = 0
+
+    def write(self, dados):
+        self._pedacos.append(bytes(dados))
+        self._posicao += len(dados)
+        return len(dados)
+
+    def tell(self):
+        return self._posicao
+
+    def flush(self):
+        pass
+
+    def retirar(self):
+        dados, self._pedacos = b''.join(self._pedacos), []
+        return dados
+
+
+def zip_em_streaming(arquivos, backend=None, workers=None):
+    """
+    Gera os bytes de um ZIP (zip64) com os comprovantes de `arquivos`
+    ({despesa_id: nome}), entregando cada entrada assim que o download termina.
+    Nada é removido do armazenamento. Arquivos que falharam são listados em
+    ERROS.txt no fim do ZIP.
+    """
+    backend = backend or backend_padrao()
+    workers = workers or getattr(settings, 'ARQUIVAMENTO_THREADS', 8)
+    saida = _SaidaZip()
+    falhas = []
+    itens = ((backend, pk, nome) for pk, nome in arquivos.items())
+    with zipfile.ZipFile(saida, 'w', zipfile.ZIP_DEFLATED, allowZip64=True) as zf:
+        for despesa_id, dados, content_type, erro in _em_paralelo(_baixar, itens, workers):
+            if erro is not None:
+                falhas.append(f"ocorrencia_{despesa_id}: {erro}")
+                continue
+            with zf.open(nome_no_zip(despesa_id, arquivos[despesa_id], content_type), 'w', force_zip64=True) as entrada:
+                entrada.write(dados)
+            yield saida.retirar()
+        if falhas:
+            zf.writestr('ERROS.txt', '\n'.join(falhas) + '\n')
+    yield saida.retirar()
+
+
+def caminho_do_arquivo(job):
+    return Path(settings.ARQUIVAMENTO_DIR) / job.arquivo if job.arquivo else None
+
+
+def marcar_interrompidos():
+    """
+    Põe em ERRO os jobs na fila ou executando sem sinal de vida há mais de
+    ARQUIVAMENTO_SEM_SINAL segundos: a thread morreu com o worker. Devolve quantos.
+    """
+    limite = timezone.now() - timedelta(seconds=getattr(settings, 'ARQUIVAMENTO_SEM_SINAL', 600))
+    return ArquivamentoComprovantes.objects.filter(
+        Q(atualizado_em__lt=limite) | Q(atualizado_em__isnull=True, criado_em__lt=limite),
+        status__in=['PENDENTE', 'EXECUTANDO'],
+    ).update(
+        status='ERRO', concluido_em=timezone.now(),
+        mensagem="Interrompido: o processo que executava o arquivamento parou. Os comprovantes já "
+                 "removidos saíram das despesas; dispare de novo com as mesmas despesas para o restante.",
+    )
+
+
+def _atualizar(job, **campos):
+    campos['atualizado_em'] = timezone.now()
+    for campo, valor in campos.items():
+        setattr(job, campo, valor)
+    ArquivamentoComprovantes.objects.filter(pk=job.pk).update(**campos)
+
+
+def _baixar(backend, despesa_id, nome):
+    try:
+        dados, content_type = backend.baixar(nome)
+        return despesa_id, dados, content_type, None
+    except Exception as e:
+        return despesa_id, None, None, e
+
+
+def _em_paralelo(funcao, itens, workers):
+    """
+    Aplica `funcao` aos itens num pool de `workers` threads e devolve os
+    resultados conforme terminam. No máximo 2 × workers itens ficam em voo, para
+    a memória não crescer com o tamanho da seleção.
+    """
+    itens = iter(itens)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        em_voo = {pool.submit(funcao, *item) for item in islice(itens, workers * 2)}
+        while em_voo:
+            prontos, em_voo = wait(em_voo, return_when=FIRST_COMPLETED)
+            for futuro in prontos:
+                yield futuro.result()
+                proximo = next(itens, None)
+                if proximo is not None:
+                    em_voo.add(pool.submit(funcao, *proximo))
+
+
+def _baixar_para_zip(job, backend, arquivos, caminho, workers):
+    """Grava cada download no ZIP assim que chega. Devolve {despesa_id: (nome, crc, tamanho)}."""
+    gravados = {}
+    erros = 0
+    itens = ((backend, pk, nome) for pk, nome in arquivos.items())
+    with zipfile.ZipFile(caminho, 'w', zipfile.ZIP_DEFLATED, allowZip64=True) as zf:
+        for despesa_id, dados, content_type, erro in _em_paralelo(_baixar, itens, workers):
+            if erro is not None:
+                erros += 1
+            else:
+                nome = nome_no_zip(despesa_id, arquivos[despesa_id], content_type)
+                zf.writestr(nome, dados)
+                gravados[despesa_id] = (nome, zlib.crc32(dados), len(dados))
+            _atualizar(job, baixados=len(gravados), erros=erros)
+    return gravados
+
+
+def _conferir_zip(caminho, gravados):
+    """Ids cujas entradas existem no ZIP fechado com o mesmo CRC e tamanho do download."""
+    with zipfile.ZipFile(caminho) as zf:
+        if zf.testzip() is not None:
+            return set()
+        entradas = {info.filename: info for info in zf.infolist()}
+    return {
+        pk for pk, (nome, crc, tamanho) in gravados.items()
+        if nome in entradas and entradas[nome].CRC == crc and entradas[nome].file_size == tamanho
+    }
+
+
+def _remover_um(backend, nome):
+    try:
+        backend.remover(nome)
+        return nome
+    except Exception:
+        return None
+
+
+def _remover(job, backend, arquivos, workers):
+    """
+    Remove do armazenamento os arquivos de {despesa_id: nome}, tira o comprovante
+    das despesas liberadas e devolve quantas foram. Com o endereçamento por
+    conteúdo várias despesas podem apontar para o mesmo arquivo: ele é removido
+    uma vez só, e continua na nuvem se alguma despesa fora deste arquivamento
+    ainda o usa.
+
+    A despesa só é limpa se o comprovante ainda for o arquivado: um reenvio
+    feito durante o arquivamento não é apagado. A limpeza acontece logo depois
+    de cada remoção, então um job interrompido não deixa despesa apontando para
+    arquivo que já saiu da nuvem.
+    """
+    por_nome = {}
+    for pk, nome in arquivos.items():
+        por_nome.setdefault(nome, []).append(pk)
+    em_uso = set(
+        Despesa.objects.filter(comprovante__in=list(por_nome)).exclude(pk__in=list(arquivos))
+        .values_list('comprovante', flat=True)
+    )
+    liberadas = sum(_liberar(nome, por_nome[nome]) for nome in em_uso)
+    itens = ((backend, nome) for nome in por_nome if nome not in em_uso)
+    for nome in _em_paralelo(_remover_um, itens, workers):
+        if nome is not None:
+            liberadas += _liberar(nome, por_nome[nome])
+            _atualizar(job, removidos=liberadas)
+    return liberadas
+
+
+def _liberar(nome, ids):
+    return Despesa.objects.filter(pk__in=ids, comprovante=nome).update(comprovante=None)
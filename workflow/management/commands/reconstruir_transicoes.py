@@ -0,0 +1,25 @@
+# workflow/management/commands/reconstruir_transicoes.py
+
+from django.core.management.base import BaseCommand
+
+from workflow.models import Despesa
+from workflow.transicoes import reconstruir_transicoes
+
+
+class Command(BaseCommand):
+    help = (
+        "Reconstrói o histórico de TransicaoStatus a partir do LogWorkflow. Por padrão só "
+        "processa despesas sem nenhuma transição ou cuja primeira transição é posterior ao "
+        "primeiro log (as anteriores à tabela, mesmo que já tenham mudado de status depois dela)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--todas', action='store_true',
+            help="Apaga e reconstrói o histórico de todas as despesas.",
+        )
+
+    def handle(self, *args, **opts):
+        despesas = Despesa.objects.all() if opts['todas'] else None
+        total = reconstruir_transicoes(despesas)
+        self.stdout.write(self.style.SUCCESS(f"{total} transição(ões) de status geradas."))
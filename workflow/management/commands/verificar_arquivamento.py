@@ -0,0 +1,299 @@
+# workflow/management/commands/verificar_arquivamento.py
+
+import io
+import random
+import tempfile
+import threading
+import time
+import zipfile
+from datetime import date, timedelta
+from decimal import Decimal
+from pathlib import Path
+from unittest import mock
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test.utils import override_settings
+from django.utils import timezone
+
+from cadastros.models import Fornecedor
+from core.models import UsuarioCustomizado
+from workflow import arquivamento
+from workflow.armazenamento import ComprovanteStorage
+from workflow.arquivamento import (
+    ArmazenamentoCloudinary, ArmazenamentoLocal, executar_arquivamento, caminho_do_arquivo, zip_em_streaming, marcar_interrompidos,
+)
+from workflow.models import ArquivamentoComprovantes, Despesa
+
+
+class _Rollback(Exception):
+    pass
+
+
+class ArmazenamentoDeTeste(ArmazenamentoLocal):
+    """Armazenamento local com latência, falhas escolhidas e contagem de downloads simultâneos."""
+
+    def __init__(self, storage, falha_download=(), falha_remocao=()):
+        super().__init__(storage)
+        self.falha_download = set(falha_download)
+        self.falha_remocao = set(falha_remocao)
+        self.simultaneos = 0
+        self.pico = 0
+        self._trava = threading.Lock()
+
+    def baixar(self, nome):
+        with self._trava:
+            self.simultaneos += 1
+            self.pico = max(self.pico, self.simultaneos)
+        try:
+            time.sleep(random.uniform(0, 0.01))
+            if nome in self.falha_download:
+                raise IOError(f"download falhou: {nome}")
+            return super().baixar(nome)
+        finally:
+            with self._trava:
+                self.simultaneos -= 1
+
+    def remover(self, nome):
+        if nome in self.falha_remocao:
+            raise IOError(f"remoção falhou: {nome}")
+        super().remover(nome)
+
+
+class _CloudinaryFalso:
+    """
+    cloudinary.uploader.upload/destroy com a regra de nomes do Cloudinary: sem
+    public_id, use_filename usa o nome do arquivo e, a menos de
+    unique_filename=False, soma um sufixo aleatório; o public_id devolvido inclui
+    a pasta. O destroy só acha o arquivo pelo mesmo public_id e resource_type.
+    """
+
+    def __init__(self):
+        self.enviados = {}
+        self.tipos = {}
+
+    def upload(self, arquivo, public_id=None, folder=None, use_filename=False, unique_filename=True,
+               overwrite=True, resource_type='image', **opcoes):
+        if public_id is None:
+            base = Path(getattr(arquivo, 'name', '') or 'arquivo').name if use_filename else ''
+            if not use_filename or unique_filename:
+                base += ('_' if base else '') + random.randbytes(3).hex()
+            public_id = base
+        public_id = f"{folder}/{public_id}" if folder else public_id
+        if overwrite or public_id not in self.enviados:
+            self.enviados[public_id] = arquivo.read()
+            self.tipos[public_id] = resource_type
+        return {'public_id': public_id}
+
+    def destroy(self, public_id, resource_type='image', **opcoes):
+        if self.tipos.get(public_id) != resource_type:
+            return {'result': 'not found'}
+        del self.enviados[public_id], self.tipos[public_id]
+        return {'result': 'ok'}
+
+
+def _storage_cloudinary_falso(falso):
+    """RawMediaCloudinaryStorage cujo exists consulta os public_ids do _CloudinaryFalso."""
+    from cloudinary_storage.storage import RawMediaCloudinaryStorage
+
+    class Remoto(RawMediaCloudinaryStorage):
+        def exists(self, name):
+            return self._prepend_prefix(name) in falso.enviados
+
+    return Remoto()
+
+
+class Command(BaseCommand):
+    help = (
+        "Roda o arquivamento de comprovantes contra um armazenamento local falso (pasta "
+        "temporária, dentro de uma transação desfeita ao final) e confere o ZIP, o que foi "
+        "removido e o que ficou na nuvem quando o download ou a remoção falham. A remoção "
+        "no Cloudinary é conferida contra um uploader simulado."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--arquivos', type=int, default=60)
+        parser.add_argument('--threads', type=int, default=4)
+
+    def handle(self, *args, **opts):
+        with tempfile.TemporaryDirectory() as pasta, override_settings(ARQUIVAMENTO_DIR=Path(pasta) / 'zips'):
+            storage = FileSystemStorage(location=Path(pasta) / 'nuvem')
+            problemas = self._verificar_nomes_cloudinary(Path(pasta) / 'cache')
+            try:
+                with transaction.atomic():
+                    problemas += self._verificar(storage, opts['arquivos'], opts['threads'])
+                    problemas += self._verificar_remocao_cloudinary(Path(pasta) / 'cache_nuvem', opts['threads'])
+                    raise _Rollback
+            except _Rollback:
+                pass
+
+        if problemas:
+            for problema in problemas:
+                self.stdout.write(self.style.ERROR(f"✗ {problema}"))
+            raise CommandError("Arquivamento divergente.")
+        self.stdout.write(self.style.SUCCESS("OK — ZIP conferido e só os arquivos arquivados saíram da nuvem."))
+
+    def _verificar(self, storage, quantidade, threads):
+        usuario = UsuarioCustomizado.objects.create(username='__arquivamento__')
+        fornecedor = Fornecedor.objects.create(razao_social='Fornecedor __arquivamento__', cnpj_cpf='__arq__')
+        conteudos = {}
+        for i in range(quantidade):
+            ext = ['pdf', 'png', 'jpg'][i % 3]
+            dados = random.randbytes(random.randint(1, 50_000))
+            nome = storage.save(f'comprovantes/c{i}.{ext}', ContentFile(dados))
+            conteudos[self._despesa(usuario, fornecedor, nome).pk] = (nome, dados)
+
+        # Endereçamento por conteúdo: despesas podem dividir o mesmo arquivo, dentro
+        # do arquivamento (removido uma vez) ou fora dele (o arquivo fica na nuvem)
+        nomes = [nome for nome, _ in conteudos.values()]
+        pk_origem = list(conteudos)[10]
+        irma = self._despesa(usuario, fornecedor, conteudos[pk_origem][0])
+        conteudos[irma.pk] = conteudos[pk_origem]
+        fora = self._despesa(usuario, fornecedor, nomes[11])
+
+        backend = ArmazenamentoDeTeste(storage, falha_download=nomes[:3], falha_remocao=nomes[3:5])
+        esperado = {pk: dados for pk, (nome, dados) in conteudos.items() if nome not in backend.falha_download}
+        problemas = self._verificar_streaming(storage, backend, conteudos, esperado, threads)
+
+        job = ArquivamentoComprovantes.objects.create(usuario=usuario, despesas=list(conteudos), total=len(conteudos))
+        # Um comprovante é reenviado entre a remoção do arquivo antigo e a limpeza da despesa
+        pk_reenvio = next(pk for pk, (nome, _) in conteudos.items() if nome == nomes[6])
+        reenvio = {nomes[6]: 'comprovantes/reenviado.pdf'}
+        liberar = arquivamento._liberar
+
+        def liberar_com_reenvio(nome, ids):
+            if nome in reenvio:
+                Despesa.objects.filter(pk=pk_reenvio).update(comprovante=reenvio[nome])
+            return liberar(nome, ids)
+
+        with mock.patch('workflow.arquivamento._liberar', liberar_com_reenvio):
+            job = executar_arquivamento(job.pk, backend=backend, workers=threads)
+        job.refresh_from_db()
+
+        if job.status != 'CONCLUIDO':
+            return problemas + [f"job terminou em {job.status}: {job.mensagem}"]
+        self.stdout.write(f"{job.mensagem} (pico de {backend.pico} downloads simultâneos)")
+        if backend.pico > threads:
+            problemas.append(f"{backend.pico} downloads simultâneos com {threads} threads")
+
+        with zipfile.ZipFile(caminho_do_arquivo(job)) as zf:
+            no_zip = {int(n.split('_')[1]): zf.read(n) for n in zf.namelist()}
+        if no_zip != esperado:
+            problemas.append("conteúdo do ZIP diferente dos arquivos baixados")
+        if (job.baixados, job.erros, job.removidos) != (len(esperado), 3, len(esperado) - 3):
+            problemas.append(f"contadores {job.baixados}/{job.erros}/{job.removidos}")
+
+        mantidos = backend.falha_download | backend.falha_remocao
+        for pk, (nome, _) in conteudos.items():
+            na_nuvem = storage.exists(nome)
+            comprovante = Despesa.objects.filter(pk=pk).values_list('comprovante', flat=True).get()
+            if nome == fora.comprovante.name:
+                # Ainda usado fora do arquivamento: sai da despesa arquivada, fica na nuvem
+                ok = na_nuvem and not comprovante
+            elif pk == pk_reenvio:
+                # Reenviado durante o arquivamento: o arquivo novo não pode ser apagado
+                ok = not na_nuvem and comprovante == reenvio[nome]
+            else:
+                ok = na_nuvem == (nome in mantidos) and bool(comprovante) == na_nuvem
+            if not ok:
+                problemas.append(f"despesa #{pk}: na nuvem={na_nuvem}, comprovante={comprovante!r}")
+        fora.refresh_from_db()
+        if fora.comprovante.name != nomes[11]:
+            problemas.append("despesa fora do arquivamento perdeu o comprovante")
+        return problemas + self._verificar_interrompidos(usuario)
+
+    def _verificar_interrompidos(self, usuario):
+        """Job sem sinal de vida vira ERRO; o que está dando sinal continua."""
+        antigo = timezone.now() - timedelta(hours=1)
+        parado = ArquivamentoComprovantes.objects.create(usuario=usuario, status='EXECUTANDO')
+        ArquivamentoComprovantes.objects.filter(pk=parado.pk).update(atualizado_em=antigo)
+        na_fila = ArquivamentoComprovantes.objects.create(usuario=usuario)
+        ArquivamentoComprovantes.objects.filter(pk=na_fila.pk).update(criado_em=antigo)
+        vivo = ArquivamentoComprovantes.objects.create(
+            usuario=usuario, status='EXECUTANDO', atualizado_em=timezone.now(),
+        )
+        marcar_interrompidos()
+        status = dict(ArquivamentoComprovantes.objects.filter(
+            pk__in=[parado.pk, na_fila.pk, vivo.pk]).values_list('pk', 'status'))
+        if (status[parado.pk], status[na_fila.pk], status[vivo.pk]) != ('ERRO', 'ERRO', 'EXECUTANDO'):
+            return [f"jobs interrompidos: {status}"]
+        return []
+
+    def _verificar_nomes_cloudinary(self, cache_dir):
+        """O mesmo conteúdo enviado duas vezes ao Cloudinary vira um único arquivo."""
+        falso = _CloudinaryFalso()
+        storage = ComprovanteStorage(remoto=_storage_cloudinary_falso(falso), cache_dir=cache_dir)
+        dados = random.randbytes(1000)
+        with mock.patch('cloudinary.uploader.upload', falso.upload):
+            nomes = [storage.save(f'comprovantes/{nome}.png', ContentFile(dados)) for nome in ('a', 'b')]
+        problemas = []
+        if len(falso.enviados) != 1 or nomes[0] != nomes[1]:
+            problemas.append(f"Cloudinary: conteúdo repetido gerou {len(falso.enviados)} upload(s), nomes {nomes}")
+        if not (nomes[0].startswith('media/') and storage.eh_enderecado(nomes[0])):
+            problemas.append(f"Cloudinary: nome {nomes[0]!r} fora do padrão endereçado por conteúdo")
+
+        # O arquivamento apaga pelo mesmo public_id com que o arquivo subiu
+        with mock.patch('cloudinary.config'), mock.patch('cloudinary.uploader.destroy', falso.destroy), \
+                mock.patch('workflow.arquivamento._storage', lambda: storage):
+            ArmazenamentoCloudinary().remover(nomes[0])
+        if falso.enviados:
+            problemas.append(f"Cloudinary: remoção não apagou {list(falso.enviados)}")
+        return problemas
+
+    def _verificar_remocao_cloudinary(self, cache_dir, threads):
+        """Só a despesa cujo arquivo o Cloudinary confirmou ter apagado perde o comprovante."""
+        falso = _CloudinaryFalso()
+        storage = ComprovanteStorage(remoto=_storage_cloudinary_falso(falso), cache_dir=cache_dir)
+        with mock.patch('cloudinary.uploader.upload', falso.upload):
+            nomes = [storage.save(f'comprovantes/n{i}.pdf', ContentFile(random.randbytes(500))) for i in range(3)]
+        sumido = nomes[2]
+        falso.destroy(sumido, resource_type='raw')  # já não está na nuvem: destroy responde 'not found'
+
+        usuario = UsuarioCustomizado.objects.create(username='__arquivamento_nuvem__')
+        fornecedor = Fornecedor.objects.create(razao_social='Fornecedor __arquivamento_nuvem__', cnpj_cpf='__arqn__')
+        despesas = {self._despesa(usuario, fornecedor, nome).pk: nome for nome in nomes}
+        job = ArquivamentoComprovantes.objects.create(usuario=usuario, despesas=list(despesas), total=len(despesas))
+        with mock.patch('cloudinary.config'), mock.patch('cloudinary.uploader.destroy', falso.destroy), \
+                mock.patch('workflow.arquivamento._storage', lambda: storage):
+            liberadas = arquivamento._remover(job, ArmazenamentoCloudinary(), despesas, threads)
+
+        problemas = []
+        restantes = dict(Despesa.objects.filter(pk__in=list(despesas)).values_list('pk', 'comprovante'))
+        if liberadas != 2 or falso.enviados:
+            problemas.append(f"Cloudinary: {liberadas} liberada(s), ainda na nuvem {list(falso.enviados)}")
+        for pk, nome in despesas.items():
+            esperado = nome if nome == sumido else None
+            if restantes[pk] != esperado:
+                problemas.append(f"Cloudinary: despesa #{pk} com comprovante {restantes[pk]!r}, esperado {esperado!r}")
+        return problemas
+
+    def _despesa(self, usuario, fornecedor, nome):
+        despesa = Despesa.objects.create(
+            tipo_lancamento='CAIXINHA', solicitante=usuario, fornecedor=fornecedor, valor=Decimal('1.00'),
+            status='PAGO', data_despesa=date.today(),
+        )
+        Despesa.objects.filter(pk=despesa.pk).update(comprovante=nome)
+        despesa.comprovante.name = nome
+        return despesa
+
+    def _verificar_streaming(self, storage, backend, conteudos, esperado, threads):
+        """Download simples: ZIP válido entregue em pedaços, falhas em ERROS.txt e nada removido."""
+        pedacos = list(zip_em_streaming({pk: nome for pk, (nome, _) in conteudos.items()}, backend, threads))
+        problemas = []
+        with zipfile.ZipFile(io.BytesIO(b''.join(pedacos))) as zf:
+            if zf.testzip() is not None:
+                problemas.append("ZIP em streaming corrompido")
+            no_zip = {int(n.split('_')[1]): zf.read(n) for n in zf.namelist() if n != 'ERROS.txt'}
+            erros = zf.read('ERROS.txt').decode().splitlines() if 'ERROS.txt' in zf.namelist() else []
+        if no_zip != esperado:
+            problemas.append("conteúdo do ZIP em streaming diferente dos arquivos baixados")
+        if len(erros) != len(backend.falha_download):
+            problemas.append(f"ERROS.txt com {len(erros)} linha(s)")
+        if len(pedacos) <= len(esperado):
+            problemas.append(f"ZIP entregue em {len(pedacos)} pedaço(s), esperado um por arquivo")
+        if not all(storage.exists(nome) for nome, _ in conteudos.values()):
+            problemas.append("download simples removeu arquivos da nuvem")
+        self.stdout.write(f"streaming: {len(no_zip)} arquivo(s) em {len(pedacos)} pedaço(s)")
+        return problemas
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.2 on 2026-10-18 12:43
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cadastros', '0010_alter_colaboradorinfo_cpf'),
+        ('monitoramento_rh', '0004_add_validador_cpf_colaboradorinformal'),
+        ('workflow', '0020_despesa_pagamento_folha_alter_despesa_fornecedor_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='despesa',
+            index=models.Index(fields=['status', 'tipo_lancamento', 'data_criacao'], name='wf_status_tipo_criacao_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='logworkflow',
+            index=models.Index(fields=['despesa', 'data_hora'], name='wf_log_despesa_data_idx'),
+        ),
+    ]
@@ -0,0 +1,119 @@
+# Generated by Django 5.2.2 on 2026-10-18 12:53
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+FINAIS = ('PAGO', 'CONFERIDO', 'CANCELADO')
+# ação do log → (status em que o WF entra, status em que estava antes)
+ACOES = {
+    'Aprovou → RH':               ('AGUARDANDO_RH', 'AGUARDANDO_ADM'),
+    'Aprovou → Financeiro':       ('AGUARDANDO_FIN', 'AGUARDANDO_RH'),
+    'Direcionou ao Operador':     ('DIRECIONADO_OP', 'AGUARDANDO_FIN'),
+    'Retornou ao Administrativo': ('AGUARDANDO_ADM', 'AGUARDANDO_RH'),
+    'Devolveu ao Financeiro':     ('AGUARDANDO_FIN', 'DIRECIONADO_OP'),
+    'FINALIZOU (PAGO)':           ('PAGO', 'DIRECIONADO_OP'),
+    'CONFERIDO':                  ('CONFERIDO', 'AGUARDANDO_FIN'),
+    'CANCELOU':                   ('CANCELADO', None),
+}
+INICIAL_POR_TIPO = {'CAIXINHA': 'AGUARDANDO_FIN', 'SOLICITACAO': 'AGUARDANDO_RH', 'EXTRA': 'AGUARDANDO_FIN'}
+ORIGEM_POR_PERFIL = {'RH': 'AGUARDANDO_RH', 'Financeiro': 'AGUARDANDO_FIN', 'Operador': 'DIRECIONADO_OP'}
+
+
+def _horas(inicio, fim):
+    return round(max((fim - inicio).total_seconds(), 0) / 3600, 2)
+
+
+def _status_inicial(despesa, logs):
+    primeiro = next((log for log in logs if log.acao in ACOES), None)
+    padrao = INICIAL_POR_TIPO.get(despesa.tipo_lancamento, 'AGUARDANDO_RH')
+    if primeiro is None:
+        return despesa.status if despesa.status not in FINAIS else padrao
+    if primeiro.acao == 'Retornou ao Administrativo':
+        return ORIGEM_POR_PERFIL.get(
+            primeiro.perfil_usuario, INICIAL_POR_TIPO.get(despesa.tipo_lancamento, 'AGUARDANDO_FIN')
+        )
+    return ACOES[primeiro.acao][1] or padrao
+
+
+def popular_transicoes(apps, schema_editor):
+    """
+    Histórico inicial a partir do LogWorkflow (mesmas regras de
+    workflow.transicoes.transicoes_a_partir_dos_logs, copiadas aqui para a
+    migração não depender do código atual).
+    """
+    Despesa = apps.get_model('workflow', 'Despesa')
+    LogWorkflow = apps.get_model('workflow', 'LogWorkflow')
+    TransicaoStatus = apps.get_model('workflow', 'TransicaoStatus')
+
+    logs_por_despesa = {}
+    for log in LogWorkflow.objects.order_by('despesa_id', 'data_hora').only(
+            'despesa_id', 'acao', 'perfil_usuario', 'data_hora').iterator(chunk_size=2000):
+        logs_por_despesa.setdefault(log.despesa_id, []).append(log)
+
+    linhas = []
+    despesas = Despesa.objects.only('pk', 'status', 'tipo_lancamento', 'data_criacao', 'data_ultima_alteracao')
+    for despesa in despesas.iterator(chunk_size=2000):
+        logs = logs_por_despesa.get(despesa.pk, [])
+        entrada = despesa.data_criacao
+        for log in logs:
+            if log.acao in ACOES:
+                break
+            if log.acao == 'Criou Registro':
+                entrada = log.data_hora
+        entrada = entrada or (logs[0].data_hora if logs else despesa.data_ultima_alteracao)
+        if not entrada:
+            continue
+
+        transicoes = []
+
+        def entrar(status_de, status_para, quando):
+            if transicoes:
+                anterior = transicoes[-1]
+                anterior.saiu_em = max(quando, anterior.entrou_em)
+                anterior.horas = _horas(anterior.entrou_em, anterior.saiu_em)
+            final = status_para in FINAIS
+            transicoes.append(TransicaoStatus(
+                despesa_id=despesa.pk, status_de=status_de, status_para=status_para, entrou_em=quando,
+                saiu_em=quando if final else None, horas=0 if final else None,
+            ))
+
+        atual = _status_inicial(despesa, logs)
+        entrar('', atual, entrada)
+        for log in logs:
+            if log.acao in ACOES:
+                novo = ACOES[log.acao][0]
+                entrar(atual, novo, max(log.data_hora, transicoes[-1].entrou_em))
+                atual = novo
+        if atual != despesa.status:
+            entrar(atual, despesa.status, max(despesa.data_ultima_alteracao or entrada, transicoes[-1].entrou_em))
+        linhas.extend(transicoes)
+    TransicaoStatus.objects.bulk_create(linhas, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('workflow', '0021_indices_consultas'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TransicaoStatus',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status_de', models.CharField(blank=True, choices=[('AGUARDANDO_COMERCIAL', 'Aguardando Comercial'), ('AGUARDANDO_ADM', 'Aguardando Administrativo'), ('AGUARDANDO_RH', 'Aguardando RH'), ('AGUARDANDO_FIN', 'Aguardando Financeiro'), ('DIRECIONADO_OP', 'Direcionado ao Operador'), ('PAGO', 'Pago / Finalizado'), ('CONFERIDO', 'Conferido'), ('CANCELADO', 'Cancelado')], max_length=20, verbose_name='De')),
+                ('status_para', models.CharField(choices=[('AGUARDANDO_COMERCIAL', 'Aguardando Comercial'), ('AGUARDANDO_ADM', 'Aguardando Administrativo'), ('AGUARDANDO_RH', 'Aguardando RH'), ('AGUARDANDO_FIN', 'Aguardando Financeiro'), ('DIRECIONADO_OP', 'Direcionado ao Operador'), ('PAGO', 'Pago / Finalizado'), ('CONFERIDO', 'Conferido'), ('CANCELADO', 'Cancelado')], max_length=20, verbose_name='Para')),
+                ('entrou_em', models.DateTimeField(verbose_name='Entrou em')),
+                ('saiu_em', models.DateTimeField(blank=True, null=True, verbose_name='Saiu em')),
+                ('horas', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True, verbose_name='Horas no Status')),
+                ('despesa', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='transicoes', to='workflow.despesa')),
+            ],
+            options={
+                'verbose_name': 'Transição de Status',
+                'verbose_name_plural': 'Transições de Status',
+                'ordering': ['entrou_em'],
+                'indexes': [models.Index(fields=['despesa', 'entrou_em'], name='wf_trans_despesa_entrou_idx'), models.Index(fields=['status_para', 'saiu_em'], name='wf_trans_status_saiu_idx')],
+            },
+        ),
+        migrations.RunPython(popular_transicoes, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 5.2.2 on 2026-10-18 13:40
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def preencher_participantes(apps, schema_editor):
+    """Quem já tem log em cada despesa e o responsável de cada extra já vinculado."""
+    DespesaParticipante = apps.get_model('workflow', 'DespesaParticipante')
+    LogWorkflow = apps.get_model('workflow', 'LogWorkflow')
+    LancamentoExtra = apps.get_model('extras', 'LancamentoExtra')
+
+    linhas = [
+        DespesaParticipante(despesa_id=despesa_id, usuario_id=usuario_id, motivo='LOG')
+        for despesa_id, usuario_id in LogWorkflow.objects.values_list('despesa_id', 'usuario_id').distinct()
+    ]
+    linhas += [
+        DespesaParticipante(despesa_id=despesa_id, usuario_id=usuario_id, motivo='EXTRA')
+        for despesa_id, usuario_id in LancamentoExtra.objects.filter(
+            workflow_criado__isnull=False
+        ).values_list('workflow_criado_id', 'administrativo_id')
+    ]
+    DespesaParticipante.objects.bulk_create(linhas, batch_size=1000, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('workflow', '0022_transicaostatus'),
+        ('extras', '0004_add_dias_cobertura'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DespesaParticipante',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('motivo', models.CharField(choices=[('LOG', 'Atuou no workflow'), ('EXTRA', 'Responsável pelo extra')], max_length=10)),
+                ('despesa', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='participantes', to='workflow.despesa')),
+                ('usuario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='despesas_participadas', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Participante da Despesa',
+                'verbose_name_plural': 'Participantes da Despesa',
+                'unique_together': {('usuario', 'motivo', 'despesa')},
+            },
+        ),
+        migrations.RunPython(preencher_participantes, migrations.RunPython.noop),
+    ]
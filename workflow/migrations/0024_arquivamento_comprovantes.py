@@ -0,0 +1,38 @@
+# Generated by Django 5.2.2 on 2026-10-18 13:12
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('workflow', '0023_despesa_participante'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArquivamentoComprovantes',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('despesas', models.JSONField(default=list, verbose_name='Despesas (ids)')),
+                ('status', models.CharField(choices=[('PENDENTE', 'Na fila'), ('EXECUTANDO', 'Executando'), ('CONCLUIDO', 'Concluído'), ('ERRO', 'Erro')], default='PENDENTE', max_length=20)),
+                ('total', models.PositiveIntegerField(default=0)),
+                ('baixados', models.PositiveIntegerField(default=0)),
+                ('removidos', models.PositiveIntegerField(default=0)),
+                ('erros', models.PositiveIntegerField(default=0)),
+                ('arquivo', models.CharField(blank=True, max_length=255, verbose_name='Arquivo ZIP')),
+                ('mensagem', models.TextField(blank=True)),
+                ('criado_em', models.DateTimeField(auto_now_add=True)),
+                ('concluido_em', models.DateTimeField(blank=True, null=True)),
+                ('usuario', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='arquivamentos', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Arquivamento de Comprovantes',
+                'verbose_name_plural': 'Arquivamentos de Comprovantes',
+                'ordering': ['-criado_em'],
+            },
+        ),
+    ]
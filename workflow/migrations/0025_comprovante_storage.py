@@ -0,0 +1,19 @@
+# Generated by Django 5.2.2 on 2026-10-18 14:20
+
+import workflow.armazenamento
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('workflow', '0024_arquivamento_comprovantes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='despesa',
+            name='comprovante',
+            field=models.FileField(blank=True, null=True, storage=workflow.armazenamento.storage_comprovantes, upload_to='comprovantes/%Y/%m/', verbose_name='Comprovante (Upload)'),
+        ),
+    ]
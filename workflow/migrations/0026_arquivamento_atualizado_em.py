@@ -0,0 +1,18 @@
+# Generated by Django 5.2.2 on 2026-10-18 17:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('workflow', '0025_comprovante_storage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='arquivamentocomprovantes',
+            name='atualizado_em',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -2,6 +2,7 @@
 from django.db import models
 from django.utils import timezone
 from core.models import UsuarioCustomizado
+from .armazenamento import storage_comprovantes
 from cadastros.models import Fornecedor, Empresa, Banco, Tomador, Filial, MotivoAusencia, Colaborador, ColaboradorInfo
 
 STATUS_WORKFLOW = [
@@ -47,7 +48,7 @@ class Despesa(models.Model):
 
     # Campos específicos
     # AJUSTE: Organização automática por Ano e Mês
-    comprovante = models.FileField(upload_to='comprovantes/%Y/%m/', null=True, blank=True,
+    comprovante = models.FileField(upload_to='comprovantes/%Y/%m/', storage=storage_comprovantes, null=True, blank=True,
                                    verbose_name="Comprovante (Upload)")
 
     inicio_cobertura = models.DateField(null=True, blank=True, verbose_name="Cob Início")
@@ -85,7 +86,14 @@ class Despesa(models.Model):
 
     def save(self, *args, **kwargs):
         if self.nome_cobriu: self.nome_cobriu = self.nome_cobriu.upper()
+        is_new = self._state.adding
+        status_anterior = None if is_new else (
+            Despesa.objects.filter(pk=self.pk).values_list('status', flat=True).first()
+        )
         super().save(*args, **kwargs)
+        # Registra a permanência em cada status (ver TransicaoStatus)
+        if is_new or status_anterior != self.status:
+            TransicaoStatus.registrar(self, status_anterior or '', self.status)
 
     def __str__(self):
         return f"#{self.id} - {self.valor}"
@@ -93,6 +101,10 @@ class Despesa(models.Model):
     class Meta:
         verbose_name = "Workflow de Despesa"
         verbose_name_plural = "Workflow de Despesas"
+        indexes = [
+            # changelist e painéis de SLA: status + tipo + período de criação
+            models.Index(fields=['status', 'tipo_lancamento', 'data_criacao'], name='wf_status_tipo_criacao_idx'),
+        ]
         permissions = [
             ('view_cloudinary_storage', 'Pode acessar armazenamento Cloudinary'),
         ]
@@ -146,4 +158,146 @@ class LogWorkflow(models.Model):
     perfil_usuario = models.CharField(max_length=50)
     acao = models.CharField(max_length=100)
     data_hora = models.DateTimeField(auto_now_add=True)
-    observacao = models.TextField(blank=True)
\ No newline at end of file
+    observacao = models.TextField(blank=True)
+
+    class Meta:
+        indexes = [
+            # histórico de uma despesa em ordem cronológica (diálogo, SLA)
+            models.Index(fields=['despesa', 'data_hora'], name='wf_log_despesa_data_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        novo = self._state.adding
+        super().save(*args, **kwargs)
+        if novo:
+            DespesaParticipante.registrar(self.despesa_id, self.usuario_id, 'LOG')
+
+
+class DespesaParticipante(models.Model):
+    """
+    Índice de visibilidade do DespesaAdmin: quem já atuou na despesa (LOG) e o
+    responsável pelo lançamento extra que a gerou (EXTRA). Mantido por
+    LogWorkflow.save e pelos signals de extras; a lista de cada perfil vira um
+    `pk IN (SELECT despesa_id ...)` pelo índice único, sem join nem DISTINCT.
+    """
+    MOTIVOS = [
+        ('LOG', 'Atuou no workflow'),
+        ('EXTRA', 'Responsável pelo extra'),
+    ]
+
+    despesa = models.ForeignKey(Despesa, on_delete=models.CASCADE, related_name='participantes')
+    usuario = models.ForeignKey(UsuarioCustomizado, on_delete=models.CASCADE, related_name='despesas_participadas')
+    motivo = models.CharField(max_length=10, choices=MOTIVOS)
+
+    class Meta:
+        verbose_name = "Participante da Despesa"
+        verbose_name_plural = "Participantes da Despesa"
+        unique_together = ('usuario', 'motivo', 'despesa')
+
+    @classmethod
+    def registrar(cls, despesa_id, usuario_id, motivo):
+        cls.objects.bulk_create(
+            [cls(despesa_id=despesa_id, usuario_id=usuario_id, motivo=motivo)], ignore_conflicts=True
+        )
+
+    @classmethod
+    def definir_responsavel_extra(cls, despesa_id, usuario_id):
+        """O responsável do extra pode mudar na edição: fica só o atual."""
+        cls.objects.filter(despesa_id=despesa_id, motivo='EXTRA').exclude(usuario_id=usuario_id).delete()
+        cls.registrar(despesa_id, usuario_id, 'EXTRA')
+
+    @classmethod
+    def visiveis(cls, usuario, motivo):
+        return cls.objects.filter(usuario=usuario, motivo=motivo).values('despesa_id')
+
+
+STATUS_FINAIS = ('PAGO', 'CONFERIDO', 'CANCELADO')
+
+
+class TransicaoStatus(models.Model):
+    """
+    Permanência de uma despesa em um status: entrou em `status_para` vindo de
+    `status_de` e ficou lá de `entrou_em` até `saiu_em` (aberta enquanto nulo).
+    Gravada em Despesa.save; o histórico antigo vem de reconstruir_transicoes.
+    """
+    despesa = models.ForeignKey(Despesa, on_delete=models.CASCADE, related_name='transicoes')
+    status_de = models.CharField(max_length=20, choices=STATUS_WORKFLOW, blank=True, verbose_name="De")
+    status_para = models.CharField(max_length=20, choices=STATUS_WORKFLOW, verbose_name="Para")
+    entrou_em = models.DateTimeField(verbose_name="Entrou em")
+    saiu_em = models.DateTimeField(null=True, blank=True, verbose_name="Saiu em")
+    horas = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True, verbose_name="Horas no Status")
+
+    class Meta:
+        verbose_name = "Transição de Status"
+        verbose_name_plural = "Transições de Status"
+        ordering = ['entrou_em']
+        indexes = [
+            models.Index(fields=['despesa', 'entrou_em'], name='wf_trans_despesa_entrou_idx'),
+            models.Index(fields=['status_para', 'saiu_em'], name='wf_trans_status_saiu_idx'),
+        ]
+
+    def __str__(self):
+        return f"#{self.despesa_id}: {self.status_de or '—'} → {self.status_para}"
+
+    @staticmethod
+    def calcular_horas(inicio, fim):
+        return round(max((fim - inicio).total_seconds(), 0) / 3600, 2)
+
+    @classmethod
+    def registrar(cls, despesa, status_de, status_para, quando=None):
+        """Fecha a permanência aberta da despesa e abre a do novo status."""
+        quando = quando or timezone.now()
+        aberta = cls.objects.filter(despesa=despesa, saiu_em__isnull=True).order_by('-entrou_em').first()
+        if aberta:
+            aberta.saiu_em = quando
+            aberta.horas = cls.calcular_horas(aberta.entrou_em, quando)
+            aberta.save(update_fields=['saiu_em', 'horas'])
+        # Status final não acumula tempo: a linha já nasce fechada
+        final = status_para in STATUS_FINAIS
+        return cls.objects.create(
+            despesa=despesa, status_de=status_de, status_para=status_para, entrou_em=quando,
+            saiu_em=quando if final else None, horas=0 if final else None,
+        )
+
+
+class ArquivamentoComprovantes(models.Model):
+    """
+    Job de arquivamento de comprovantes (workflow/arquivamento.py): baixa os
+    arquivos das despesas selecionadas para um ZIP em disco e, depois de
+    conferido o ZIP, remove os originais do armazenamento. O progresso fica
+    aqui para a página de status acompanhar de qualquer worker.
+    """
+    STATUS = [
+        ('PENDENTE', 'Na fila'),
+        ('EXECUTANDO', 'Executando'),
+        ('CONCLUIDO', 'Concluído'),
+        ('ERRO', 'Erro'),
+    ]
+
+    usuario = models.ForeignKey(UsuarioCustomizado, on_delete=models.PROTECT, related_name='arquivamentos')
+    despesas = models.JSONField(default=list, verbose_name="Despesas (ids)")
+    status = models.CharField(max_length=20, choices=STATUS, default='PENDENTE')
+    total = models.PositiveIntegerField(default=0)
+    baixados = models.PositiveIntegerField(default=0)
+    removidos = models.PositiveIntegerField(default=0)
+    erros = models.PositiveIntegerField(default=0)
+    arquivo = models.CharField(max_length=255, blank=True, verbose_name="Arquivo ZIP")
+    mensagem = models.TextField(blank=True)
+    criado_em = models.DateTimeField(auto_now_add=True)
+    # Sinal de vida da thread: cada atualização de progresso grava a hora. Job sem
+    # sinal há ARQUIVAMENTO_SEM_SINAL segundos é dado como interrompido.
+    atualizado_em = models.DateTimeField(null=True, blank=True)
+    concluido_em = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = "Arquivamento de Comprovantes"
+        verbose_name_plural = "Arquivamentos de Comprovantes"
+        ordering = ['-criado_em']
+
+    def __str__(self):
+        return f"Arquivamento #{self.pk} ({self.get_status_display()})"
+
+    @property
+    def percentual(self):
+        # Downloads concluídos, com ou sem erro
+        return round(100 * (self.baixados + self.erros) / self.total) if self.total else 100
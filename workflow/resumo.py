@@ -0,0 +1,49 @@
+# workflow/resumo.py
+#
+# Resumo por status (quantidade e valor) exibido no topo da lista de despesas.
+# Calculado com um único GROUP BY sobre o queryset já filtrado da changelist e
+# guardado por pouco tempo por usuário + filtros. Qualquer save/delete de
+# Despesa troca a versão e torna todos os resumos guardados obsoletos.
+
+import hashlib
+import time
+
+from django.core.cache import cache
+from django.db.models import Count, Sum
+
+from core.grupos import grupos_do_usuario
+
+TEMPO_CACHE_RESUMO = 60
+CHAVE_VERSAO_RESUMO = 'wf_resumo_status:versao'
+
+# Parâmetros da changelist que não mudam o conjunto filtrado
+PARAMS_IGNORADOS = {'p', 'o', '_changelist_filters'}
+
+
+def resumo_por_status(queryset, request):
+    """Lista de dicts {status, total_valor, total_qtd} do queryset filtrado."""
+    chave = _chave(request)
+    resumo = cache.get(chave)
+    if resumo is None:
+        resumo = list(
+            queryset.order_by().values('status')
+            .annotate(total_valor=Sum('valor'), total_qtd=Count('pk'))
+            .order_by('status')
+        )
+        cache.set(chave, resumo, TEMPO_CACHE_RESUMO)
+    return resumo
+
+
+def invalidar_resumos():
+    cache.set(CHAVE_VERSAO_RESUMO, time.time_ns(), None)
+
+
+def _chave(request):
+    versao = cache.get_or_set(CHAVE_VERSAO_RESUMO, 0, None)
+    params = sorted(
+        (k, tuple(request.GET.getlist(k))) for k in request.GET if k not in PARAMS_IGNORADOS
+    )
+    # Os grupos entram na assinatura: mudam a visibilidade do mesmo usuário
+    assinatura = repr((sorted(grupos_do_usuario(request.user)), request.user.is_superuser, params))
+    digest = hashlib.md5(assinatura.encode()).hexdigest()
+    return f'wf_resumo_status:{versao}:{request.user.pk}:{digest}'
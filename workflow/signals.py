@@ -0,0 +1,13 @@
+# workflow/signals.py
+
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .models import Despesa
+from .resumo import invalidar_resumos
+
+
+@receiver(post_save, sender=Despesa)
+@receiver(post_delete, sender=Despesa)
+def despesa_alterada(sender, **kwargs):
+    invalidar_resumos()
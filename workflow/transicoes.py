@@ -0,0 +1,166 @@
+# workflow/transicoes.py
+#
+# Reconstrução do histórico de TransicaoStatus a partir do LogWorkflow, para
+# despesas criadas antes da tabela existir. O log só guarda o texto da ação,
+# então o status de origem é inferido (mesmas regras usadas antes pelo painel).
+
+from django.db import transaction
+from django.db.models import F, OuterRef, Q, Subquery
+
+from .models import Despesa, LogWorkflow, TransicaoStatus, STATUS_FINAIS
+
+# Mapa de ações → status que o WF ENTRA após aquela ação
+ACAO_PARA_STATUS = {
+    'Aprovou → RH':              'AGUARDANDO_RH',
+    'Aprovou → Financeiro':      'AGUARDANDO_FIN',
+    'Direcionou ao Operador':    'DIRECIONADO_OP',
+    'Retornou ao Administrativo':'AGUARDANDO_ADM',
+    'Devolveu ao Financeiro':    'AGUARDANDO_FIN',
+    'FINALIZOU (PAGO)':          'PAGO',
+    'CONFERIDO':                 'CONFERIDO',
+    'CANCELOU':                  'CANCELADO',
+}
+
+# Status em que o WF estava ANTES de cada ação de transição
+ACAO_STATUS_ANTERIOR = {
+    'Aprovou → RH':              'AGUARDANDO_ADM',
+    'Aprovou → Financeiro':      'AGUARDANDO_RH',
+    'Direcionou ao Operador':    'AGUARDANDO_FIN',
+    'Retornou ao Administrativo':'AGUARDANDO_RH',
+    'Devolveu ao Financeiro':    'DIRECIONADO_OP',
+    'FINALIZOU (PAGO)':          'DIRECIONADO_OP',
+    'CONFERIDO':                 'AGUARDANDO_FIN',
+    'CANCELOU':                  None,
+}
+
+# Status inicial padrão por tipo (quando não há como inferir)
+TIPO_STATUS_INICIAL = {
+    'CAIXINHA':   'AGUARDANDO_FIN',
+    'SOLICITACAO':'AGUARDANDO_RH',
+    'EXTRA':      'AGUARDANDO_FIN',
+}
+
+# De qual status o WF vinha antes de cada ação (usando perfil do executor como hint)
+PERFIL_STATUS_ORIGEM = {
+    'RH':          'AGUARDANDO_RH',
+    'Financeiro':  'AGUARDANDO_FIN',
+    'Operador':    'DIRECIONADO_OP',
+    'Administrativo': None,  # ambíguo — usa tipo
+    'Admin':       None,
+    'Solicitante': None,
+}
+
+
+def _inferir_status_anterior(log, tipo_lancamento):
+    """Infere o status em que o WF estava ANTES de 'Retornou ao Administrativo'."""
+    st = PERFIL_STATUS_ORIGEM.get(log.perfil_usuario)
+    if st:
+        return st
+    return TIPO_STATUS_INICIAL.get(tipo_lancamento, 'AGUARDANDO_FIN')
+
+
+def _status_inicial(despesa, logs_ordenados):
+    primeiro_log_transicao = next(
+        (log for log in logs_ordenados if log.acao in ACAO_PARA_STATUS), None
+    )
+    if primeiro_log_transicao:
+        acao = primeiro_log_transicao.acao
+        if acao == 'Retornou ao Administrativo':
+            # Usa perfil do executor para saber de onde voltou
+            return _inferir_status_anterior(primeiro_log_transicao, despesa.tipo_lancamento)
+        if ACAO_STATUS_ANTERIOR.get(acao):
+            return ACAO_STATUS_ANTERIOR[acao]
+        return TIPO_STATUS_INICIAL.get(despesa.tipo_lancamento, 'AGUARDANDO_RH')
+    # Sem transições: WF permanece no status atual desde a criação
+    if despesa.status not in STATUS_FINAIS:
+        return despesa.status
+    return TIPO_STATUS_INICIAL.get(despesa.tipo_lancamento, 'AGUARDANDO_RH')
+
+
+def transicoes_a_partir_dos_logs(despesa, logs_ordenados):
+    """Lista (não salva) de TransicaoStatus de uma despesa, reconstruída dos logs."""
+    # Fallback de entrada: data_criacao do registro quando não há "Criou Registro" no log
+    entrada = despesa.data_criacao
+    for log in logs_ordenados:
+        if log.acao in ACAO_PARA_STATUS:
+            break
+        if log.acao == 'Criou Registro':
+            entrada = log.data_hora
+    entrada = entrada or (logs_ordenados[0].data_hora if logs_ordenados else despesa.data_ultima_alteracao)
+    if not entrada:
+        return []
+
+    transicoes = []
+
+    def _entrar(status_de, status_para, quando):
+        if transicoes:
+            anterior = transicoes[-1]
+            anterior.saiu_em = max(quando, anterior.entrou_em)
+            anterior.horas = TransicaoStatus.calcular_horas(anterior.entrou_em, anterior.saiu_em)
+        final = status_para in STATUS_FINAIS
+        transicoes.append(TransicaoStatus(
+            despesa=despesa, status_de=status_de, status_para=status_para, entrou_em=quando,
+            saiu_em=quando if final else None, horas=0 if final else None,
+        ))
+
+    status_atual = _status_inicial(despesa, logs_ordenados)
+    _entrar('', status_atual, entrada)
+    for log in logs_ordenados:
+        novo_status = ACAO_PARA_STATUS.get(log.acao)
+        if novo_status:
+            _entrar(status_atual, novo_status, max(log.data_hora, transicoes[-1].entrou_em))
+            status_atual = novo_status
+
+    # Mudanças de status que não deixaram ação reconhecível no log
+    # (ex.: cancelamento automático ao excluir o pagamento de folha)
+    if status_atual != despesa.status:
+        quando = max(despesa.data_ultima_alteracao or entrada, transicoes[-1].entrou_em)
+        _entrar(status_atual, despesa.status, quando)
+    return transicoes
+
+
+def despesas_sem_historico():
+    """
+    Despesas cujo histórico não cobre os logs: sem nenhuma transição, ou com a
+    primeira transição posterior ao primeiro log (despesa anterior à tabela que
+    mudou de status depois dela e ganhou só as transições novas).
+    """
+    primeira_transicao = (
+        TransicaoStatus.objects.filter(despesa=OuterRef('pk'))
+        .order_by('entrou_em').values('entrou_em')[:1]
+    )
+    primeiro_log = (
+        LogWorkflow.objects.filter(despesa=OuterRef('pk'))
+        .order_by('data_hora').values('data_hora')[:1]
+    )
+    return (
+        Despesa.objects.annotate(_transicao=Subquery(primeira_transicao), _log=Subquery(primeiro_log))
+        .filter(Q(_transicao__isnull=True) | Q(_transicao__gt=F('_log')))
+    )
+
+
+def reconstruir_transicoes(despesas=None, lote=500):
+    """
+    Recria o histórico de TransicaoStatus das despesas informadas (padrão:
+    despesas_sem_historico). Retorna o total de linhas criadas.
+    """
+    if despesas is None:
+        despesas = despesas_sem_historico()
+    ids = list(despesas.order_by('pk').values_list('pk', flat=True))
+
+    criadas = 0
+    for i in range(0, len(ids), lote):
+        bloco = (
+            Despesa.objects.filter(pk__in=ids[i:i + lote])
+            .only('pk', 'status', 'tipo_lancamento', 'data_criacao', 'data_ultima_alteracao')
+            .prefetch_related('logs')
+        )
+        linhas = []
+        for despesa in bloco:
+            logs_ord = sorted(despesa.logs.all(), key=lambda l: l.data_hora)
+            linhas.extend(transicoes_a_partir_dos_logs(despesa, logs_ord))
+        with transaction.atomic():
+            TransicaoStatus.objects.filter(despesa_id__in=ids[i:i + lote]).delete()
+            TransicaoStatus.objects.bulk_create(linhas, batch_size=1000)
+        criadas += len(linhas)
+    return criadas
@@ -1,9 +1,9 @@
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
 from collections import Counter
 from django.shortcuts import render
 from django.contrib.admin.views.decorators import staff_member_required
 from django.db.models import Count, Sum, F
-from django.http import JsonResponse, HttpResponse
+from django.http import JsonResponse, HttpResponse, FileResponse, Http404
 from django.utils import timezone as tz
 
 
@@ -214,12 +214,30 @@ def exportar_coberturas_detalhado(request):
     return response
 
 
+def _intervalo_criacao(data_inicio, data_fim):
+    """
+    Filtro de data_criacao entre duas datas (inclusive; None = sem limite) como
+    intervalo de datetimes no fuso atual — ao contrário de data_criacao__date,
+    usa o índice.
+    """
+    import datetime
+    filtro = {}
+    if data_inicio:
+        filtro['data_criacao__gte'] = tz.make_aware(datetime.datetime.combine(data_inicio, datetime.time.min))
+    if data_fim:
+        filtro['data_criacao__lt'] = tz.make_aware(
+            datetime.datetime.combine(data_fim + datetime.timedelta(days=1), datetime.time.min)
+        )
+    return filtro
+
+
 @staff_member_required
 def painel_sla(request):
     import datetime, calendar
-    from .models import Despesa, ConfiguracaoSLA, STATUS_WORKFLOW
+    from .models import Despesa, ConfiguracaoSLA, STATUS_WORKFLOW, TIPO_LANCAMENTO_CHOICES
     from django.contrib import admin as dj_admin
-    from django.db.models import Count, F
+    from django.db.models import Count, F, Q, Case, When, Value, CharField, DurationField, ExpressionWrapper
+    from core.models import UsuarioCustomizado
 
     STATUS_FINAIS     = {'PAGO', 'CONFERIDO', 'CANCELADO'}
     STATUS_FINAIS_OK  = {'PAGO', 'CONFERIDO'}
@@ -231,9 +249,10 @@ def painel_sla(request):
         'AGUARDANDO_FIN':       'Financeiro',
         'DIRECIONADO_OP':       'Operador',
     }
+    TIPO_LABELS = dict(TIPO_LANCAMENTO_CHOICES)
 
     agora = tz.now()
-    hoje  = agora.date()
+    hoje  = tz.localdate()
 
     # ── Período selecionado (default = mês atual até hoje) ──────────────
     filtro_tipo = request.GET.get('tipo', '')
@@ -254,17 +273,22 @@ def painel_sla(request):
     sla_map    = {s.status: s.total_horas for s in ConfiguracaoSLA.objects.filter(ativo=True)}
     soma_sla_h = sum(sla_map.values()) if sla_map else None
 
-    # ── Helpers ──────────────────────────────────────────────────────────
-    def horas_vida(d):
-        fim = d.data_ultima_alteracao if d.status in STATUS_FINAIS_OK else agora
-        if not d.data_criacao:
-            return 0
-        return (fim - d.data_criacao).total_seconds() / 3600
-
-    def dentro_sla(d):
-        if soma_sla_h is None:
-            return True
-        return horas_vida(d) <= soma_sla_h
+    # ── Classificação no banco ───────────────────────────────────────────
+    # Tempo de vida: até a última alteração se finalizado (PAGO/CONFERIDO),
+    # senão até agora — aí basta comparar data_criacao com (agora - limite).
+    # Sem data de criação conta como dentro do SLA.
+    duracao_final = ExpressionWrapper(F('data_ultima_alteracao') - F('data_criacao'), output_field=DurationField())
+    q_final_ok = Q(status__in=STATUS_FINAIS_OK)
+    if soma_sla_h is None:
+        q_atendido = q_final_ok
+        q_extrapolado = Q(pk__isnull=True)  # nunca
+    else:
+        limite = datetime.timedelta(hours=soma_sla_h)
+        q_atendido = q_final_ok & (Q(duracao_final__lte=limite) | Q(data_criacao__isnull=True))
+        q_extrapolado = (
+            (q_final_ok & Q(duracao_final__gt=limite))
+            | (~q_final_ok & Q(data_criacao__lt=agora - limite))
+        )
 
     def pct_delta(atual, ant):
         if ant == 0:
@@ -272,23 +296,36 @@ def painel_sla(request):
         return round((atual - ant) / ant * 100, 1)
 
     # ── Base QS ──────────────────────────────────────────────────────────
-    qs_all = Despesa.objects.select_related('solicitante', 'motivo_ausencia')
+    # Cada despesa é classificada uma única vez (sla) e o período vira um
+    # pequeno "cubo" agrupado; cards e gráficos saem dele em Python.
+    qs_all = Despesa.objects.order_by()
     if filtro_tipo:
         qs_all = qs_all.filter(tipo_lancamento=filtro_tipo)
-
-    def metrics(qs):
-        lst = list(qs)
-        total      = len(lst)
-        abertos    = sum(1 for d in lst if d.status in STATUS_ABERTOS)
-        atendidos  = sum(1 for d in lst if d.status in STATUS_FINAIS_OK and dentro_sla(d))
-        extrapol   = sum(1 for d in lst if not dentro_sla(d))
+    qs_all = qs_all.alias(duracao_final=duracao_final).annotate(sla=Case(
+        When(q_extrapolado, then=Value('EXTRAPOLADO')),
+        When(q_atendido, then=Value('ATENDIDO')),
+        default=Value(''),
+        output_field=CharField(),
+    ))
+
+    def cubo(qs, *dimensoes):
+        return list(qs.values('status', 'sla', *dimensoes).annotate(qtd=Count('id')))
+
+    def metrics(linhas):
+        total      = sum(r['qtd'] for r in linhas)
+        abertos    = sum(r['qtd'] for r in linhas if r['status'] in STATUS_ABERTOS)
+        atendidos  = sum(r['qtd'] for r in linhas if r['sla'] == 'ATENDIDO')
+        extrapol   = sum(r['qtd'] for r in linhas if r['sla'] == 'EXTRAPOLADO')
         return total, abertos, atendidos, extrapol
 
-    qs_per = qs_all.filter(data_criacao__date__gte=data_inicio,     data_criacao__date__lte=data_fim)
-    qs_ant = qs_all.filter(data_criacao__date__gte=data_inicio_ant, data_criacao__date__lte=data_fim_ant)
+    linhas_per = cubo(
+        qs_all.filter(**_intervalo_criacao(data_inicio, data_fim)),
+        'tipo_lancamento', 'motivo_ausencia__nome', 'solicitante_id',
+    )
+    linhas_ant = cubo(qs_all.filter(**_intervalo_criacao(data_inicio_ant, data_fim_ant)))
 
-    tot,  ab,  atd,  ext  = metrics(qs_per)
-    tot_a, ab_a, atd_a, ext_a = metrics(qs_ant)
+    tot,  ab,  atd,  ext  = metrics(linhas_per)
+    tot_a, ab_a, atd_a, ext_a = metrics(linhas_ant)
 
     cards = {
         'aberto':      {'v': ab,  'ant': ab_a,  'delta': pct_delta(ab,  ab_a),  'icon':'fas fa-clock',        'cor':'#e67e22'},
@@ -299,48 +336,40 @@ def painel_sla(request):
 
     pct_sla_gauge = round(atd / tot * 100) if tot else 0
 
+    def ranking(linhas, rotulo, limite):
+        contagem = {}
+        for r in linhas:
+            nome = rotulo(r)
+            contagem[nome] = contagem.get(nome, 0) + r['qtd']
+        return [
+            {'nome': k, 'qtd': v}
+            for k, v in sorted(contagem.items(), key=lambda x: (-x[1], x[0]))
+        ][:limite]
+
+    def motivo(r, maiusculo=False):
+        """Nome do motivo; sem motivo, usa o tipo de lançamento como rótulo."""
+        if r['motivo_ausencia__nome'] is not None:
+            return r['motivo_ausencia__nome']
+        nome = TIPO_LABELS.get(r['tipo_lancamento'], r['tipo_lancamento'])
+        return nome.upper() if maiusculo else nome
+
     # ── Gráfico 1: Em aberto por motivo ──────────────────────────────────
-    qs_aberto = qs_per.filter(status__in=STATUS_ABERTOS)
-    _motivo_count = {}
-    for d in qs_aberto.select_related('motivo_ausencia'):
-        nome = (d.motivo_ausencia.nome if d.motivo_ausencia_id
-                else d.get_tipo_lancamento_display().upper())
-        _motivo_count[nome] = _motivo_count.get(nome, 0) + 1
-    aberto_por_motivo = [
-        {'nome': k, 'qtd': v}
-        for k, v in sorted(_motivo_count.items(), key=lambda x: -x[1])
-    ][:12]
+    linhas_aberto = [r for r in linhas_per if r['status'] in STATUS_ABERTOS]
+    aberto_por_motivo = ranking(linhas_aberto, lambda r: motivo(r, maiusculo=True), 12)
 
     # ── Gráfico 2: Em aberto por aprovador (status) ──────────────────────
-    aprov_raw = (
-        qs_aberto
-        .values('status')
-        .annotate(qtd=Count('id'))
-        .order_by('-qtd')
-    )
-    aberto_por_aprovador = [
-        {'nome': STATUS_APROVADOR.get(r['status'], r['status']), 'qtd': r['qtd']}
-        for r in aprov_raw
-    ]
+    aberto_por_aprovador = ranking(linhas_aberto, lambda r: STATUS_APROVADOR.get(r['status'], r['status']), None)
 
     # ── Gráfico 3: SLA atendido por solicitante ───────────────────────────
-    atd_user = {}
-    for d in qs_per:
-        if d.status in STATUS_FINAIS_OK and dentro_sla(d):
-            nome = d.solicitante.get_full_name() or d.solicitante.username
-            atd_user[nome] = atd_user.get(nome, 0) + 1
-    atd_por_usuario = sorted(atd_user.items(), key=lambda x: -x[1])[:10]
-    atd_por_usuario = [{'nome': k, 'qtd': v} for k, v in atd_por_usuario]
+    linhas_atd = [r for r in linhas_per if r['sla'] == 'ATENDIDO']
+    nomes = {
+        u.pk: u.get_full_name() or u.username
+        for u in UsuarioCustomizado.objects.filter(pk__in={r['solicitante_id'] for r in linhas_atd})
+    }
+    atd_por_usuario = ranking(linhas_atd, lambda r: nomes[r['solicitante_id']], 10)
 
     # ── Gráfico 4: SLA extrapolado por motivo ────────────────────────────
-    ext_motivo = {}
-    for d in qs_per:
-        if not dentro_sla(d):
-            nome = (d.motivo_ausencia.nome if d.motivo_ausencia_id
-                    else d.get_tipo_lancamento_display())
-            ext_motivo[nome] = ext_motivo.get(nome, 0) + 1
-    ext_por_motivo = sorted(ext_motivo.items(), key=lambda x: -x[1])[:12]
-    ext_por_motivo = [{'nome': k, 'qtd': v} for k, v in ext_por_motivo]
+    ext_por_motivo = ranking([r for r in linhas_per if r['sla'] == 'EXTRAPOLADO'], motivo, 12)
 
     # max para escala das barras
     def _max(lst): return max((r['qtd'] for r in lst), default=1)
@@ -372,9 +401,177 @@ def painel_sla(request):
 
 
 # ── versão tabela detalhada (mantida para acesso direto) ─────────────────────
+# Etapas que nos interessam exibir, em ordem de fluxo
+ETAPAS_SLA = [
+    ('AGUARDANDO_ADM', 'ADM', '#3498db'),
+    ('AGUARDANDO_RH',  'RH',  '#27ae60'),
+    ('AGUARDANDO_FIN', 'FIN', '#f39c12'),
+    ('DIRECIONADO_OP', 'OP',  '#8e44ad'),
+    ('AGUARDANDO_COMERCIAL', 'COM', '#16a085'),
+]
+
+# Ordenações da tabela de SLA: (campo, decrescente). O pk no fim desempata,
+# o que permite paginar por chave (keyset) em vez de OFFSET.
+ORDENACOES_SLA = {
+    # em atraso primeiro, depois a vencer, etc.; dentro de cada situação, o mais antigo primeiro
+    'situacao': [('ordem_situacao', False), ('chave_aberto', False), ('chave_fechado', True), ('pk', True)],
+    # vencimento do prazo do status atual (o mais atrasado primeiro; sem prazo no fim)
+    'prazo':    [('prazo_limite', False), ('pk', True)],
+}
+ORDENACAO_SLA_LABELS = [('situacao', 'Situação SLA'), ('prazo', 'Vencimento do prazo')]
+
+TAMANHO_PAGINA_SLA = 50
+
+
+def _data_do_filtro(valor):
+    """Data AAAA-MM-DD de um parâmetro GET, ou None se vazia ou inválida."""
+    try:
+        return datetime.strptime(valor, '%Y-%m-%d').date() if valor else None
+    except ValueError:
+        return None
+
+
+def _sla_queryset(params, sla_map, agora):
+    """
+    Despesas com os filtros da tabela de SLA, anotadas com a situação SLA, o
+    tempo considerado e as chaves de ordenação — tudo calculado no banco.
+    """
+    from .models import Despesa, STATUS_FINAIS
+    from django.db.models import Case, When, Value, CharField, IntegerField, DateTimeField, DurationField, ExpressionWrapper
+    from django.db.models.functions import Coalesce
+
+    soma_sla = sum(sla_map.values()) if sla_map else None
+
+    qs = Despesa.objects.select_related('solicitante', 'fornecedor', 'filial')
+    if params.get('tipo'):
+        qs = qs.filter(tipo_lancamento=params['tipo'])
+    if params.get('status'):
+        qs = qs.filter(status=params['status'])
+    # Data inválida na URL é ignorada, como nos outros filtros
+    data_de = _data_do_filtro(params.get('data_de'))
+    data_ate = _data_do_filtro(params.get('data_ate'))
+    if data_de or data_ate:
+        qs = qs.filter(**_intervalo_criacao(data_de, data_ate))
+
+    # Fechados: tempo de vida (criação → última alteração) contra a soma dos prazos.
+    # Abertos: tempo no status atual (última alteração → agora) contra o prazo do status.
+    duracao_total = Coalesce(
+        ExpressionWrapper(F('data_ultima_alteracao') - F('data_criacao'), output_field=DurationField()),
+        Value(timedelta(0)),
+    )
+    tempo_no_status = ExpressionWrapper(Value(agora) - F('data_ultima_alteracao'), output_field=DurationField())
+
+    regras = []
+    prazos = []
+    if soma_sla:
+        regras.append(When(status__in=STATUS_FINAIS, duracao_total__gt=timedelta(hours=soma_sla),
+                           then=Value('FECHADO_ATRASO')))
+    regras.append(When(status__in=STATUS_FINAIS, then=Value('FECHADO_OK')))
+    for status, prazo_h in sla_map.items():
+        regras.append(When(status=status, data_ultima_alteracao__lte=agora - timedelta(hours=prazo_h),
+                           then=Value('EM_ATRASO')))
+        regras.append(When(status=status, data_ultima_alteracao__lte=agora - timedelta(hours=prazo_h * 0.8),
+                           then=Value('A_VENCER')))
+        prazos.append(When(status=status, then=F('data_ultima_alteracao') + timedelta(hours=prazo_h)))
+
+    ordem = {'EM_ATRASO': 0, 'FECHADO_ATRASO': 1, 'A_VENCER': 2, 'FECHADO_OK': 3, 'NO_PRAZO': 4}
+    sem_data = Value(datetime(1970, 1, 1, tzinfo=timezone.utc))
+    sem_prazo = Value(datetime(2999, 12, 31, tzinfo=timezone.utc))
+    return qs.alias(duracao_total=duracao_total).annotate(
+        situacao=Case(*regras, default=Value('NO_PRAZO'), output_field=CharField()),
+        tempo=Case(When(status__in=STATUS_FINAIS, then=F('duracao_total')), default=tempo_no_status,
+                   output_field=DurationField()),
+        ordem_situacao=Case(*[When(situacao=s, then=Value(o)) for s, o in ordem.items()],
+                            output_field=IntegerField()),
+        # Abertos: mais tempo no status = última alteração mais antiga. Fechados: maior duração.
+        chave_aberto=Case(When(status__in=STATUS_FINAIS, then=sem_data), default=F('data_ultima_alteracao'),
+                          output_field=DateTimeField()),
+        chave_fechado=Case(When(status__in=STATUS_FINAIS, then=F('duracao_total')), default=Value(timedelta(0)),
+                           output_field=DurationField()),
+        prazo_limite=Case(*prazos, default=sem_prazo, output_field=DateTimeField()) if prazos else sem_prazo,
+    )
+
+
+def _filtro_keyset(chaves, valores):
+    """Q das linhas depois de `valores` na ordenação `chaves` (comparação lexicográfica)."""
+    from django.db.models import Q
+    filtro = Q(pk__in=[])
+    for i, (campo, desc) in enumerate(chaves):
+        termo = Q(**{f"{campo}__{'lt' if desc else 'gt'}": valores[i]})
+        for j, (anterior, _) in enumerate(chaves[:i]):
+            termo &= Q(**{anterior: valores[j]})
+        filtro |= termo
+    return filtro
+
+
+def _cursor_sla(obj, chaves):
+    from django.core import signing
+    valores = []
+    for campo, _ in chaves:
+        v = getattr(obj, campo)
+        if isinstance(v, datetime):
+            v = ['dt', v.isoformat()]
+        elif isinstance(v, timedelta):
+            v = ['td', v // timedelta(microseconds=1)]
+        valores.append(v)
+    return signing.dumps(valores, salt='painel_sla_tabela')
+
+
+def _valores_do_cursor(cursor, chaves):
+    from django.core import signing
+    try:
+        valores = signing.loads(cursor, salt='painel_sla_tabela')
+    except signing.BadSignature:
+        return None
+    if len(valores) != len(chaves):
+        return None
+    convertidos = []
+    for v in valores:
+        if isinstance(v, list) and v[0] == 'dt':
+            v = datetime.fromisoformat(v[1])
+        elif isinstance(v, list) and v[0] == 'td':
+            v = timedelta(microseconds=v[1])
+        convertidos.append(v)
+    return convertidos
+
+
+def _tempos_por_etapa(ids, agora):
+    """
+    {despesa_id: {status: horas}} somado em TransicaoStatus (período aberto até
+    agora). Inclui os status fora de ETAPAS_SLA: a barra só desenha as etapas,
+    mas a largura de cada uma é proporcional ao tempo total da despesa.
+    """
+    from .models import TransicaoStatus
+    from django.db.models import Q, Max
+
+    tempos = {}
+    for r in (TransicaoStatus.objects
+              .filter(despesa_id__in=ids)
+              .order_by().values('despesa_id', 'status_para')
+              .annotate(horas=Sum('horas'), aberta_desde=Max('entrou_em', filter=Q(saiu_em__isnull=True)))):
+        horas = float(r['horas'] or 0)
+        if r['aberta_desde']:
+            # Período atual ainda em aberto
+            horas += (agora - r['aberta_desde']).total_seconds() / 3600
+        tempos.setdefault(r['despesa_id'], {})[r['status_para']] = horas
+    return tempos
+
+
+def _medidas_sla(despesa, sla_map):
+    """(tempo_h, prazo_h, excesso_h) de uma despesa anotada por _sla_queryset."""
+    from .models import STATUS_FINAIS
+
+    tempo_h = despesa.tempo.total_seconds() / 3600 if despesa.tempo else 0
+    if despesa.status in STATUS_FINAIS:
+        soma_sla = sum(sla_map.values()) if sla_map else None
+        return tempo_h, soma_sla, (max(0, tempo_h - soma_sla) if soma_sla else 0)
+    prazo_h = sla_map.get(despesa.status)
+    return tempo_h, prazo_h, (tempo_h - prazo_h if despesa.situacao == 'EM_ATRASO' else 0)
+
+
 @staff_member_required
 def painel_sla_tabela(request):
-    from .models import Despesa, ConfiguracaoSLA, LogWorkflow, STATUS_WORKFLOW
+    from .models import ConfiguracaoSLA, STATUS_WORKFLOW, STATUS_FINAIS
     from django.contrib import admin as dj_admin
 
     # Carrega configurações de SLA ativas
@@ -383,7 +580,6 @@ def painel_sla_tabela(request):
         for s in ConfiguracaoSLA.objects.filter(ativo=True)
     }
 
-    STATUS_FINAIS = {'PAGO', 'CONFERIDO', 'CANCELADO'}
     STATUS_LABELS = dict(STATUS_WORKFLOW)
 
     agora = tz.now()
@@ -394,56 +590,31 @@ def painel_sla_tabela(request):
     filtro_sla    = request.GET.get('sla', '')   # NO_PRAZO | A_VENCER | EM_ATRASO | FECHADO_ATRASO | FECHADO_OK
     filtro_de     = request.GET.get('data_de', '')
     filtro_ate    = request.GET.get('data_ate', '')
+    ordenacao     = request.GET.get('ordem', 'situacao')
+    if ordenacao not in ORDENACOES_SLA:
+        ordenacao = 'situacao'
+    chaves = ORDENACOES_SLA[ordenacao]
 
-    qs = Despesa.objects.select_related('solicitante', 'fornecedor', 'filial').prefetch_related('logs')
-    if filtro_tipo:
-        qs = qs.filter(tipo_lancamento=filtro_tipo)
-    if filtro_status:
-        qs = qs.filter(status=filtro_status)
-    if filtro_de:
-        qs = qs.filter(data_criacao__date__gte=filtro_de)
-    if filtro_ate:
-        qs = qs.filter(data_criacao__date__lte=filtro_ate)
-
-    # Mapa de ações → status que o WF ENTRA após aquela ação
-    ACAO_PARA_STATUS = {
-        'Aprovou → RH':              'AGUARDANDO_RH',
-        'Aprovou → Financeiro':      'AGUARDANDO_FIN',
-        'Direcionou ao Operador':    'DIRECIONADO_OP',
-        'Retornou ao Administrativo':'AGUARDANDO_ADM',
-        'Devolveu ao Financeiro':    'AGUARDANDO_FIN',
-        'FINALIZOU (PAGO)':          'PAGO',
-        'CONFERIDO':                 'CONFERIDO',
-        'CANCELOU':                  'CANCELADO',
-    }
+    qs = _sla_queryset(request.GET, sla_map, agora)
 
-    # Status em que o WF estava ANTES de cada ação de transição
-    ACAO_STATUS_ANTERIOR = {
-        'Aprovou → RH':              'AGUARDANDO_ADM',
-        'Aprovou → Financeiro':      'AGUARDANDO_RH',
-        'Direcionou ao Operador':    'AGUARDANDO_FIN',
-        'Retornou ao Administrativo':'AGUARDANDO_RH',
-        'Devolveu ao Financeiro':    'DIRECIONADO_OP',
-        'FINALIZOU (PAGO)':          'DIRECIONADO_OP',
-        'CONFERIDO':                 'AGUARDANDO_FIN',
-        'CANCELOU':                  None,
-    }
+    contadores = {'NO_PRAZO': 0, 'A_VENCER': 0, 'EM_ATRASO': 0, 'FECHADO_ATRASO': 0, 'FECHADO_OK': 0}
+    for r in qs.order_by().values('situacao').annotate(qtd=Count('id')):
+        contadores[r['situacao']] = r['qtd']
 
-    # Status inicial padrão por tipo (quando não há como inferir)
-    TIPO_STATUS_INICIAL = {
-        'CAIXINHA':   'AGUARDANDO_FIN',
-        'SOLICITACAO':'AGUARDANDO_RH',
-        'EXTRA':      'AGUARDANDO_FIN',
-    }
+    if filtro_sla:
+        qs = qs.filter(situacao=filtro_sla)
+    qs = qs.order_by(*[f"-{campo}" if desc else campo for campo, desc in chaves])
 
-    # Etapas que nos interessam exibir, em ordem de fluxo
-    ETAPAS_EXIBIR = [
-        ('AGUARDANDO_ADM', 'ADM', '#3498db'),
-        ('AGUARDANDO_RH',  'RH',  '#27ae60'),
-        ('AGUARDANDO_FIN', 'FIN', '#f39c12'),
-        ('DIRECIONADO_OP', 'OP',  '#8e44ad'),
-        ('AGUARDANDO_COMERCIAL', 'COM', '#16a085'),
-    ]
+    # Paginação por chave: a próxima página começa depois da última linha desta
+    cursor = request.GET.get('apos', '')
+    valores = _valores_do_cursor(cursor, chaves) if cursor else None
+    if valores:
+        qs = qs.filter(_filtro_keyset(chaves, valores))
+    despesas = list(qs[:TAMANHO_PAGINA_SLA + 1])
+    proximo_cursor = _cursor_sla(despesas[TAMANHO_PAGINA_SLA - 1], chaves) if len(despesas) > TAMANHO_PAGINA_SLA else ''
+    despesas = despesas[:TAMANHO_PAGINA_SLA]
+
+    tempos_por_despesa = _tempos_por_etapa([d.pk for d in despesas], agora)
 
     def _fmt_horas_curto(h):
         total_min = int(round(h * 60))
@@ -455,72 +626,11 @@ def painel_sla_tabela(request):
             return f"{horas}h{minutos:02d}m" if minutos else f"{horas}h"
         return f"{minutos}m"
 
-    # De qual status o WF vinha antes de cada ação (usando perfil do executor como hint)
-    PERFIL_STATUS_ORIGEM = {
-        'RH':          'AGUARDANDO_RH',
-        'Financeiro':  'AGUARDANDO_FIN',
-        'Operador':    'DIRECIONADO_OP',
-        'Administrativo': None,  # ambíguo — usa tipo
-        'Admin':       None,
-        'Solicitante': None,
-    }
-
-    def _inferir_status_anterior(log, tipo_lancamento):
-        """Infere o status em que o WF estava ANTES de 'Retornou ao Administrativo'."""
-        st = PERFIL_STATUS_ORIGEM.get(log.perfil_usuario)
-        if st:
-            return st
-        return TIPO_STATUS_INICIAL.get(tipo_lancamento, 'AGUARDANDO_FIN')
-
-    def calcular_tempo_por_etapa(despesa, logs_ordenados, agora):
-        """Retorna dict {status: horas} com tempo acumulado em cada etapa."""
-        tempos = {}
-
-        # Determinar status inicial a partir da primeira ação de transição
-        primeiro_log_transicao = next(
-            (log for log in logs_ordenados if log.acao in ACAO_PARA_STATUS), None
-        )
-        if primeiro_log_transicao:
-            acao = primeiro_log_transicao.acao
-            if acao == 'Retornou ao Administrativo':
-                # Usa perfil do executor para saber de onde voltou
-                status_atual = _inferir_status_anterior(primeiro_log_transicao, despesa.tipo_lancamento)
-            elif ACAO_STATUS_ANTERIOR.get(acao):
-                status_atual = ACAO_STATUS_ANTERIOR[acao]
-            else:
-                status_atual = TIPO_STATUS_INICIAL.get(despesa.tipo_lancamento, 'AGUARDANDO_RH')
-        else:
-            # Sem transições: WF permanece no status atual desde a criação
-            status_atual = despesa.status if despesa.status not in STATUS_FINAIS \
-                           else TIPO_STATUS_INICIAL.get(despesa.tipo_lancamento, 'AGUARDANDO_RH')
-
-        # Fallback de entrada: data_criacao do registro quando não há "Criou Registro" no log
-        entrada = despesa.data_criacao
-
-        for log in logs_ordenados:
-            if log.acao == 'Criou Registro':
-                entrada = log.data_hora
-                continue
-            novo_status = ACAO_PARA_STATUS.get(log.acao)
-            if novo_status:
-                if entrada and log.data_hora > entrada:
-                    horas = (log.data_hora - entrada).total_seconds() / 3600
-                    tempos[status_atual] = tempos.get(status_atual, 0) + horas
-                status_atual = novo_status
-                entrada = log.data_hora
-
-        # Período atual ainda em aberto
-        if entrada and status_atual not in STATUS_FINAIS:
-            horas = (agora - entrada).total_seconds() / 3600
-            tempos[status_atual] = tempos.get(status_atual, 0) + horas
-
-        return tempos
-
     def fmt_etapas(tempos):
         """Retorna lista de dicts para renderizar a barra de timeline por etapa."""
         total_h = sum(tempos.values()) or 1
         partes = []
-        for st, label, cor in ETAPAS_EXIBIR:
+        for st, label, cor in ETAPAS_SLA:
             h = tempos.get(st, 0)
             if h < 0.01:
                 continue
@@ -533,92 +643,48 @@ def painel_sla_tabela(request):
             })
         return partes
 
-    resultados = []
-    contadores = {'NO_PRAZO': 0, 'A_VENCER': 0, 'EM_ATRASO': 0, 'FECHADO_ATRASO': 0, 'FECHADO_OK': 0}
-
-    for despesa in qs:
-        logs_ord = sorted(despesa.logs.all(), key=lambda l: l.data_hora)
-        tempo_etapas = calcular_tempo_por_etapa(despesa, logs_ord, agora)
-        etapas_fmt = fmt_etapas(tempo_etapas)
-
-        status_atual = despesa.status
-        is_final = status_atual in STATUS_FINAIS
-
-        if is_final:
-            # Tempo total de vida: criação → última alteração
-            if despesa.data_criacao and despesa.data_ultima_alteracao:
-                tempo_total_h = (despesa.data_ultima_alteracao - despesa.data_criacao).total_seconds() / 3600
-            else:
-                tempo_total_h = 0
-            soma_sla = sum(sla_map.values()) if sla_map else None
-            if soma_sla:
-                situacao = 'FECHADO_OK' if tempo_total_h <= soma_sla else 'FECHADO_ATRASO'
-            else:
-                situacao = 'FECHADO_OK'
-            tempo_display = tempo_total_h
-            prazo_ref = soma_sla
-            excesso_h = max(0, tempo_total_h - soma_sla) if soma_sla else 0
-        else:
-            # Tempo no status atual: última alteração → agora
-            prazo_h = sla_map.get(status_atual)
-            if despesa.data_ultima_alteracao:
-                tempo_no_status_h = (agora - despesa.data_ultima_alteracao).total_seconds() / 3600
-            else:
-                tempo_no_status_h = 0
-
-            tempo_display = tempo_no_status_h
-            prazo_ref = prazo_h
-            excesso_h = 0
-
-            if prazo_h is None:
-                situacao = 'NO_PRAZO'
-            elif tempo_no_status_h >= prazo_h:
-                situacao = 'EM_ATRASO'
-                excesso_h = tempo_no_status_h - prazo_h
-            elif tempo_no_status_h >= prazo_h * 0.8:
-                situacao = 'A_VENCER'
-            else:
-                situacao = 'NO_PRAZO'
-
-        contadores[situacao] += 1
-
-        if filtro_sla and situacao != filtro_sla:
-            continue
-
-        def fmt_horas(h):
-            if h is None:
-                return '—'
-            h = int(h)
-            d, hr = divmod(h, 24)
-            partes = []
-            if d: partes.append(f"{d}d")
-            if hr: partes.append(f"{hr}h")
-            return " ".join(partes) or "< 1h"
+    def fmt_horas(h):
+        if h is None:
+            return '—'
+        h = int(h)
+        d, hr = divmod(h, 24)
+        partes = []
+        if d: partes.append(f"{d}d")
+        if hr: partes.append(f"{hr}h")
+        return " ".join(partes) or "< 1h"
 
+    resultados = []
+    for despesa in despesas:
+        tempo_h, prazo_ref, excesso_h = _medidas_sla(despesa, sla_map)
         resultados.append({
             'despesa': despesa,
-            'situacao': situacao,
-            'tempo_h': tempo_display,
-            'tempo_fmt': fmt_horas(tempo_display),
+            'situacao': despesa.situacao,
+            'tempo_h': tempo_h,
+            'tempo_fmt': fmt_horas(tempo_h),
             'prazo_h': prazo_ref,
             'prazo_fmt': fmt_horas(prazo_ref),
             'excesso_fmt': fmt_horas(excesso_h) if excesso_h else '',
-            'status_label': STATUS_LABELS.get(status_atual, status_atual),
-            'is_final': is_final,
-            'etapas_fmt': etapas_fmt,
+            'status_label': STATUS_LABELS.get(despesa.status, despesa.status),
+            'is_final': despesa.status in STATUS_FINAIS,
+            'etapas_fmt': fmt_etapas(tempos_por_despesa.get(despesa.pk, {})),
         })
 
-    # Ordena: em atraso primeiro, depois a vencer, etc.
-    ordem = {'EM_ATRASO': 0, 'FECHADO_ATRASO': 1, 'A_VENCER': 2, 'FECHADO_OK': 3, 'NO_PRAZO': 4}
-    resultados.sort(key=lambda r: (ordem.get(r['situacao'], 9), -(r['tempo_h'] or 0)))
-
     total = sum(contadores.values())
     pct = lambda v: round(v / total * 100) if total else 0
 
+    params_pagina = request.GET.copy()
+    params_pagina.pop('apos', None)
+
     context = {
         **dj_admin.site.each_context(request),
         'title': 'Painel de SLA — Workflow',
         'resultados': resultados,
+        'total_filtrado': contadores[filtro_sla] if filtro_sla else total,
+        'proximo_cursor': proximo_cursor,
+        'pagina_inicial': not valores,
+        'params_pagina': params_pagina.urlencode(),
+        'ordenacao': ordenacao,
+        'ordenacao_choices': ORDENACAO_SLA_LABELS,
         'contadores': contadores,
         'total': total,
         'pct_no_prazo':       pct(contadores['NO_PRAZO']),
@@ -639,6 +705,110 @@ def painel_sla_tabela(request):
     return render(request, 'admin/workflow/painel_sla_tabela.html', context)
 
 
+SITUACAO_SLA_LABELS = {
+    'NO_PRAZO': 'No Prazo',
+    'A_VENCER': 'A Vencer',
+    'EM_ATRASO': 'Em Atraso',
+    'FECHADO_OK': 'Fechado no Prazo',
+    'FECHADO_ATRASO': 'Fechado com Atraso',
+}
+
+
+def _linhas_exportacao_sla(qs, sla_map, agora, lote=2000):
+    """Gera as linhas da exportação lendo o queryset em blocos (.iterator), sem carregar tudo."""
+    from .models import STATUS_WORKFLOW, TIPO_LANCAMENTO_CHOICES
+
+    status_labels = dict(STATUS_WORKFLOW)
+    tipo_labels = dict(TIPO_LANCAMENTO_CHOICES)
+    arred = lambda h: round(h, 2) if h is not None else ''
+
+    def _bloco(despesas):
+        tempos = _tempos_por_etapa([d.pk for d in despesas], agora)
+        for d in despesas:
+            tempo_h, prazo_h, excesso_h = _medidas_sla(d, sla_map)
+            por_etapa = tempos.get(d.pk, {})
+            yield [
+                d.pk,
+                tipo_labels.get(d.tipo_lancamento, d.tipo_lancamento),
+                d.solicitante.get_full_name() or d.solicitante.username,
+                d.fornecedor.razao_social if d.fornecedor else '',
+                d.filial.nome if d.filial else '',
+                status_labels.get(d.status, d.status),
+                tz.localtime(d.data_criacao).strftime('%d/%m/%Y %H:%M') if d.data_criacao else '',
+                arred(tempo_h),
+                arred(prazo_h),
+                arred(excesso_h),
+                SITUACAO_SLA_LABELS.get(d.situacao, d.situacao),
+            ] + [arred(por_etapa.get(st, 0)) for st, _, _ in ETAPAS_SLA]
+
+    despesas = []
+    for despesa in qs.iterator(chunk_size=lote):
+        despesas.append(despesa)
+        if len(despesas) == lote:
+            yield from _bloco(despesas)
+            despesas = []
+    yield from _bloco(despesas)
+
+
+class _Eco:
+    """Buffer que devolve o que recebe — o csv.writer escreve direto na resposta em streaming."""
+    def write(self, valor):
+        return valor
+
+
+@staff_member_required
+def exportar_painel_sla_tabela(request):
+    """
+    Exporta a tabela de SLA com os mesmos filtros e ordenação da tela, sem
+    paginação. CSV é enviado em streaming; XLSX é gravado em modo write_only
+    num arquivo temporário.
+    """
+    import csv
+    from django.http import StreamingHttpResponse
+    from .models import ConfiguracaoSLA
+
+    sla_map = {s.status: s.total_horas for s in ConfiguracaoSLA.objects.filter(ativo=True)}
+    agora = tz.now()
+
+    ordenacao = request.GET.get('ordem', 'situacao')
+    chaves = ORDENACOES_SLA.get(ordenacao, ORDENACOES_SLA['situacao'])
+    qs = _sla_queryset(request.GET, sla_map, agora)
+    if request.GET.get('sla'):
+        qs = qs.filter(situacao=request.GET['sla'])
+    qs = qs.order_by(*[f"-{campo}" if desc else campo for campo, desc in chaves])
+
+    cabecalho = ['ID', 'Tipo', 'Solicitante', 'Fornecedor', 'Filial', 'Status', 'Criado em',
+                 'Tempo (h)', 'Prazo (h)', 'Excesso (h)', 'Situação SLA'] + [f"{label} (h)" for _, label, _ in ETAPAS_SLA]
+    linhas = _linhas_exportacao_sla(qs, sla_map, agora)
+    nome = f"painel_sla_{tz.localtime(agora):%Y%m%d_%H%M}"
+
+    if request.GET.get('formato') == 'xlsx':
+        import tempfile
+        from openpyxl import Workbook
+
+        wb = Workbook(write_only=True)
+        ws = wb.create_sheet('SLA')
+        ws.append(cabecalho)
+        for linha in linhas:
+            ws.append(linha)
+        arquivo = tempfile.TemporaryFile()
+        wb.save(arquivo)
+        arquivo.seek(0)
+        return FileResponse(arquivo, as_attachment=True, filename=f"{nome}.xlsx")
+
+    escritor = csv.writer(_Eco(), delimiter=';')
+
+    def _csv():
+        yield '\ufeff'  # BOM para o Excel abrir em UTF-8
+        yield escritor.writerow(cabecalho)
+        for linha in linhas:
+            yield escritor.writerow([str(v).replace('.', ',') if isinstance(v, float) else v for v in linha])
+
+    response = StreamingHttpResponse(_csv(), content_type='text/csv; charset=utf-8')
+    response['Content-Disposition'] = f'attachment; filename="{nome}.csv"'
+    return response
+
+
 @staff_member_required
 def api_colaborador_info(request):
     from cadastros.models import ColaboradorInfo
@@ -657,3 +827,36 @@ def api_colaborador_info(request):
         return JsonResponse({'nome': c.nome.upper(), 'dados': dados})
     except ColaboradorInfo.DoesNotExist:
         return JsonResponse({'error': 'not found'}, status=404)
+
+
+# Tamanhos (largura, altura) das miniaturas de comprovante
+TAMANHOS_MINIATURA = {
+    'lista': (48, 48),
+    'detalhe': (360, 360),
+}
+
+
+@staff_member_required
+def miniatura_comprovante(request, pk):
+    """
+    Miniatura JPEG do comprovante, gerada e guardada no cache local do storage
+    de comprovantes. Respeita a visibilidade do DespesaAdmin.
+    """
+    from django.contrib import admin
+    from workflow.models import Despesa
+
+    tamanho = TAMANHOS_MINIATURA.get(request.GET.get('tamanho'), TAMANHOS_MINIATURA['lista'])
+    visiveis = admin.site.get_model_admin(Despesa).get_queryset(request)
+    nome = visiveis.filter(pk=pk).values_list('comprovante', flat=True).first()
+    if not nome:
+        raise Http404("Despesa sem comprovante.")
+
+    storage = Despesa._meta.get_field('comprovante').storage
+    caminho = storage.miniatura(nome, *tamanho)
+    if caminho is None:
+        raise Http404("Comprovante não é uma imagem.")
+    response = FileResponse(open(caminho, 'rb'), content_type='image/jpeg')
+    # Nome endereçado por conteúdo não muda de conteúdo; os antigos podem ser trocados
+    immutable = storage.eh_enderecado(nome)
+    response['Cache-Control'] = 'private, max-age=31536000, immutable' if immutable else 'private, max-age=3600'
+    return response